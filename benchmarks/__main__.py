@@ -0,0 +1,111 @@
+"""Run the benchmark suite, optionally comparing it with a baseline.
+
+    python -m benchmarks --output baseline.json
+    python -m benchmarks --baseline baseline.json --threshold 0.1
+
+Every ``bench_*`` module runs in its own interpreter.  All results are
+lower-is-better; with ``--baseline`` the exit status is 1 if any result
+got worse than the baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import tempfile
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any
+
+from ._utils import OUTPUT_ENV
+
+
+def _modules() -> list[str]:
+    return sorted(
+        info.name
+        for info in pkgutil.iter_modules([str(Path(__file__).parent)])
+        if info.name.startswith("bench_")
+    )
+
+
+def run(modules: list[str]) -> dict[str, Any]:
+    results: dict[str, dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "results.jsonl"
+        env = os.environ | {OUTPUT_ENV: str(output)}
+        for module in modules:
+            subprocess.run(
+                [sys.executable, "-m", f"{__package__}.{module}"], env=env, check=True
+            )
+        for line in output.read_text().splitlines():
+            item = json.loads(line)
+            results[item.pop("name")] = item
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "neuro_logging": version("neuro-logging"),
+        "results": results,
+    }
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """Print the change of every result and return the names of regressions."""
+    regressions = []
+    current = results["results"]
+    previous = baseline["results"]
+    width = max(map(len, current), default=0)
+    print(f"\nCompared with the baseline (threshold {threshold:.0%})")
+    for name, item in current.items():
+        old = previous.get(name)
+        if old is None or old["unit"] != item["unit"] or not old["value"]:
+            print(f"  {name:<{width}}  {'new':>8}")
+            continue
+        ratio = item["value"] / old["value"]
+        status = ""
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        print(f"  {name:<{width}}  {ratio - 1:+8.1%} {status}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog=f"python -m {__package__}")
+    parser.add_argument(
+        "modules", nargs="*", help="benchmark modules to run, all by default"
+    )
+    parser.add_argument("--output", type=Path, help="write the results to a JSON file")
+    parser.add_argument("--baseline", type=Path, help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown reported as a regression (default: 0.1)",
+    )
+    args = parser.parse_args(argv)
+
+    modules = args.modules or _modules()
+    unknown = set(modules) - set(_modules())
+    if unknown:
+        parser.error(f"unknown benchmark modules: {', '.join(sorted(unknown))}")
+    results = run(modules)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import time
+import timeit
+import tracemalloc
+from collections.abc import Awaitable, Callable, Mapping
+from pathlib import Path
+
+
+def measure(func: Callable[[], object], *, number: int, repeat: int = 5) -> float:
+    """Return the best per-call time of *func* in nanoseconds."""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def measure_async(
+    func: Callable[[], Awaitable[object]], *, number: int, repeat: int = 5
+) -> float:
+    """Return the best per-call time of awaiting *func()* in nanoseconds."""
+
+    async def run() -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    with asyncio.Runner() as runner:
+        runner.run(run())
+        best = min(runner.run(run()) for _ in range(repeat))
+    return best / number * 1e9
+
+
+def peak_memory_async(
+    func: Callable[[], Awaitable[object]], *, concurrency: int = 1000
+) -> float:
+    """Return the peak traced memory per call of *concurrency* calls, in bytes."""
+
+    async def run() -> None:
+        await asyncio.gather(*(func() for _ in range(concurrency)))
+
+    with asyncio.Runner() as runner:
+        runner.run(run())
+        tracemalloc.start()
+        try:
+            base, _ = tracemalloc.get_traced_memory()
+            runner.run(run())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return (peak - base) / concurrency
+
+
+# Set by the suite runner (python -m benchmarks) to collect the results.
+OUTPUT_ENV = "BENCHMARK_OUTPUT"
+
+
+def report(title: str, results: Mapping[str, float], unit: str = "ns/op") -> None:
+    print(title)
+    width = max(map(len, results))
+    for name, value in results.items():
+        print(f"  {name:<{width}}  {value:10.1f} {unit}")
+    output = os.environ.get(OUTPUT_ENV)
+    if output:
+        with Path(output).open("a") as f:
+            for name, value in results.items():
+                line = {"name": f"{title}: {name}", "value": value, "unit": unit}
+                f.write(json.dumps(line) + "\n")
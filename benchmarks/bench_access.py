@@ -0,0 +1,77 @@
+"""Compare aiohttp's access logger with the structured AccessLogger.
+
+Run with ``python -m benchmarks.bench_access``.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from aiohttp.web_log import AccessLogger as AiohttpAccessLogger
+
+from neuro_logging import BASE_CONFIG, AccessLogger, _HealthCheckFilter
+from neuro_logging.handlers import BufferedStreamHandler
+
+from ._utils import measure, report
+
+
+NUMBER = 20000
+
+
+def _make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    json_config = BASE_CONFIG["formatters"]["json"]  # type: ignore[index]
+    factory = json_config["()"]
+    kwargs = {k: v for k, v in json_config.items() if k != "()"}
+    handler.setFormatter(factory(**kwargs))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    # as init_logging() sets up aiohttp.access
+    logger.addFilter(_HealthCheckFilter())
+    return logger
+
+
+def main() -> None:
+    request = make_mocked_request("GET", "/api/v1/jobs?limit=10")
+    ping = make_mocked_request("GET", "/api/v1/ping")
+    response = web.Response(text="[]")
+    with Path(os.devnull).open("w") as devnull:
+        stock = AiohttpAccessLogger(
+            _make_logger("bench.stock", BufferedStreamHandler(devnull, flush_size=0)),
+            AiohttpAccessLogger.LOG_FORMAT,
+        )
+        structured = AccessLogger(
+            _make_logger(
+                "bench.structured", BufferedStreamHandler(devnull, flush_size=0)
+            ),
+            "",
+        )
+        report(
+            "Log a request",
+            {
+                "aiohttp AccessLogger": measure(
+                    lambda: stock.log(request, response, 0.01), number=NUMBER
+                ),
+                "neuro_logging AccessLogger": measure(
+                    lambda: structured.log(request, response, 0.01), number=NUMBER
+                ),
+            },
+        )
+        report(
+            "Skip a health check request",
+            {
+                "aiohttp AccessLogger": measure(
+                    lambda: stock.log(ping, response, 0.01), number=NUMBER
+                ),
+                "neuro_logging AccessLogger": measure(
+                    lambda: structured.log(ping, response, 0.01), number=NUMBER
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
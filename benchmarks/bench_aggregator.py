@@ -0,0 +1,94 @@
+"""Measure logging throughput of forked workers sharing a stdout pipe.
+
+Every worker writes its records to the pipe itself, or sends them to a
+LogAggregator in the parent, which writes them in batches.  The pipe is
+drained by ``cat``.
+
+Run with ``python -m benchmarks.bench_aggregator``.
+"""
+
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import IO, Any
+
+from neuro_logging import BASE_CONFIG
+from neuro_logging.aggregator import AggregatingHandler, LogAggregator
+from neuro_logging.handlers import BufferedStreamHandler
+
+from ._utils import report
+
+
+RECORDS = 20000
+WORKERS = [1, 2, 4, 8]
+
+
+def _logger(handler: logging.Handler) -> logging.Logger:
+    json_config = BASE_CONFIG["formatters"]["json"]  # type: ignore[index]
+    factory = json_config["()"]
+    kwargs = {k: v for k, v in json_config.items() if k != "()"}
+    handler.setFormatter(factory(**kwargs))
+    logger = logging.getLogger("bench.aggregator")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _run_workers(workers: int, make_handler: Callable[[], logging.Handler]) -> None:
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                handler = make_handler()
+                logger = _logger(handler)
+                for _ in range(RECORDS):
+                    logger.info("GET /api/v1/jobs 200", extra={"user": "alice"})
+                handler.close()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def _direct(workers: int, pipe: IO[Any], path: str) -> float:
+    start = time.perf_counter()
+    _run_workers(workers, lambda: BufferedStreamHandler(pipe, flush_size=0))
+    return time.perf_counter() - start
+
+
+def _aggregated(workers: int, pipe: IO[Any], path: str) -> float:
+    start = time.perf_counter()
+    with LogAggregator(path, pipe):
+        _run_workers(workers, lambda: AggregatingHandler(path, pipe))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    sink = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    assert sink.stdin is not None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "logs.sock")
+            for title, run in [
+                ("Workers writing to the pipe", _direct),
+                ("Workers sending to a LogAggregator", _aggregated),
+            ]:
+                results = {}
+                for workers in WORKERS:
+                    elapsed = min(run(workers, sink.stdin, path) for _ in range(3))
+                    results[f"{workers} workers"] = elapsed / (workers * RECORDS) * 1e9
+                report(f"{title}, time per record", results)
+    finally:
+        sink.stdin.close()
+        sink.wait()
+
+
+if __name__ == "__main__":
+    main()
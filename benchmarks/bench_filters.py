@@ -0,0 +1,99 @@
+"""Measure the per-record cost of the logging filters.
+
+Run with ``python -m benchmarks.bench_filters``.
+"""
+
+import logging
+
+from neuro_logging import (
+    AllowLessThanFilter,
+    RateLimitFilter,
+    TraceContextFilter,
+    _HealthCheckFilter,
+)
+from neuro_logging.context import bind_trace_ids
+
+from ._utils import measure, report
+
+
+NUMBER = 200000
+
+
+def _record(level: int) -> logging.LogRecord:
+    return logging.LogRecord(
+        "bench", level, __file__, 1, "Retrying %s", ("request",), None
+    )
+
+
+def main() -> None:
+    info = _record(logging.INFO)
+    warning = _record(logging.WARNING)
+    no_limits = RateLimitFilter()
+    other_level = RateLimitFilter({"WARNING": (10, 10)})
+    within_limit = RateLimitFilter({"WARNING": (1e12, 1e12)})
+    over_limit = RateLimitFilter({"WARNING": (0, 1)})
+    report(
+        "RateLimitFilter.filter",
+        {
+            "no limits": measure(lambda: no_limits.filter(warning), number=NUMBER),
+            "level not limited": measure(
+                lambda: other_level.filter(info), number=NUMBER
+            ),
+            "within limit": measure(
+                lambda: within_limit.filter(warning), number=NUMBER
+            ),
+            "over limit (dropped)": measure(
+                lambda: over_limit.filter(warning), number=NUMBER
+            ),
+        },
+    )
+
+    hide_errors = AllowLessThanFilter("ERROR")
+    hide_health_checks = _HealthCheckFilter(url_prefixes=["/metrics"])
+    ping = logging.LogRecord(
+        "aiohttp.access",
+        logging.INFO,
+        __file__,
+        1,
+        '%s "%s" %s',
+        ("127.0.0.1", "GET /api/v1/ping HTTP/1.1", 200),
+        None,
+    )
+    request = logging.LogRecord(
+        "aiohttp.access",
+        logging.INFO,
+        __file__,
+        1,
+        '%s "%s" %s',
+        ("127.0.0.1", "GET /api/v1/jobs HTTP/1.1", 200),
+        None,
+    )
+    ping.first_request_line = "GET /api/v1/ping HTTP/1.1"
+    request.first_request_line = "GET /api/v1/jobs HTTP/1.1"
+    report(
+        "Standard filters",
+        {
+            "AllowLessThanFilter": measure(
+                lambda: hide_errors.filter(info), number=NUMBER
+            ),
+            "_HealthCheckFilter, health check": measure(
+                lambda: hide_health_checks.filter(ping), number=NUMBER
+            ),
+            "_HealthCheckFilter, other request": measure(
+                lambda: hide_health_checks.filter(request), number=NUMBER
+            ),
+        },
+    )
+
+    trace_context = TraceContextFilter()
+    untraced = measure(lambda: trace_context.filter(info), number=NUMBER)
+    with bind_trace_ids("0" * 32, "0" * 16):
+        traced = measure(lambda: trace_context.filter(info), number=NUMBER)
+    report(
+        "TraceContextFilter.filter",
+        {"outside of a trace": untraced, "inside a trace": traced},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Compare the JSON formatter with pythonjsonlogger's OrjsonFormatter.
+
+Run with ``python -m benchmarks.bench_formatter``.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from pythonjsonlogger.orjson import OrjsonFormatter
+
+from neuro_logging import BASE_CONFIG
+from neuro_logging.formatter import JSONFormatter, TextFormatter
+from neuro_logging.handlers import BufferedStreamHandler
+
+from ._utils import measure, report
+
+
+NUMBER = 20000
+
+
+def _formatter_kwargs() -> dict[str, object]:
+    config = BASE_CONFIG["formatters"]["json"]  # type: ignore[index]
+    return {
+        k: v for k, v in config.items() if k != "()" and not k.startswith("traceback_")
+    }
+
+
+def _fail(depth: int) -> None:
+    if depth:
+        _fail(depth - 1)
+    msg = "connection refused"
+    raise ConnectionError(msg)
+
+
+def _make_logger(
+    name: str, handler: logging.Handler, formatter: logging.Formatter
+) -> logging.Logger:
+    handler.setFormatter(formatter)
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def main() -> None:
+    kwargs = _formatter_kwargs()
+    orjson_formatter = OrjsonFormatter(**kwargs)  # type: ignore[arg-type]
+    json_formatter = JSONFormatter(**kwargs)  # type: ignore[arg-type]
+    record = logging.getLogger("bench").makeRecord(
+        "bench",
+        logging.INFO,
+        __file__,
+        1,
+        "%s %s %s",
+        ("GET", "/api/v1/jobs", 200),
+        None,
+        extra={"user": "alice"},
+    )
+    report(
+        "Format a record",
+        {
+            "OrjsonFormatter.format": measure(
+                lambda: orjson_formatter.format(record), number=NUMBER
+            ),
+            "JSONFormatter.format_bytes": measure(
+                lambda: json_formatter.format_bytes(record), number=NUMBER
+            ),
+        },
+    )
+
+    with Path(os.devnull).open("w") as devnull:
+        old = _make_logger(
+            "bench.old", logging.StreamHandler(devnull), orjson_formatter
+        )
+        new = _make_logger(
+            "bench.new", BufferedStreamHandler(devnull, flush_size=0), json_formatter
+        )
+        report(
+            "Log a record through the JSON handler",
+            {
+                "OrjsonFormatter + StreamHandler": measure(
+                    lambda: old.info("GET /api/v1/jobs %s", 200), number=NUMBER
+                ),
+                "JSONFormatter + BufferedStreamHandler": measure(
+                    lambda: new.info("GET /api/v1/jobs %s", 200), number=NUMBER
+                ),
+            },
+        )
+
+        # An error storm: the same failure logged with its traceback.
+        fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        storm = {
+            "Formatter": ("bench.text", logging.Formatter(fmt)),
+            "TextFormatter": (
+                "bench.text_cached",
+                TextFormatter(fmt, traceback_cache_size=256),
+            ),
+            "JSONFormatter": ("bench.json", JSONFormatter(**kwargs)),  # type: ignore[arg-type]
+            "JSONFormatter, cached": (
+                "bench.json_cached",
+                JSONFormatter(**kwargs, traceback_cache_size=256),  # type: ignore[arg-type]
+            ),
+        }
+        results = {}
+        for label, (name, formatter) in storm.items():
+            logger = _make_logger(name, logging.StreamHandler(devnull), formatter)
+
+            def log_error(logger: logging.Logger = logger) -> None:
+                try:
+                    _fail(20)
+                except ConnectionError:
+                    logger.exception("Request failed")
+
+            results[label] = measure(log_error, number=NUMBER // 10)
+        report("Log an exception during an error storm", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Compare the per-record cost of the stock and buffered JSON handlers, the
+CPU time per MB logged to an uncompressed and a compressed file, and the cost
+of keeping debug records in a flight recorder.
+
+Run with ``python -m benchmarks.bench_handlers``.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from neuro_logging import BASE_CONFIG
+from neuro_logging.handlers import (
+    BufferedStreamHandler,
+    CompressedFileHandler,
+    FlightRecorderHandler,
+)
+from neuro_logging.metrics import logging_metrics
+
+from ._utils import measure, report
+
+
+NUMBER = 20000
+FILE_RECORDS = 100000
+
+
+def _make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    json_config = BASE_CONFIG["formatters"]["json"]  # type: ignore[index]
+    factory = json_config["()"]
+    kwargs = {k: v for k, v in json_config.items() if k != "()"}
+    handler.setFormatter(factory(**kwargs))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def main() -> None:
+    with Path(os.devnull).open("w") as devnull:
+        stream_logger = _make_logger("bench.stream", logging.StreamHandler(devnull))
+        buffered_handler = BufferedStreamHandler(devnull, flush_interval=60)
+        buffered_logger = _make_logger("bench.buffered", buffered_handler)
+        results = {
+            "StreamHandler": measure(
+                lambda: stream_logger.info("GET /api/v1/jobs 200"), number=NUMBER
+            ),
+            "BufferedStreamHandler": measure(
+                lambda: buffered_logger.info("GET /api/v1/jobs 200"), number=NUMBER
+            ),
+        }
+        logging_metrics.enabled = False
+        results["BufferedStreamHandler, metrics off"] = measure(
+            lambda: buffered_logger.info("GET /api/v1/jobs 200"), number=NUMBER
+        )
+        logging_metrics.enabled = True
+        buffered_handler.close()
+    report("JSON handler, info record", results)
+    files()
+    flight_recorder()
+
+
+def _file_cost(
+    name: str, make_handler: Callable[[Path], logging.Handler], tmp: Path
+) -> tuple[float, float]:
+    """Return the CPU time and the bytes written to disk."""
+    directory = tmp / name
+    directory.mkdir()
+    handler = make_handler(directory)
+    logger = _make_logger(f"bench.file.{name}", handler)
+    # process_time() includes the compressor thread.
+    start = time.process_time()
+    for _ in range(FILE_RECORDS):
+        logger.info("GET /api/v1/jobs 200", extra={"user": "alice"})
+    handler.close()
+    cpu = time.process_time() - start
+    return cpu, sum(path.stat().st_size for path in directory.iterdir())
+
+
+def files() -> None:
+    cases: dict[str, Callable[[Path], logging.Handler]] = {
+        # a StreamHandler that closes its file
+        "StreamHandler, uncompressed": lambda d: logging.FileHandler(d / "app.log"),
+        "CompressedFileHandler, gzip": lambda d: CompressedFileHandler(d / "app.log"),
+    }
+    if importlib.util.find_spec("compression") is not None:
+        cases["CompressedFileHandler, zstd"] = lambda d: CompressedFileHandler(
+            d / "app.log", compression="zstd"
+        )
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            name: _file_cost(str(index), make_handler, Path(tmp))
+            for index, (name, make_handler) in enumerate(cases.items())
+        }
+    # the uncompressed file holds what was logged
+    _, logged = results["StreamHandler, uncompressed"]
+    megabytes = logged / 2**20
+    report(
+        "JSON records to a file, CPU time per MB logged",
+        {name: cpu * 1000 / megabytes for name, (cpu, _) in results.items()},
+        unit="ms/MB",
+    )
+    report(
+        "JSON records to a file, size on disk per MB logged",
+        {name: size / 1024 / megabytes for name, (_, size) in results.items()},
+        unit="KiB/MB",
+    )
+
+
+def flight_recorder() -> None:
+    def debug(logger: logging.Logger) -> Callable[[], None]:
+        return lambda: logger.debug("GET %s %d", "/api/v1/jobs", 200)
+
+    with Path(os.devnull).open("w") as devnull:
+        dropped = _make_logger("bench.info", logging.StreamHandler(devnull))
+        dropped.setLevel(logging.INFO)
+        written = _make_logger("bench.debug", logging.StreamHandler(devnull))
+        recorder = FlightRecorderHandler([logging.StreamHandler(devnull)])
+        recorded = _make_logger("bench.recorder", recorder)
+        per_task_recorder = FlightRecorderHandler(
+            [logging.StreamHandler(devnull)], per_task=True
+        )
+        per_task = _make_logger("bench.recorder.task", per_task_recorder)
+
+        async def in_task() -> float:
+            return measure(debug(per_task), number=NUMBER)
+
+        results = {
+            "level INFO, dropped": measure(debug(dropped), number=NUMBER),
+            "level DEBUG, written": measure(debug(written), number=NUMBER),
+            "FlightRecorderHandler": measure(debug(recorded), number=NUMBER),
+            "FlightRecorderHandler, per task": asyncio.run(in_task()),
+        }
+    report("JSON handler, debug record", results)
+
+
+if __name__ == "__main__":
+    main()
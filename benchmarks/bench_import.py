@@ -0,0 +1,65 @@
+"""Measure the import time of neuro_logging with ``python -X importtime``.
+
+Every statement runs in a fresh interpreter; the cumulative time of the
+modules it imports is reported, best of several runs.
+
+Run with ``python -m benchmarks.bench_import``.
+"""
+
+import subprocess
+import sys
+
+from ._utils import report
+
+
+REPEAT = 5
+
+STATEMENTS = {
+    "import neuro_logging": "import neuro_logging",
+    "init_logging()": "import neuro_logging; neuro_logging.init_logging()",
+    "from neuro_logging import trace": "from neuro_logging import trace",
+    "from neuro_logging import AccessLogger": (
+        "from neuro_logging import AccessLogger"
+    ),
+}
+
+_MARKER = "neuro-logging-benchmark"
+
+
+def import_time(statement: str) -> float:
+    """Return the time spent importing modules for *statement* in microseconds.
+
+    Modules imported by the interpreter at startup are not counted.
+    """
+    code = f"import sys; sys.stderr.write('{_MARKER}\\n'); {statement}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    _, _, output = result.stderr.partition(_MARKER)
+    total = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented, their time is included in the parent
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total
+
+
+def main() -> None:
+    report(
+        "Import neuro_logging",
+        {
+            name: min(import_time(statement) for _ in range(REPEAT))
+            for name, statement in STATEMENTS.items()
+        },
+        unit="us",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measure the per-record cost of logging with TEXT_CONFIG and JSON_CONFIG.
+
+Run with ``python -m benchmarks.bench_logging``.
+"""
+
+import copy
+import logging
+import logging.config
+import os
+from pathlib import Path
+from typing import Any, TextIO
+
+from neuro_logging import JSON_CONFIG, TEXT_CONFIG
+
+from ._utils import measure, report
+
+
+NUMBER = 20000
+
+
+def _configure(template: dict[str, Any], stream: TextIO) -> None:
+    config = copy.deepcopy(template)
+    config["root"]["level"] = logging.INFO
+    for handler in config["handlers"].values():
+        handler["stream"] = stream
+    logging.config.dictConfig(config)
+
+
+def _cases(logger: logging.Logger) -> dict[str, float]:
+    try:
+        1 / 0  # noqa: B018
+    except ZeroDivisionError as exc:
+        error = exc
+    return {
+        "disabled level": measure(
+            lambda: logger.debug("GET /api/v1/jobs %s", 200), number=NUMBER
+        ),
+        "plain message": measure(
+            lambda: logger.info("GET /api/v1/jobs %s", 200), number=NUMBER
+        ),
+        "message with extra": measure(
+            lambda: logger.info(
+                "GET /api/v1/jobs %s", 200, extra={"user": "alice", "job": "job-id"}
+            ),
+            number=NUMBER,
+        ),
+        "message with exc_info": measure(
+            lambda: logger.error("Request failed", exc_info=error), number=NUMBER // 10
+        ),
+    }
+
+
+def main() -> None:
+    logger = logging.getLogger("bench.logging")
+    with Path(os.devnull).open("w") as devnull:
+        for title, template in [
+            ("TEXT_CONFIG", TEXT_CONFIG),
+            ("JSON_CONFIG", JSON_CONFIG),
+        ]:
+            _configure(template, devnull)
+            report(f"Log a record with {title}", _cases(logger))
+        logging.config.dictConfig({"version": 1, "root": {"handlers": []}})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare logging fields through ``logging.Logger`` with ``extra`` and
+through a ``BoundLogger``, for enabled and disabled levels.
+
+Run with ``python -m benchmarks.bench_structured``.
+"""
+
+import copy
+import logging
+import logging.config
+import os
+from pathlib import Path
+from typing import Any
+
+from neuro_logging import JSON_CONFIG, get_logger, lazy
+
+from ._utils import measure, report
+
+
+NUMBER = 20000
+
+JOB = {"id": "job-id", "image": "ubuntu", "resources": {"cpu": 1.0, "memory": 2**30}}
+
+
+def _spec() -> str:
+    # Stands in for a field that is costly to compute, such as a rendered spec.
+    return repr(JOB)
+
+
+def _cases(level: int) -> dict[str, float]:
+    logger = logging.getLogger("bench.structured")
+    bound = get_logger("bench.structured").bind(user="alice", cluster="default")
+
+    def stdlib() -> None:
+        logger.log(
+            level,
+            f"Job {JOB['id']} started",  # noqa: G004
+            extra={
+                "extra": {
+                    "user": "alice",
+                    "cluster": "default",
+                    "job": JOB["id"],
+                    "spec": _spec(),
+                }
+            },
+        )
+
+    def stdlib_guarded() -> None:
+        if logger.isEnabledFor(level):
+            stdlib()
+
+    return {
+        "Logger, extra": measure(stdlib, number=NUMBER),
+        "Logger, extra, isEnabledFor()": measure(stdlib_guarded, number=NUMBER),
+        "BoundLogger, bound context only": measure(
+            lambda: bound.log(level, "Job started"), number=NUMBER
+        ),
+        "BoundLogger, lazy field": measure(
+            lambda: bound.log(level, "Job started", job=JOB["id"], spec=lazy(_spec)),
+            number=NUMBER,
+        ),
+    }
+
+
+def main() -> None:
+    config: dict[str, Any] = copy.deepcopy(JSON_CONFIG)
+    config["root"]["level"] = logging.INFO
+    with Path(os.devnull).open("w") as devnull:
+        config["handlers"]["json"]["stream"] = devnull
+        logging.config.dictConfig(config)
+        try:
+            report("Fields of an enabled record", _cases(logging.INFO))
+            report("Fields of a disabled record", _cases(logging.DEBUG))
+        finally:
+            logging.config.dictConfig({"version": 1, "root": {"handlers": []}})
+
+
+if __name__ == "__main__":
+    main()
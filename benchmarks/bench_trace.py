@@ -0,0 +1,188 @@
+"""Measure the per-call overhead of the tracing decorators.
+
+Compares context isolation of @trace with the former per-call task and
+covers the decorators when nothing is recorded, sync functions,
+executor offloads, the span latency histograms and tail sampling.
+
+Run with ``python -m benchmarks.bench_trace``.
+"""
+
+import asyncio
+import functools
+import sys
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import sentry_sdk
+
+from neuro_logging.metrics import span_histograms
+from neuro_logging.trace import (
+    TailSampler,
+    _ContextIsolated,
+    new_sampled_trace,
+    new_trace,
+    notrace,
+    run_in_executor,
+    trace,
+    trace_cm,
+)
+
+from ._sentry import init_sentry
+from ._utils import measure, measure_async, peak_memory_async, report
+
+
+NUMBER = 5000
+# With Sentry disabled the decorators may only cost this many times the
+# context isolation they cannot do without.
+DISABLED_BUDGET = 2.5
+
+
+def task_trace(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """The implementation of @trace that wrapped every call in a task."""
+
+    async def _tracer(*args: Any, **kwargs: Any) -> Any:
+        async with trace_cm(func.__qualname__):
+            return await func(*args, **kwargs)
+
+    @functools.wraps(func)
+    async def tracer(*args: Any, **kwargs: Any) -> Any:
+        return await asyncio.create_task(_tracer(*args, **kwargs))
+
+    return tracer
+
+
+async def handler() -> None:
+    pass
+
+
+def blocking() -> None:
+    pass
+
+
+async def offload() -> None:
+    await asyncio.get_running_loop().run_in_executor(None, blocking)
+
+
+async def traced_offload() -> None:
+    await run_in_executor(None, blocking)
+
+
+async def isolated() -> None:
+    await _ContextIsolated(handler())
+
+
+traced_handler = trace(handler)
+
+
+async def job() -> None:
+    for _ in range(5):
+        await traced_handler()
+
+
+def main() -> None:
+    init_sentry()
+    cases = {
+        "bare await": handler,
+        "create_task per call": task_trace(handler),
+        "@trace (isolated context)": trace(handler),
+    }
+    with sentry_sdk.start_transaction(name="bench", sampled=True):
+        report(
+            "Per-call latency inside a sampled transaction",
+            {name: measure_async(func, number=NUMBER) for name, func in cases.items()},
+        )
+        report(
+            "Peak memory per in-flight call",
+            {name: peak_memory_async(func) for name, func in cases.items()},
+            unit="B/call",
+        )
+    with sentry_sdk.start_transaction(name="bench", sampled=True):
+        report(
+            "Per-call latency of sync functions inside a sampled transaction",
+            {
+                "bare call": measure(blocking, number=NUMBER),
+                "@trace": measure(trace(blocking), number=NUMBER),
+            },
+        )
+        report(
+            "Per-call latency of thread pool offloads inside a sampled transaction",
+            {
+                "loop.run_in_executor": measure_async(offload, number=NUMBER),
+                "run_in_executor": measure_async(traced_offload, number=NUMBER),
+            },
+        )
+    report(
+        "Per-call latency of a new transaction",
+        {
+            "@new_trace (unsampled)": measure_async(new_trace(handler), number=NUMBER),
+            "@new_sampled_trace": measure_async(
+                new_sampled_trace(handler), number=NUMBER
+            ),
+        },
+    )
+    # notrace unsamples the enclosing transaction, it gets one of its own
+    with sentry_sdk.start_transaction(name="bench", sampled=True):
+        report(
+            "Per-call latency of @notrace",
+            {"@notrace": measure_async(notrace(handler), number=NUMBER)},
+        )
+    module = sys.modules["neuro_logging.trace"]
+    traced_job = new_trace(job)
+    unsampled = measure_async(traced_job, number=NUMBER)
+    module.tail_sampler = TailSampler(threshold=60.0)
+    try:
+        tail = measure_async(traced_job, number=NUMBER)
+    finally:
+        module.tail_sampler = None
+    report(
+        "Per-call latency of an unsampled transaction with 5 spans",
+        {"@new_trace": unsampled, "@new_trace, tail sampling": tail},
+    )
+    with sentry_sdk.start_transaction(name="bench", sampled=False):
+        report(
+            "Per-call latency inside an unsampled transaction",
+            {
+                "bare await": measure_async(handler, number=NUMBER),
+                "@trace": measure_async(trace(handler), number=NUMBER),
+            },
+        )
+    # what setup_sentry() leaves behind without a DSN
+    sentry_sdk.get_global_scope().set_client(None)
+    span_histograms.enabled = False
+    try:
+        disabled = {
+            "bare await": measure_async(handler, number=NUMBER),
+            "isolated context": measure_async(isolated, number=NUMBER),
+            "@trace": measure_async(trace(handler), number=NUMBER),
+            "@new_trace": measure_async(new_trace(handler), number=NUMBER),
+        }
+    finally:
+        span_histograms.enabled = True
+    report("Per-call latency with Sentry and histograms disabled", disabled)
+    budget = DISABLED_BUDGET * disabled["isolated context"]
+    for name in ["@trace", "@new_trace"]:
+        if disabled[name] > budget:
+            txt = f"{name} with Sentry disabled is over budget: {disabled[name]:.0f} ns"
+            raise SystemExit(txt)
+
+    def histograms(enabled: bool) -> float:
+        span_histograms.enabled = enabled
+        try:
+            return measure_async(trace(handler), number=NUMBER)
+        finally:
+            span_histograms.enabled = True
+
+    report(
+        "Recording of span latency histograms",
+        {
+            "SpanHistograms.record": measure(
+                lambda: span_histograms.record("handler", 123456), number=NUMBER
+            ),
+            "@trace, histograms off": histograms(enabled=False),
+            "@trace, histograms on": histograms(enabled=True),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
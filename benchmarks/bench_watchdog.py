@@ -0,0 +1,50 @@
+"""Measure the overhead of the event loop watchdog.
+
+Run with ``python -m benchmarks.bench_watchdog``.
+"""
+
+import asyncio
+import time
+
+from neuro_logging.watchdog import LoopWatchdog
+
+from ._utils import report
+
+
+NUMBER = 200000
+IDLE = 1.0
+INTERVALS = [0.1, 0.01]
+
+
+async def _switches(number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await asyncio.sleep(0)
+    return (time.perf_counter() - start) / number * 1e9
+
+
+async def _idle_cpu(seconds: float) -> float:
+    start = time.process_time()
+    await asyncio.sleep(seconds)
+    return (time.process_time() - start) / seconds * 1e6
+
+
+async def _run(interval: float | None) -> tuple[float, float]:
+    if interval is None:
+        return await _switches(NUMBER), await _idle_cpu(IDLE)
+    async with LoopWatchdog(interval=interval):
+        return await _switches(NUMBER), await _idle_cpu(IDLE)
+
+
+def main() -> None:
+    switches = {}
+    idle = {}
+    for interval in [None, *INTERVALS]:
+        name = "no watchdog" if interval is None else f"interval {interval} s"
+        switches[name], idle[name] = asyncio.run(_run(interval))
+    report("Task switch on a busy loop", switches)
+    report("CPU time of an idle loop", idle, unit="us/s")
+
+
+if __name__ == "__main__":
+    main()
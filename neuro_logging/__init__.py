@@ -1,35 +1,156 @@
+import atexit
+import copy
+import importlib
 import logging
 import logging.config
 import os
+import sys
+import threading
+import time
+import types
 import typing as t
-from importlib.metadata import version
-
-from pythonjsonlogger.orjson import OrjsonFormatter
-
-from .config import EnvironConfigFactory
-from .trace import (
-    new_sampled_trace,
-    new_trace,
-    new_trace_cm,
-    notrace,
-    setup_sentry,
-    trace,
-    trace_cm,
+from collections.abc import Iterable, Mapping
+
+from . import health
+from .config import EnvironConfigFactory, LoggingConfig
+from .context import trace_ids as _trace_ids
+from .formatter import JSONFormatter, TextFormatter, TracebackCache
+from .handlers import (
+    AsyncQueueHandler,
+    BufferedStreamHandler,
+    CompressedFileHandler,
+    FlightRecorderHandler,
+    MeteredStreamHandler,
+    OverflowPolicy,
+)
+from .health import HealthCheckMatcher
+from .levels import LogLevels, log_levels, log_levels_handler
+from .metrics import (
+    DROPPED,
+    LoggingMetrics,
+    SpanHistograms,
+    logging_metrics,
+    metrics_handler,
+    span_histograms,
 )
+from .structured import BoundLogger, get_logger, lazy
+
+
+if t.TYPE_CHECKING:
+    from .access import AccessLogger
+    from .aggregator import AggregatingHandler, LogAggregator
+    from .trace import (
+        new_sampled_trace,
+        new_trace,
+        new_trace_cm,
+        notrace,
+        run_in_executor,
+        setup_sentry,
+        trace,
+        trace_cm,
+    )
+    from .watchdog import LoopWatchdog, watch_loop
+
+    __version__: str
+
+
+# Names imported on first access: the tracing and access log helpers pull
+# in sentry_sdk and aiohttp, which dominate the import time otherwise.
+_LAZY = {
+    "AccessLogger": ".access",
+    "AggregatingHandler": ".aggregator",
+    "LogAggregator": ".aggregator",
+    "LoopWatchdog": ".watchdog",
+    "new_sampled_trace": ".trace",
+    "new_trace": ".trace",
+    "new_trace_cm": ".trace",
+    "notrace": ".trace",
+    "run_in_executor": ".trace",
+    "setup_sentry": ".trace",
+    "trace": ".trace",
+    "trace_cm": ".trace",
+    "watch_loop": ".watchdog",
+}
+
+
+def __getattr__(name: str) -> t.Any:
+    if name == "__version__":
+        from importlib.metadata import version
+
+        value = version(__name__)
+    else:
+        try:
+            module_name = _LAZY[name]
+        except KeyError:
+            msg = f"module {__name__!r} has no attribute {name!r}"
+            raise AttributeError(msg) from None
+        value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
 
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY, "__version__"})
 
-__version__ = version(__package__)
+
+class _Package(types.ModuleType):
+    """Keep ``neuro_logging.trace`` the decorator.
+
+    Once a submodule is loaded, the import system binds it as an attribute
+    of its package, and nothing in the package runs after that to undo
+    it: ``import neuro_logging.trace`` would replace the decorator bound
+    by ``__getattr__``, or make ``neuro_logging.trace`` the module if it
+    comes first.  The submodule stays reachable through ``sys.modules``
+    and ``from neuro_logging.trace import ...``.
+    """
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        if name == "trace" and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
 
 __all__ = [
+    "AccessLogger",
+    "AggregatingHandler",
     "AllowLessThanFilter",
+    "AsyncQueueHandler",
+    "BoundLogger",
+    "BufferedStreamHandler",
+    "CompressedFileHandler",
+    "FlightRecorderHandler",
+    "HealthCheckMatcher",
+    "JSONFormatter",
+    "LogAggregator",
+    "LogLevels",
+    "LoggingMetrics",
+    "LoopWatchdog",
+    "MeteredStreamHandler",
+    "OverflowPolicy",
+    "RateLimitFilter",
+    "SpanHistograms",
+    "TextFormatter",
+    "TraceContextFilter",
+    "TracebackCache",
+    "get_logger",
     "init_logging",
+    "lazy",
+    "log_levels",
+    "log_levels_handler",
+    "logging_metrics",
+    "metrics_handler",
     "new_sampled_trace",
     "new_trace",
     "new_trace_cm",
     "notrace",
+    "run_in_executor",
     "setup_sentry",
+    "span_histograms",
     "trace",
     "trace_cm",
+    "watch_loop",
 ]
 
 
@@ -45,27 +166,231 @@ class AllowLessThanFilter(logging.Filter):
         self.level = level
 
     def filter(self, record: logging.LogRecord) -> bool:
-        return record.levelno < self.level
+        if record.levelno < self.level:
+            return True
+        logging_metrics.inc(DROPPED, ("hide_errors",))
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """Rate limit records per call site with a token bucket.
+
+    *limits* maps level names (or numbers) and logger names to
+    ``(rate, burst)`` pairs: *rate* records per second are let through per
+    call site after an initial *burst*.  Logger limits apply to the logger
+    and its children at every level and take precedence over level limits.
+    Dropped records are only counted; the count is reported by a summary
+    record when the call site is let through again, or at the latest after
+    *summary_interval* seconds by a timer thread.  :meth:`flush`, called at
+    exit, reports the pending counts right away.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[int | str, tuple[float, float]] | None = None,
+        summary_interval: float = 60.0,
+        name: str = "",
+    ) -> None:
+        super().__init__(name)
+        self.level_limits: dict[int, tuple[float, float]] = {}
+        self.logger_limits: dict[str, tuple[float, float]] = {}
+        for key, limit in (limits or {}).items():
+            if isinstance(key, int):
+                self.level_limits[key] = limit
+            elif key.upper() in logging._nameToLevel:
+                self.level_limits[logging._nameToLevel[key.upper()]] = limit
+            else:
+                self.logger_limits[key] = limit
+        self.summary_interval = summary_interval
+        self._resolved: dict[tuple[str, int], tuple[float, float] | None] = {}
+        # call site -> [tokens, updated, suppressed, levelno, funcName]
+        self._buckets: dict[tuple[str, str, int, object], list[t.Any]] = {}
+        self._next_sweep = time.monotonic() + summary_interval
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def _resolve(self, name: str, levelno: int) -> tuple[float, float] | None:
+        key = (name, levelno)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        limit = self.level_limits.get(levelno)
+        logger_name = name
+        while self.logger_limits:
+            if logger_name in self.logger_limits:
+                limit = self.logger_limits[logger_name]
+                break
+            logger_name, sep, _ = logger_name.rpartition(".")
+            if not sep:
+                break
+        self._resolved[key] = limit
+        return limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        limit = self._resolve(record.name, record.levelno)
+        if limit is None or "_rate_limit_summary" in record.__dict__:
+            return True
+        now = time.monotonic()
+        rate, burst = limit
+        msg = record.msg
+        site = (
+            record.name,
+            record.pathname,
+            record.lineno,
+            msg if isinstance(msg, str) else None,
+        )
+        summaries = None
+        with self._lock:
+            if now >= self._next_sweep:
+                summaries = self._sweep(now)
+            bucket = self._buckets.get(site)
+            if bucket is None:
+                bucket = self._buckets[site] = [burst, now, 0, record.levelno, None]
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            passed: bool = bucket[0] >= 1
+            if passed:
+                bucket[0] -= 1
+                if bucket[2]:
+                    summaries = summaries or []
+                    summaries.append(self._take_summary(site, bucket))
+            else:
+                bucket[2] += 1
+                bucket[4] = record.funcName
+                if bucket[2] == 1:
+                    self._schedule(self._next_sweep - now)
+        if summaries:
+            # Logged without the lock, the summaries pass through this filter.
+            self._report(summaries)
+        if not passed:
+            logging_metrics.inc(DROPPED, ("rate_limit",))
+        return passed
+
+    def _schedule(self, delay: float) -> None:
+        # A timer thread does not survive fork(), hence the is_alive() check.
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(max(delay, 0.0), self._on_timer)
+        self._timer.name = "neuro-logging-rate-limit"
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            summaries = self._sweep(time.monotonic())
+        self._report(summaries)
+
+    def _sweep(self, now: float) -> list[logging.LogRecord]:
+        self._next_sweep = now + self.summary_interval
+        summaries = []
+        for site, bucket in list(self._buckets.items()):
+            if bucket[2]:
+                summaries.append(self._take_summary(site, bucket))
+            elif now - bucket[1] >= self.summary_interval:
+                # idle call site, its bucket has long been refilled
+                self._buckets.pop(site, None)
+        return summaries
+
+    def flush(self) -> None:
+        """Report the records dropped so far."""
+        with self._lock:
+            summaries = [
+                self._take_summary(site, bucket)
+                for site, bucket in self._buckets.items()
+                if bucket[2]
+            ]
+        self._report(summaries)
+
+    def close(self) -> None:
+        """Stop the timer; dropped records are no longer reported."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _take_summary(
+        self, site: tuple[str, str, int, object], bucket: list[t.Any]
+    ) -> logging.LogRecord:
+        name, pathname, lineno, msg = site
+        suppressed = bucket[2]
+        bucket[2] = 0
+        return logging.getLogger(name).makeRecord(
+            name,
+            bucket[3],
+            pathname,
+            lineno,
+            "Suppressed %d similar messages: %r",
+            (suppressed, msg),
+            None,
+            func=bucket[4],
+            extra={"_rate_limit_summary": True, "suppressed": suppressed},
+        )
+
+    def _report(self, summaries: list[logging.LogRecord]) -> None:
+        for record in summaries:
+            logging.getLogger(record.name).handle(record)
+
+
+# Set up by init_logging() from LOG_RATE_LIMITS.
+_rate_limit_filter: RateLimitFilter | None = None
+
+
+@atexit.register
+def _flush_rate_limit_filter() -> None:
+    # Registered after logging's own exit handler, so it runs first.
+    if _rate_limit_filter is not None:
+        _rate_limit_filter.flush()
 
 
 class _HealthCheckFilter(logging.Filter):
-    def __init__(self, url_path: str = "/api/v1/ping", name: str = "") -> None:
+    def __init__(
+        self,
+        url_path: str = "/api/v1/ping",
+        name: str = "",
+        *,
+        url_paths: Iterable[str] = (),
+        url_prefixes: Iterable[str] = (),
+    ) -> None:
         super().__init__(name)
-        self.url_path = url_path
+        self.matcher = HealthCheckMatcher((url_path, *url_paths), url_prefixes)
 
     def filter(self, record: logging.LogRecord) -> bool:
-        if record.levelno > logging.INFO:
+        if record.levelno > logging.INFO or not self.matcher.match_record(record):
             return True
-        return record.getMessage().find(self.url_path) == -1
+        logging_metrics.inc(DROPPED, ("hide_health_checks",))
+        return False
+
+
+class TraceContextFilter(logging.Filter):
+    """Add ``trace_id`` and ``span_id`` fields of the current span to records.
+
+    The ids are set by the tracing helpers when a span starts, a record
+    costs a context variable read.  Records are stamped in the logging
+    thread; behind an AsyncQueueHandler the filter belongs to the queue
+    handler, init_logging() moves it there.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ids = _trace_ids.get()
+        if ids is not None:
+            record.trace_id, record.span_id = ids
+        return True
 
 
 BASE_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
-        "standard": {"format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"},
+        "standard": {
+            "()": TextFormatter,
+            "fmt": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            "traceback_cache_size": 256,
+        },
         "json": {
-            "()": OrjsonFormatter,
+            "()": JSONFormatter,
             "reserved_attrs": [
                 "created",
                 "exc_text",
@@ -80,31 +405,34 @@ BASE_CONFIG = {
                 "extra": "jsonPayload",
             },
             "timestamp": True,
+            "traceback_cache_size": 256,
         },
     },
     "filters": {
         "hide_errors": {"()": AllowLessThanFilter, "level": "ERROR"},
         "hide_health_checks": {"()": _HealthCheckFilter},
+        "trace_ids": {"()": TraceContextFilter},
     },
     "handlers": {
         "stdout": {
-            "class": "logging.StreamHandler",
+            "class": "neuro_logging.handlers.MeteredStreamHandler",
             "level": "DEBUG",
             "formatter": "standard",
             "stream": "ext://sys.stdout",
             "filters": ["hide_errors"],
         },
         "stderr": {
-            "class": "logging.StreamHandler",
+            "class": "neuro_logging.handlers.MeteredStreamHandler",
             "level": "ERROR",
             "formatter": "standard",
             "stream": "ext://sys.stderr",
         },
         "json": {
-            "class": "logging.StreamHandler",
+            "class": "neuro_logging.handlers.BufferedStreamHandler",
             "level": "DEBUG",
             "formatter": "json",
             "stream": "ext://sys.stdout",
+            "flush_size": 0,
         },
     },
     "loggers": {
@@ -137,19 +465,151 @@ JSON_CONFIG = BASE_CONFIG | {
 }
 
 
+def _install_queue_handler(config: LoggingConfig) -> None:
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    queue_handler = AsyncQueueHandler(
+        handlers,
+        maxsize=config.log_queue_size,
+        overflow=config.log_queue_overflow,
+        drop_level=config.log_queue_drop_level,
+    )
+    for handler in handlers:
+        root.removeHandler(handler)
+        # The trace context is only visible in the logging thread.
+        for filter_ in list(handler.filters):
+            if isinstance(filter_, TraceContextFilter):
+                handler.removeFilter(filter_)
+                queue_handler.addFilter(filter_)
+    root.addHandler(queue_handler)
+
+
+def _install_flight_recorder(config: LoggingConfig, size: int, threshold: int) -> None:
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    # Wraps the queue handler in async mode, so that records are buffered
+    # and attributed to their task in the emitting thread.
+    recorder = FlightRecorderHandler(
+        handlers,
+        level=threshold,
+        capacity=size,
+        record_level=config.log_flight_recorder_level,
+        trigger_level=config.log_flight_recorder_trigger,
+        per_task=config.log_flight_recorder_per_task,
+        max_arg_size=config.log_flight_recorder_max_arg_size,
+    )
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(recorder)
+
+
 def init_logging(
     *,
     health_check_url_path: str = "/api/v1/ping",
+    health_check_url_paths: Iterable[str] = (),
+    health_check_url_prefixes: Iterable[str] = (),
+    async_mode: bool | None = None,
+    buffered: bool | None = None,
+    rate_limits: Mapping[str, tuple[float, float]] | None = None,
+    metrics: bool | None = None,
+    trace_ids: bool | None = None,
+    aggregator_socket: str | None = None,
+    log_file: str | None = None,
+    flight_recorder: int | None = None,
 ) -> None:
     config = EnvironConfigFactory().create_logging()
     if "PYTEST_VERSION" in os.environ:
         config_template = TEXT_CONFIG
     else:
         config_template = JSON_CONFIG
-    dict_config: dict[str, t.Any] = config_template.copy()
+    dict_config: dict[str, t.Any] = copy.deepcopy(config_template)
     dict_config["root"]["level"] = config.log_level
     if config.log_health_check:
         dict_config["loggers"].pop("aiohttp.access", None)
         dict_config["loggers"].pop("uvicorn.access", None)
-    dict_config["filters"]["hide_health_checks"]["url_path"] = health_check_url_path
+    for name, level in config.log_levels.items():
+        if name == "root":
+            dict_config["root"]["level"] = level
+        else:
+            dict_config["loggers"].setdefault(name, {})["level"] = level
+    if flight_recorder is None:
+        flight_recorder = config.log_flight_recorder_size
+    threshold = dict_config["root"]["level"]
+    if flight_recorder:
+        # Let the records the recorder holds back reach the root handlers.
+        dict_config["root"]["level"] = min(threshold, config.log_flight_recorder_level)
+    for formatter in dict_config["formatters"].values():
+        formatter |= {
+            "traceback_cache_size": config.log_traceback_cache_size,
+            "traceback_max_frames": config.log_traceback_max_frames,
+            "traceback_max_chars": config.log_traceback_max_chars,
+        }
+    url_paths = [health_check_url_path, *health_check_url_paths]
+    url_prefixes = list(health_check_url_prefixes)
+    dict_config["filters"]["hide_health_checks"] |= {
+        "url_path": health_check_url_path,
+        "url_paths": url_paths[1:],
+        "url_prefixes": url_prefixes,
+    }
+    health.access_log_matcher = (
+        None if config.log_health_check else HealthCheckMatcher(url_paths, url_prefixes)
+    )
+    if log_file is None:
+        log_file = config.log_file
+    if aggregator_socket is None:
+        aggregator_socket = config.log_aggregator_socket
+    if buffered is None:
+        buffered = config.log_buffered
+    if log_file:
+        dict_config["handlers"]["json"] = {
+            "class": "neuro_logging.handlers.CompressedFileHandler",
+            "level": "DEBUG",
+            "formatter": "json",
+            "filename": log_file,
+            "compression": config.log_file_compression,
+            "max_bytes": config.log_file_max_bytes,
+            "interval": config.log_file_interval,
+            "backup_count": config.log_file_backup_count,
+            "max_buffer": config.log_file_max_buffer,
+        }
+    elif aggregator_socket:
+        dict_config["handlers"]["json"] |= {
+            "class": "neuro_logging.aggregator.AggregatingHandler",
+            "path": aggregator_socket,
+            "flush_size": config.log_buffer_size,
+            "flush_interval": config.log_flush_interval,
+        }
+    elif buffered:
+        dict_config["handlers"]["json"] |= {
+            "flush_size": config.log_buffer_size,
+            "flush_interval": config.log_flush_interval,
+        }
+    if rate_limits is None:
+        rate_limits = config.log_rate_limits
+    global _rate_limit_filter
+    if _rate_limit_filter is not None:
+        _rate_limit_filter.close()
+        _rate_limit_filter = None
+    if rate_limits:
+        # Kept to be flushed at exit; dictConfig() takes filter instances.
+        _rate_limit_filter = RateLimitFilter(
+            dict(rate_limits.items()), config.log_rate_limit_summary_interval
+        )
+        for handler in dict_config["handlers"].values():
+            handler["filters"] = [*handler.get("filters", ()), _rate_limit_filter]
+    if trace_ids is None:
+        trace_ids = config.log_trace_ids
+    if trace_ids:
+        json_handler = dict_config["handlers"]["json"]
+        json_handler["filters"] = [*json_handler.get("filters", ()), "trace_ids"]
+    if metrics is None:
+        metrics = config.log_metrics
+    logging_metrics.enabled = metrics
+    span_histograms.enabled = config.log_span_histograms
     logging.config.dictConfig(dict_config)
+    if async_mode is None:
+        async_mode = config.log_async
+    if async_mode:
+        _install_queue_handler(config)
+    if flight_recorder:
+        _install_flight_recorder(config, flight_recorder, threshold)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import logging
+
+from aiohttp.abc import AbstractAccessLogger
+from aiohttp.web import BaseRequest, StreamResponse
+
+from . import health
+
+
+class AccessLogger(AbstractAccessLogger):
+    """aiohttp access logger emitting structured records.
+
+    Records carry ``method``, ``path``, ``status``, ``latency`` (seconds),
+    ``size`` and ``remote`` fields for the JSON formatter; the message is
+    built without the format string engine of aiohttp's access logger and
+    without %-formatting.  Health check requests are skipped before a
+    record is created.  Use it with
+    ``web.run_app(app, access_log_class=AccessLogger)``; ``log_format`` is
+    ignored.
+    """
+
+    __slots__ = ()
+
+    @property
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.INFO)
+
+    def log(self, request: BaseRequest, response: StreamResponse, time: float) -> None:
+        path = request.path
+        matcher = health.access_log_matcher
+        if matcher is not None and matcher.match_path(path):
+            return
+        method = request.method
+        status = response.status
+        logger = self.logger
+        record = logger.makeRecord(
+            logger.name,
+            logging.INFO,
+            "(unknown file)",
+            0,
+            f"{method} {path} {status}",
+            (),
+            None,
+            extra={
+                "method": method,
+                "path": path,
+                "status": status,
+                "latency": time,
+                "size": response.body_length,
+                "remote": request.remote,
+            },
+        )
+        logger.handle(record)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import IO, Any, Self
+
+from .handlers import BufferedStreamHandler, write_stream
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Frames are length prefixed batches of complete formatted records.
+FRAME_HEADER = struct.Struct(">I")
+
+
+class LogAggregator:
+    """Collect records of worker processes and write them from one place.
+
+    Workers send batches of formatted records to the Unix socket at
+    *path* through :class:`AggregatingHandler`.
+    A thread writes complete batches to *stream* in one go once
+    *flush_size* bytes are pending or the oldest of them waited
+    *flush_interval* seconds, so lines of different workers never
+    interleave.  Start it in the parent process before forking the
+    workers; forked children leave the socket to the parent.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        stream: IO[Any] | None = None,
+        *,
+        flush_size: int = 64 * 1024,
+        flush_interval: float = 0.1,
+    ) -> None:
+        self.path = os.fspath(path)
+        self.stream: IO[Any] = sys.stdout if stream is None else stream
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer = bytearray()
+        self._buffered_at = 0.0
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        Path(self.path).unlink(missing_ok=True)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen(128)
+        self._server.setblocking(False)
+        # Wakes the thread up on close().
+        self._waker, self._wakee = socket.socketpair()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._selector.register(self._wakee, selectors.EVENT_READ)
+        self._thread = threading.Thread(
+            target=self._run, name="neuro-logging-aggregator", daemon=True
+        )
+        self._thread.start()
+        _aggregators.add(self)
+
+    def _run(self) -> None:
+        selector = self._selector
+        while not self._stopped.is_set():
+            timeout = None
+            if self._buffer:
+                timeout = self._buffered_at + self.flush_interval - time.monotonic()
+                timeout = max(timeout, 0.0)
+            for key, _ in selector.select(timeout):
+                sock = key.fileobj
+                if sock is self._server:
+                    self._accept()
+                elif sock is not self._wakee:
+                    assert isinstance(sock, socket.socket)
+                    self._receive(sock, key.data)
+            if self._buffer and (
+                len(self._buffer) >= self.flush_size
+                or time.monotonic() - self._buffered_at >= self.flush_interval
+            ):
+                self._write_buffer()
+        for key in list(selector.get_map().values()):
+            if key.data is not None:
+                assert isinstance(key.fileobj, socket.socket)
+                self._receive(key.fileobj, key.data, final=True)
+        self._write_buffer()
+
+    def _accept(self) -> None:
+        try:
+            conn, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self._selector.register(conn, selectors.EVENT_READ, bytearray())
+
+    def _receive(
+        self, conn: socket.socket, pending: bytearray, *, final: bool = False
+    ) -> None:
+        closed = False
+        while True:
+            try:
+                data = conn.recv(256 * 1024)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                closed = True
+                break
+            pending += data
+            if not final:
+                break
+        offset = 0
+        while offset + FRAME_HEADER.size <= len(pending):
+            (length,) = FRAME_HEADER.unpack_from(pending, offset)
+            end = offset + FRAME_HEADER.size + length
+            if end > len(pending):
+                break
+            if not self._buffer:
+                self._buffered_at = time.monotonic()
+            self._buffer += memoryview(pending)[offset + FRAME_HEADER.size : end]
+            offset = end
+        del pending[:offset]
+        if closed or final:
+            self._selector.unregister(conn)
+            conn.close()
+
+    def _write_buffer(self) -> None:
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        try:
+            write_stream(self.stream, data)
+        except Exception:
+            LOGGER.exception("Writing aggregated records failed")
+
+    def close(self) -> None:
+        """Write out the records received so far and stop serving."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        _aggregators.discard(self)
+        self._stopped.set()
+        self._waker.send(b"\0")
+        thread.join()
+        self._close_sockets()
+        Path(self.path).unlink(missing_ok=True)
+
+    def _close_sockets(self) -> None:
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()  # type: ignore[union-attr]
+        self._selector.close()
+        self._waker.close()
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _after_fork_in_child(self) -> None:
+        # The thread does not survive fork(); the socket belongs to the parent.
+        self._thread = None
+        self._close_sockets()
+
+
+class AggregatingHandler(BufferedStreamHandler):
+    """Send formatted records to a :class:`LogAggregator` listening at *path*.
+
+    Records are batched like by :class:`BufferedStreamHandler`, every
+    batch is sent as one frame.  While the aggregator cannot be reached
+    batches are written to *stream*, a connection is retried every
+    *retry_interval* seconds.  A forked child opens a connection of its
+    own.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        stream: IO[Any] | None = None,
+        *,
+        flush_size: int = 64 * 1024,
+        flush_interval: float = 0.1,
+        flush_level: int | str = logging.ERROR,
+        retry_interval: float = 1.0,
+    ) -> None:
+        self.path = os.fspath(path)
+        self.retry_interval = retry_interval
+        self._socket: socket.socket | None = None
+        self._retry_at = 0.0
+        super().__init__(
+            stream,
+            flush_size=flush_size,
+            flush_interval=flush_interval,
+            flush_level=flush_level,
+        )
+
+    def _connect(self) -> socket.socket | None:
+        now = time.monotonic()
+        if now < self._retry_at:
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            self._retry_at = now + self.retry_interval
+            return None
+        self._socket = sock
+        return sock
+
+    def _disconnect(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _write(self, data: bytes) -> None:
+        sock = self._socket or self._connect()
+        if sock is not None:
+            try:
+                sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+                return
+            except OSError:
+                # The aggregator drops a frame cut short.
+                self._disconnect()
+                self._retry_at = time.monotonic() + self.retry_interval
+        super()._write(data)
+
+    def close(self) -> None:
+        super().close()
+        self.acquire()
+        try:
+            self._disconnect()
+        finally:
+            self.release()
+
+    def _after_fork_in_child(self) -> None:
+        super()._after_fork_in_child()
+        # Frames of parent and child must not share a connection.
+        self._disconnect()
+        self._retry_at = 0.0
+
+
+_aggregators: weakref.WeakSet[LogAggregator] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for aggregator in list(_aggregators):
+        aggregator._after_fork_in_child()
+    _aggregators.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -2,13 +2,49 @@ from __future__ import annotations
 
 import logging
 import os
-from dataclasses import dataclass
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 
 
 @dataclass(frozen=True)
 class LoggingConfig:
     log_level: int = logging.INFO
     log_health_check: bool = False
+    log_async: bool = False
+    log_queue_size: int = 10000
+    log_queue_overflow: str = "block"
+    log_queue_drop_level: int = logging.WARNING
+    log_buffered: bool = False
+    log_buffer_size: int = 64 * 1024
+    log_flush_interval: float = 0.1
+    log_rate_limits: Mapping[str, tuple[float, float]] = field(default_factory=dict)
+    log_rate_limit_summary_interval: float = 60.0
+    # Counted by the handlers init_logging() sets up; handlers added to the
+    # loggers afterwards only show up in the filter drop counts.
+    log_metrics: bool = True
+    log_trace_ids: bool = False
+    log_aggregator_socket: str | None = None
+    log_levels: Mapping[str, int] = field(default_factory=dict)
+    log_file: str | None = None
+    log_file_compression: str = "gzip"
+    log_file_max_bytes: int = 128 * 1024 * 1024
+    log_file_interval: float = 0.0
+    log_file_backup_count: int = 10
+    log_file_max_buffer: int = 64 * 1024 * 1024
+    log_traceback_cache_size: int = 256
+    log_traceback_max_frames: int | None = None
+    log_traceback_max_chars: int | None = None
+    log_span_histograms: bool = True
+    log_loop_watchdog: bool = False
+    log_loop_stall_threshold: float = 0.1
+    log_loop_stall_interval: float = 0.1
+    log_loop_stall_sample_rate: float = 1.0
+    log_loop_stall_sentry_threshold: float | None = None
+    log_flight_recorder_size: int = 0
+    log_flight_recorder_level: int = logging.DEBUG
+    log_flight_recorder_trigger: int = logging.ERROR
+    log_flight_recorder_per_task: bool = False
+    log_flight_recorder_max_arg_size: int = 1024
 
 
 @dataclass(frozen=True)
@@ -17,12 +53,70 @@ class SentryConfig:
     cluster_name: str | None = None
     app_name: str | None = None
     sample_rate: float = 0.1
+    error_window: float = 60.0
+    error_cap: int = 1
+    sample_rates: Mapping[str, float] = field(default_factory=dict)
+    traces_budget: float = 0.0
+    spool_dir: str | None = None
+    spool_max_bytes: int = 64 * 1024 * 1024
+    tail_threshold: float | None = None
+    tail_max_spans: int = 100
 
 
 def _to_bool(value: str) -> bool:
     return value.lower() in ("true", "1", "yes", "y")
 
 
+def _to_optional_int(value: str) -> int | None:
+    return int(value) if value.strip() else None
+
+
+def _to_optional_float(value: str) -> float | None:
+    return float(value) if value.strip() else None
+
+
+def _to_rate_limits(value: str) -> dict[str, tuple[float, float]]:
+    # "WARNING=10,aiohttp.client=1:5": rate per second and optional burst
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, _, limit = item.partition("=")
+        rate, _, burst = limit.partition(":")
+        limits[key.strip()] = (
+            float(rate),
+            float(burst) if burst else max(float(rate), 1.0),
+        )
+    return limits
+
+
+def _to_levels(value: str) -> dict[str, int]:
+    # "aiohttp.client=DEBUG,botocore=ERROR": logger name and level
+    levels = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, _, level = item.rpartition("=")
+        try:
+            levels[key.strip()] = logging._nameToLevel[level.strip().upper()]
+        except KeyError:
+            txt = f"Unknown level name: {level}"
+            raise ValueError(txt) from None
+    return levels
+
+
+def _to_sample_rates(value: str) -> dict[str, float]:
+    # "GET /api/v1/jobs=0.01,job-name=1": transaction name (or aiohttp
+    # request prefix) and sample rate
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, _, rate = item.rpartition("=")
+        rates[key.strip()] = float(rate)
+    return rates
+
+
 class EnvironConfigFactory:
     def __init__(self, environ: dict[str, str] | None = None) -> None:
         self._environ = environ or os.environ
@@ -36,6 +130,119 @@ class EnvironConfigFactory:
                 ).upper()
             ),
             log_health_check=_to_bool(self._environ.get("LOG_HEALTH_CHECK", "0")),
+            log_async=_to_bool(self._environ.get("LOG_ASYNC", "0")),
+            log_queue_size=int(
+                self._environ.get("LOG_QUEUE_SIZE", LoggingConfig.log_queue_size)
+            ),
+            log_queue_overflow=self._environ.get(
+                "LOG_QUEUE_OVERFLOW", LoggingConfig.log_queue_overflow
+            ).lower(),
+            log_queue_drop_level=logging.getLevelName(
+                self._environ.get(
+                    "LOG_QUEUE_DROP_LEVEL",
+                    logging.getLevelName(LoggingConfig.log_queue_drop_level),
+                ).upper()
+            ),
+            log_buffered=_to_bool(self._environ.get("LOG_BUFFERED", "0")),
+            log_buffer_size=int(
+                self._environ.get("LOG_BUFFER_SIZE", LoggingConfig.log_buffer_size)
+            ),
+            log_flush_interval=float(
+                self._environ.get(
+                    "LOG_FLUSH_INTERVAL", LoggingConfig.log_flush_interval
+                )
+            ),
+            log_rate_limits=_to_rate_limits(self._environ.get("LOG_RATE_LIMITS", "")),
+            log_rate_limit_summary_interval=float(
+                self._environ.get(
+                    "LOG_RATE_LIMIT_SUMMARY_INTERVAL",
+                    LoggingConfig.log_rate_limit_summary_interval,
+                )
+            ),
+            log_metrics=_to_bool(self._environ.get("LOG_METRICS", "1")),
+            log_trace_ids=_to_bool(self._environ.get("LOG_TRACE_IDS", "0")),
+            log_aggregator_socket=self._environ.get("LOG_AGGREGATOR_SOCKET") or None,
+            log_levels=_to_levels(self._environ.get("LOG_LEVELS", "")),
+            log_file=self._environ.get("LOG_FILE") or None,
+            log_file_compression=self._environ.get(
+                "LOG_FILE_COMPRESSION", LoggingConfig.log_file_compression
+            ).lower(),
+            log_file_max_bytes=int(
+                self._environ.get(
+                    "LOG_FILE_MAX_BYTES", LoggingConfig.log_file_max_bytes
+                )
+            ),
+            log_file_interval=float(
+                self._environ.get("LOG_FILE_INTERVAL", LoggingConfig.log_file_interval)
+            ),
+            log_file_backup_count=int(
+                self._environ.get(
+                    "LOG_FILE_BACKUP_COUNT", LoggingConfig.log_file_backup_count
+                )
+            ),
+            log_file_max_buffer=int(
+                self._environ.get(
+                    "LOG_FILE_MAX_BUFFER", LoggingConfig.log_file_max_buffer
+                )
+            ),
+            log_traceback_cache_size=int(
+                self._environ.get(
+                    "LOG_TRACEBACK_CACHE_SIZE", LoggingConfig.log_traceback_cache_size
+                )
+            ),
+            log_traceback_max_frames=_to_optional_int(
+                self._environ.get("LOG_TRACEBACK_MAX_FRAMES", "")
+            ),
+            log_traceback_max_chars=_to_optional_int(
+                self._environ.get("LOG_TRACEBACK_MAX_CHARS", "")
+            ),
+            log_span_histograms=_to_bool(self._environ.get("LOG_SPAN_HISTOGRAMS", "1")),
+            log_loop_watchdog=_to_bool(self._environ.get("LOG_LOOP_WATCHDOG", "0")),
+            log_loop_stall_threshold=float(
+                self._environ.get(
+                    "LOG_LOOP_STALL_THRESHOLD", LoggingConfig.log_loop_stall_threshold
+                )
+            ),
+            log_loop_stall_interval=float(
+                self._environ.get(
+                    "LOG_LOOP_STALL_INTERVAL", LoggingConfig.log_loop_stall_interval
+                )
+            ),
+            log_loop_stall_sample_rate=float(
+                self._environ.get(
+                    "LOG_LOOP_STALL_SAMPLE_RATE",
+                    LoggingConfig.log_loop_stall_sample_rate,
+                )
+            ),
+            log_loop_stall_sentry_threshold=_to_optional_float(
+                self._environ.get("LOG_LOOP_STALL_SENTRY_THRESHOLD", "")
+            ),
+            log_flight_recorder_size=int(
+                self._environ.get(
+                    "LOG_FLIGHT_RECORDER_SIZE", LoggingConfig.log_flight_recorder_size
+                )
+            ),
+            log_flight_recorder_level=logging.getLevelName(
+                self._environ.get(
+                    "LOG_FLIGHT_RECORDER_LEVEL",
+                    logging.getLevelName(LoggingConfig.log_flight_recorder_level),
+                ).upper()
+            ),
+            log_flight_recorder_trigger=logging.getLevelName(
+                self._environ.get(
+                    "LOG_FLIGHT_RECORDER_TRIGGER",
+                    logging.getLevelName(LoggingConfig.log_flight_recorder_trigger),
+                ).upper()
+            ),
+            log_flight_recorder_per_task=_to_bool(
+                self._environ.get("LOG_FLIGHT_RECORDER_PER_TASK", "0")
+            ),
+            log_flight_recorder_max_arg_size=int(
+                self._environ.get(
+                    "LOG_FLIGHT_RECORDER_MAX_ARG_SIZE",
+                    LoggingConfig.log_flight_recorder_max_arg_size,
+                )
+            ),
         )
 
     def create_sentry(self) -> SentryConfig:
@@ -48,4 +255,26 @@ class EnvironConfigFactory:
             sample_rate=float(
                 self._environ.get("SENTRY_SAMPLE_RATE", SentryConfig.sample_rate)
             ),
+            error_window=float(
+                self._environ.get("SENTRY_ERROR_WINDOW", SentryConfig.error_window)
+            ),
+            error_cap=int(
+                self._environ.get("SENTRY_ERROR_CAP", SentryConfig.error_cap)
+            ),
+            sample_rates=_to_sample_rates(self._environ.get("SENTRY_SAMPLE_RATES", "")),
+            traces_budget=float(
+                self._environ.get("SENTRY_TRACES_BUDGET", SentryConfig.traces_budget)
+            ),
+            spool_dir=self._environ.get("SENTRY_SPOOL_DIR", SentryConfig.spool_dir),
+            spool_max_bytes=int(
+                self._environ.get(
+                    "SENTRY_SPOOL_MAX_BYTES", SentryConfig.spool_max_bytes
+                )
+            ),
+            tail_threshold=_to_optional_float(
+                self._environ.get("SENTRY_TAIL_THRESHOLD", "")
+            ),
+            tail_max_spans=int(
+                self._environ.get("SENTRY_TAIL_MAX_SPANS", SentryConfig.tail_max_spans)
+            ),
         )
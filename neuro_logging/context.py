@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# (trace_id, span_id) of the innermost span started by the neuro_logging
+# tracing helpers, read by TraceContextFilter.
+trace_ids: ContextVar[tuple[str, str] | None] = ContextVar(
+    "neuro_logging_trace_ids", default=None
+)
+
+# Name of the innermost trace/trace_cm span every task is in, whether it
+# is recorded or not.  Read by LoopWatchdog from another thread, which
+# cannot see the context the task runs the span in, and only kept while
+# a watchdog is running.
+task_spans: dict[asyncio.Task[object], str] = {}
+_span_watchers = 0
+
+_SpanState = tuple["asyncio.Task[object]", str | None] | None
+
+
+@contextmanager
+def bind_trace_ids(trace_id: str, span_id: str) -> Iterator[None]:
+    token = trace_ids.set((trace_id, span_id))
+    try:
+        yield
+    finally:
+        trace_ids.reset(token)
+
+
+def watch_spans(enabled: bool) -> None:
+    """Start or stop keeping :data:`task_spans` for one more or one less
+    watcher.
+    """
+    global _span_watchers
+    _span_watchers += 1 if enabled else -1
+
+
+def enter_span(name: str) -> _SpanState:
+    """Make *name* the span of the current task until :func:`exit_span`."""
+    if not _span_watchers:
+        return None
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:  # not in the event loop thread
+        return None
+    if task is None:
+        return None
+    previous = task_spans.get(task)
+    task_spans[task] = name
+    return task, previous
+
+
+def exit_span(state: _SpanState) -> None:
+    if state is None:
+        return
+    task, previous = state
+    if previous is None:
+        task_spans.pop(task, None)
+    else:
+        task_spans[task] = previous
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import base64
+import enum
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable, Mapping
+from datetime import UTC, datetime
+from types import TracebackType
+from typing import Any, Literal
+
+import orjson
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, BaseException):
+        return f"{obj.__class__.__name__}: {obj}"
+    if isinstance(obj, TracebackType):
+        return "".join(traceback.format_tb(obj)).strip()
+    if isinstance(obj, bytes | bytearray):
+        return base64.urlsafe_b64encode(obj).decode("utf8")
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, enum.EnumMeta):
+        return [e.value for e in obj]  # type: ignore[var-annotated]
+    if isinstance(obj, type):
+        return obj.__name__
+    try:
+        return str(obj)
+    except Exception:
+        pass
+    try:
+        return repr(obj)
+    except Exception:
+        pass
+    return "__could_not_encode__"
+
+
+ExcInfo = tuple[type[BaseException], BaseException, TracebackType | None]
+
+
+def _exception_key(exc: BaseException, seen: set[int]) -> Hashable:
+    # The traceback text only depends on the code locations, the type and
+    # the message, and on the chained exceptions.
+    seen.add(id(exc))
+    locations = []
+    tb = exc.__traceback__
+    while tb is not None:
+        locations.append((tb.tb_frame.f_code, tb.tb_lineno))
+        tb = tb.tb_next
+    chained: Hashable = None
+    if exc.__cause__ is not None and id(exc.__cause__) not in seen:
+        chained = ("cause", _exception_key(exc.__cause__, seen))
+    elif (
+        exc.__context__ is not None
+        and not exc.__suppress_context__
+        and id(exc.__context__) not in seen
+    ):
+        chained = ("context", _exception_key(exc.__context__, seen))
+    return type(exc), str(exc), tuple(locations), chained
+
+
+class TracebackCache:
+    """Bounded LRU of formatted tracebacks.
+
+    During an error storm many records carry exceptions raised at the
+    same place with the same message; their traceback is formatted once.
+    Tracebacks are keyed on the code locations of their frames, the
+    exception type and message, and the chained exceptions.  Optionally
+    only the innermost *max_frames* frames are formatted, and the text is
+    cut to its last *max_chars* characters.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        *,
+        max_frames: int | None = None,
+        max_chars: int | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.max_frames = max_frames or None
+        self.max_chars = max_chars or None
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = value
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _truncate(self, text: str) -> str:
+        if self.max_chars is not None and len(text) > self.max_chars:
+            return "...\n" + text[-self.max_chars :]
+        return text
+
+    def _limit(self) -> int | None:
+        return None if self.max_frames is None else -self.max_frames
+
+    def format_exception(self, exc_info: ExcInfo) -> str:
+        """Format like :meth:`logging.Formatter.formatException`."""
+        exc = exc_info[1]
+        key = ("exception", _exception_key(exc, set()))
+        text = self._get(key)
+        if text is None:
+            text = "".join(
+                traceback.format_exception(*exc_info, limit=self._limit())
+            ).removesuffix("\n")
+            text = self._truncate(text)
+            self._put(key, text)
+        return text  # type: ignore[no-any-return]
+
+    def format_json(self, exc_info: ExcInfo) -> list[str]:
+        """Format like the JSON formatter serializes ``exc_info``."""
+        exc_type, exc, tb = exc_info
+        key = ("json", _exception_key(exc, set()))
+        value = self._get(key)
+        if value is None:
+            text = "".join(traceback.format_tb(tb, limit=self._limit())).strip()
+            value = [
+                exc_type.__name__,
+                f"{exc.__class__.__name__}: {exc}",
+                self._truncate(text),
+            ]
+            self._put(key, value)
+        return value  # type: ignore[no-any-return]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class TextFormatter(logging.Formatter):
+    """:class:`logging.Formatter` formatting tracebacks through a
+    :class:`TracebackCache` of *traceback_cache_size* entries, see there
+    for *traceback_max_frames* and *traceback_max_chars*.
+    """
+
+    def __init__(
+        self,
+        fmt: str | None = None,
+        datefmt: str | None = None,
+        style: Literal["%", "{", "$"] = "%",
+        validate: bool = True,
+        *,
+        traceback_cache_size: int = 256,
+        traceback_max_frames: int | None = None,
+        traceback_max_chars: int | None = None,
+    ) -> None:
+        super().__init__(fmt, datefmt, style, validate)
+        self.tracebacks: TracebackCache | None = None
+        if traceback_cache_size > 0:
+            self.tracebacks = TracebackCache(
+                traceback_cache_size,
+                max_frames=traceback_max_frames,
+                max_chars=traceback_max_chars,
+            )
+
+    def formatException(self, ei: Any) -> str:  # noqa: N802
+        if self.tracebacks is None or ei[1] is None:
+            return super().formatException(ei)
+        return self.tracebacks.format_exception(ei)
+
+
+_LOG_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", logging.NOTSET, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Serialize records to JSON with orjson.
+
+    The output follows the schema of ``pythonjsonlogger``'s
+    ``OrjsonFormatter``: the message first, then every record attribute
+    that is not reserved, in attribute order, then the timestamp.  The
+    field plan (renames and exclusions) is computed once, and
+    :meth:`format_bytes` hands the serialized bytes to binary sinks as is.
+    """
+
+    def __init__(
+        self,
+        *,
+        reserved_attrs: Iterable[str] = (),
+        rename_fields: Mapping[str, str] | None = None,
+        timestamp: bool | str = False,
+        traceback_cache_size: int = 0,
+        traceback_max_frames: int | None = None,
+        traceback_max_chars: int | None = None,
+    ) -> None:
+        super().__init__()
+        self.tracebacks: TracebackCache | None = None
+        if traceback_cache_size > 0:
+            self.tracebacks = TracebackCache(
+                traceback_cache_size,
+                max_frames=traceback_max_frames,
+                max_chars=traceback_max_chars,
+            )
+        rename = dict(rename_fields or {})
+        skip = frozenset(reserved_attrs) | {"message"}
+        self._rename = rename
+        self._skip = skip
+        # Output key of every standard record attribute, None for skipped ones.
+        self._plan: dict[str, str | None] = {
+            attr: None if attr in skip else rename.get(attr, attr)
+            for attr in _LOG_RECORD_ATTRS
+        }
+        self._message_key = rename.get("message", "message")
+        self._exc_info_key = rename.get("exc_info", "exc_info")
+        self._stack_info_key = rename.get("stack_info", "stack_info")
+        # Unless reserved, the raw exc_info and stack_info attributes
+        # overwrite the formatted values, which then only fix key order.
+        self._format_exc_info = "exc_info" in skip
+        self._format_stack_info = "stack_info" in skip
+        if timestamp:
+            key = timestamp if isinstance(timestamp, str) else "timestamp"
+            self._timestamp_key: str | None = rename.get(key, key)
+        else:
+            self._timestamp_key = None
+
+    def formatException(self, ei: Any) -> str:  # noqa: N802
+        if self.tracebacks is None or ei[1] is None:
+            return super().formatException(ei)
+        return self.tracebacks.format_exception(ei)
+
+    def format(self, record: logging.LogRecord) -> str:
+        return self.format_bytes(record).decode()
+
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        return orjson.dumps(
+            self._log_data(record),
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS,
+        )
+
+    def _log_data(self, record: logging.LogRecord) -> dict[str, Any]:
+        msg = record.msg
+        if isinstance(msg, dict):
+            message_dict: dict[str, Any] = msg.copy()
+            record.message = ""
+        else:
+            message_dict = {}
+            record.message = record.getMessage()
+        data: dict[str, Any] = {self._message_key: record.message}
+        for key, value in message_dict.items():
+            data[self._rename.get(key, key)] = value
+        if not message_dict.get("exc_info"):
+            if record.exc_info:
+                data[self._exc_info_key] = (
+                    self.formatException(record.exc_info)
+                    if self._format_exc_info
+                    else None
+                )
+            elif record.exc_text:
+                data[self._exc_info_key] = record.exc_text
+        if record.stack_info and not message_dict.get("stack_info"):
+            data[self._stack_info_key] = (
+                self.formatStack(record.stack_info) if self._format_stack_info else None
+            )
+
+        plan = self._plan
+        skip = self._skip
+        rename = self._rename
+        for key, value in record.__dict__.items():
+            if key in plan:
+                out = plan[key]
+                if out is None:
+                    continue
+                if (
+                    key == "exc_info"
+                    and value
+                    and value[1] is not None
+                    and self.tracebacks is not None
+                ):
+                    value = self.tracebacks.format_json(value)
+            elif key in skip or key.startswith("_"):
+                continue
+            else:
+                out = rename.get(key, key)
+            data[out] = value
+
+        if self._timestamp_key is not None:
+            data[self._timestamp_key] = datetime.fromtimestamp(record.created, tz=UTC)
+        return data
@@ -0,0 +1,699 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib
+import io
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from collections.abc import Callable, Iterable, Mapping
+from enum import StrEnum
+from pathlib import Path
+from typing import IO, Any
+
+from .formatter import JSONFormatter
+from .metrics import (
+    BUFFER_BYTES,
+    QUEUE_DROPPED,
+    QUEUE_SIZE,
+    WRITE_SECONDS,
+    handler_label,
+    logging_metrics,
+)
+
+
+class OverflowPolicy(StrEnum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_LEVEL = "drop_level"
+
+
+_STOP = object()
+
+
+def _to_level(level: int | str) -> int:
+    if isinstance(level, int):
+        return level
+    try:
+        return logging._nameToLevel[level]
+    except KeyError:
+        txt = f"Unknown level name: {level}"
+        raise ValueError(txt) from None
+
+
+def write_stream(stream: IO[Any], data: bytes) -> None:
+    """Write *data* to a text or binary *stream* and flush it."""
+    if isinstance(stream, io.TextIOBase) and not hasattr(stream, "buffer"):
+        stream.write(data.decode())
+        stream.flush()
+        return
+    binary: IO[bytes] = stream
+    if isinstance(stream, io.TextIOBase):
+        # Text written to the stream by other handlers must go first.
+        stream.flush()
+        binary = stream.buffer
+    binary.write(data)
+    binary.flush()
+
+
+class AsyncQueueHandler(logging.Handler):
+    """Hand records over to a writer thread through a bounded queue.
+
+    The emitting thread only pays for an enqueue; formatting and writing
+    are done by the wrapped handlers on a dedicated thread.
+    """
+
+    def __init__(
+        self,
+        handlers: Iterable[logging.Handler],
+        *,
+        maxsize: int = 10000,
+        overflow: OverflowPolicy | str = OverflowPolicy.BLOCK,
+        drop_level: int | str = logging.WARNING,
+    ) -> None:
+        super().__init__()
+        self.handlers = list(handlers)
+        self.maxsize = maxsize
+        self.overflow = OverflowPolicy(overflow)
+        self.drop_level = _to_level(drop_level)
+        self.dropped = 0
+        self._start()
+        _fork_aware_handlers.add(self)
+        logging_metrics.add_source(self)
+
+    def _start(self) -> None:
+        self._queue: queue.Queue[logging.LogRecord | object] = queue.Queue(self.maxsize)
+        self._thread = threading.Thread(
+            target=self._run, name="neuro-logging-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            record = q.get()
+            try:
+                if record is _STOP:
+                    return
+                assert isinstance(record, logging.LogRecord)
+                self._deliver(record)
+            except Exception:
+                self.handleError(record)  # type: ignore[arg-type]
+            finally:
+                q.task_done()
+
+    def _deliver(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if threading.current_thread() is self._thread:
+                # Logged while handling another record, e.g. by a filter;
+                # waiting for room in our own queue could deadlock.
+                self._deliver(record)
+            else:
+                self._enqueue(record)
+        except Exception:
+            self.handleError(record)
+
+    def _enqueue(self, record: logging.LogRecord) -> None:
+        q = self._queue
+        if self.overflow is OverflowPolicy.BLOCK:
+            q.put(record)
+            return
+        try:
+            q.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.overflow is OverflowPolicy.DROP_LEVEL:
+            if record.levelno < self.drop_level:
+                self.dropped += 1
+                return
+            q.put(record)
+            return
+        # DROP_OLDEST: make room by discarding the head of the queue
+        while True:
+            try:
+                q.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    continue
+                q.task_done()
+                self.dropped += 1
+
+    @property
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def collect_metrics(self) -> Iterable[tuple[str, tuple[str, ...], float]]:
+        labels = (handler_label(self),)
+        return [(QUEUE_SIZE, labels, self.qsize), (QUEUE_DROPPED, labels, self.dropped)]
+
+    def flush(self) -> None:
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._queue.join()
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            if self._thread.is_alive():
+                self._queue.put(_STOP)
+                self._thread.join()
+            _fork_aware_handlers.discard(self)
+            logging_metrics.remove_source(self)
+            super().close()
+        finally:
+            self.release()
+
+    def _before_fork(self) -> None:
+        pass
+
+    def _after_fork_in_child(self) -> None:
+        # The writer thread does not survive fork(); records queued in the
+        # parent are its responsibility, the child starts with an empty queue.
+        self.createLock()
+        self._start()
+
+
+_SIZED_TYPES = (str, bytes, bytearray, list, tuple, dict, set, frozenset)
+
+
+def _drop_large(value: object, max_size: int) -> object:
+    if isinstance(value, _SIZED_TYPES) and len(value) > max_size:
+        return f"<{type(value).__name__} of length {len(value)} dropped>"
+    return value
+
+
+class FlightRecorderHandler(logging.Handler):
+    """Hold back records below *level* in a ring of the last *capacity*.
+
+    Records at *level* and above are passed on to the wrapped handlers,
+    and so are the records of loggers with a level of their own, such as
+    one set with :data:`~neuro_logging.log_levels`: *level* stands for the
+    root level the records of the other loggers are held back from.
+    Lower ones, down to *record_level* which the root logger has to let
+    through, are kept unformatted, with ``args`` longer than
+    *max_arg_size* replaced by a placeholder so the ring does not pin
+    large objects.  A record at *trigger_level* or above first flushes
+    the ring it would have gone to, oldest record first.  With
+    *per_task* every asyncio task has its own ring, which is dropped
+    with the task; records logged outside of a task share a global one.
+    """
+
+    def __init__(
+        self,
+        handlers: Iterable[logging.Handler],
+        *,
+        level: int | str = logging.INFO,
+        capacity: int = 100,
+        record_level: int | str = logging.DEBUG,
+        trigger_level: int | str = logging.ERROR,
+        per_task: bool = False,
+        max_arg_size: int = 1024,
+    ) -> None:
+        super().__init__()
+        self.handlers = list(handlers)
+        self.threshold = _to_level(level)
+        self.record_level = _to_level(record_level)
+        self.trigger_level = _to_level(trigger_level)
+        self.capacity = capacity
+        self.per_task = per_task
+        self.max_arg_size = max_arg_size
+        self._ring: deque[logging.LogRecord] = deque(maxlen=capacity)
+        self._task_rings: weakref.WeakKeyDictionary[
+            asyncio.Task[Any], deque[logging.LogRecord]
+        ] = weakref.WeakKeyDictionary()
+        _fork_aware_handlers.add(self)
+
+    def _current_ring(self) -> deque[logging.LogRecord]:
+        if not self.per_task:
+            return self._ring
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return self._ring
+        ring = self._task_rings.get(task)
+        if ring is None:
+            ring = self._task_rings[task] = deque(maxlen=self.capacity)
+        return ring
+
+    def _strip(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if not args:
+            return record
+        max_size = self.max_arg_size
+        is_mapping = isinstance(args, Mapping)
+        for value in args.values() if is_mapping else args:  # type: ignore[union-attr]
+            if isinstance(value, _SIZED_TYPES) and len(value) > max_size:
+                break
+        else:
+            return record
+        if is_mapping:
+            record.args = {k: _drop_large(v, max_size) for k, v in args.items()}  # type: ignore[union-attr]
+        else:
+            record.args = tuple(_drop_large(arg, max_size) for arg in args)
+        return record
+
+    def _deliver(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _held_back(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.threshold:
+            return False
+        # The record passed the level of its logger; only the root level
+        # is lowered for the recorder.
+        logger = logging.Logger.manager.loggerDict.get(record.name)
+        while isinstance(logger, logging.Logger) and logger.parent is not None:
+            if logger.level:
+                return False
+            logger = logger.parent
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self._held_back(record):
+                self._current_ring().append(self._strip(record))
+                return
+            if record.levelno >= self.trigger_level:
+                ring = self._current_ring()
+                while ring:
+                    self._deliver(ring.popleft())
+            self._deliver(record)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._ring.clear()
+            self._task_rings.clear()
+            _fork_aware_handlers.discard(self)
+            super().close()
+        finally:
+            self.release()
+
+    def _before_fork(self) -> None:
+        pass
+
+    def _after_fork_in_child(self) -> None:
+        # The context of the parent's requests is not the child's to report.
+        self._ring.clear()
+        self._task_rings.clear()
+
+
+class MeteredStreamHandler(logging.StreamHandler[IO[str]]):
+    """:class:`logging.StreamHandler` counting the records it formats in
+    :data:`~neuro_logging.logging_metrics`, as the handlers of this module do.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not logging_metrics.enabled:
+            return super().format(record)
+        start = time.perf_counter()
+        text = super().format(record)
+        logging_metrics.observe_record(
+            handler_label(self),
+            record,
+            len(text) + len(self.terminator),
+            time.perf_counter() - start,
+        )
+        return text
+
+
+class BufferedStreamHandler(logging.Handler):
+    """Coalesce formatted records into a byte buffer written in one go.
+
+    The buffer is written out with a single ``write`` once it grows past
+    *flush_size* bytes, when the background flusher finds it older than
+    *flush_interval* seconds, or immediately for records at *flush_level*
+    and above.  With ``flush_size=0`` every record is written through and
+    no flusher thread is started.
+    """
+
+    terminator = b"\n"
+
+    def __init__(
+        self,
+        stream: IO[Any] | None = None,
+        *,
+        flush_size: int = 64 * 1024,
+        flush_interval: float = 0.1,
+        flush_level: int | str = logging.ERROR,
+    ) -> None:
+        super().__init__()
+        self.stream: IO[Any] = sys.stdout if stream is None else stream
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flush_level = _to_level(flush_level)
+        self._buffer = bytearray()
+        self._start()
+        _fork_aware_handlers.add(self)
+        logging_metrics.add_source(self)
+
+    def _start(self) -> None:
+        self._stopped = threading.Event()
+        if self.flush_size > 0:
+            self._thread = threading.Thread(
+                target=self._run, name="neuro-logging-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            if self._buffer:
+                self.flush()
+
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        return _format_bytes(self, record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if logging_metrics.enabled:
+                start = time.perf_counter()
+                data = self.format_bytes(record)
+                logging_metrics.observe_record(
+                    handler_label(self),
+                    record,
+                    len(data) + len(self.terminator),
+                    time.perf_counter() - start,
+                )
+            else:
+                data = self.format_bytes(record)
+            buffer = self._buffer
+            buffer += data
+            buffer += self.terminator
+            if (
+                len(buffer) >= self.flush_size
+                or record.levelno >= self.flush_level
+                or self._stopped.is_set()
+            ):
+                self._write_buffer()
+        except Exception:
+            self.handleError(record)
+
+    def _write_buffer(self) -> None:
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        start = time.perf_counter()
+        self._write(data)
+        logging_metrics.inc(
+            WRITE_SECONDS, (handler_label(self),), time.perf_counter() - start
+        )
+
+    def _write(self, data: bytes) -> None:
+        write_stream(self.stream, data)
+
+    def collect_metrics(self) -> Iterable[tuple[str, tuple[str, ...], float]]:
+        return [(BUFFER_BYTES, (handler_label(self),), len(self._buffer))]
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            self._write_buffer()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self.acquire()
+        try:
+            self._write_buffer()
+            _fork_aware_handlers.discard(self)
+            logging_metrics.remove_source(self)
+            super().close()
+        finally:
+            self.release()
+
+    def _before_fork(self) -> None:
+        # Write the buffer out so that the child does not inherit and
+        # duplicate pending records.
+        self.flush()
+
+    def _after_fork_in_child(self) -> None:
+        self.createLock()
+        self._buffer.clear()
+        self._start()
+
+
+class CompressedFileHandler(logging.Handler):
+    """Write records to a compressed file rotated by size or age.
+
+    The emitting thread only appends the formatted record to a buffer.  A
+    background thread compresses the buffer every *flush_interval*
+    seconds, once it holds *flush_size* bytes or right after a record at
+    *flush_level* and above, and appends it to *filename* plus ``.gz``
+    (*compression* ``"gzip"``) or ``.zst`` (``"zstd"``, Python 3.14+) as
+    a complete gzip member or zstd frame.  A crash loses at most the
+    batch being written and the file stays readable with ``zcat`` or
+    ``zstdcat``; a file left over by a previous run is rotated away on
+    start.  The file is rotated to ``<filename>.1.gz`` and so on once it
+    is *max_bytes* large or *interval* seconds old, *backup_count*
+    rotated files are kept.  If compression falls behind and the buffer
+    holds *max_buffer* bytes, records below *flush_level* are dropped and
+    counted in ``dropped``.
+    """
+
+    terminator = b"\n"
+
+    def __init__(
+        self,
+        filename: str | os.PathLike[str],
+        *,
+        compression: str = "gzip",
+        compression_level: int | None = None,
+        max_bytes: int = 128 * 1024 * 1024,
+        interval: float = 0.0,
+        backup_count: int = 10,
+        flush_size: int = 256 * 1024,
+        flush_interval: float = 1.0,
+        flush_level: int | str = logging.ERROR,
+        max_buffer: int = 64 * 1024 * 1024,
+    ) -> None:
+        super().__init__()
+        self.filename = os.fspath(filename)
+        self._compress, self.suffix = _compressor(compression, compression_level)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flush_level = _to_level(flush_level)
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        path = self._path(0)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size:
+            self._rotate_files()
+        self._open()
+        self._start()
+        _fork_aware_handlers.add(self)
+        logging_metrics.add_source(self)
+
+    def _path(self, index: int) -> Path:
+        if index:
+            return Path(f"{self.filename}.{index}{self.suffix}")
+        return Path(f"{self.filename}{self.suffix}")
+
+    def _open(self) -> None:
+        self._fd: int | None = os.open(
+            self._path(0), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+        )
+        self._size = 0
+        self._opened_at = time.monotonic()
+
+    def _start(self) -> None:
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="neuro-logging-compressor", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._write_buffer()
+            except Exception:
+                # There is no record to pass to handleError().
+                if logging.raiseExceptions:
+                    traceback.print_exc()
+
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        return _format_bytes(self, record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if logging_metrics.enabled:
+                start = time.perf_counter()
+                data = self.format_bytes(record)
+                logging_metrics.observe_record(
+                    handler_label(self),
+                    record,
+                    len(data) + len(self.terminator),
+                    time.perf_counter() - start,
+                )
+            else:
+                data = self.format_bytes(record)
+            with self._buffer_lock:
+                buffer = self._buffer
+                if (
+                    len(buffer) + len(data) >= self.max_buffer
+                    and record.levelno < self.flush_level
+                ):
+                    self.dropped += 1
+                    return
+                buffer += data
+                buffer += self.terminator
+                size = len(buffer)
+            if size >= self.flush_size or record.levelno >= self.flush_level:
+                self._wakeup.set()
+        except Exception:
+            self.handleError(record)
+
+    def _write_buffer(self) -> None:
+        # Not the handler lock: logging.shutdown() holds it while close()
+        # waits for the compressor thread.
+        with self._buffer_lock:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        with self._write_lock:
+            if self._fd is None:
+                return
+            if data:
+                start = time.perf_counter()
+                compressed = self._compress(data)
+                view = memoryview(compressed)
+                while view:
+                    view = view[os.write(self._fd, view) :]
+                self._size += len(compressed)
+                logging_metrics.inc(
+                    WRITE_SECONDS, (handler_label(self),), time.perf_counter() - start
+                )
+            if self._size and (
+                self._size >= self.max_bytes
+                or 0 < self.interval <= time.monotonic() - self._opened_at
+            ):
+                os.close(self._fd)
+                self._rotate_files()
+                self._open()
+
+    def _rotate_files(self) -> None:
+        if self.backup_count <= 0:
+            self._path(0).unlink(missing_ok=True)
+            return
+        for index in range(self.backup_count - 1, -1, -1):
+            path = self._path(index)
+            if path.exists():
+                path.replace(self._path(index + 1))
+
+    def collect_metrics(self) -> Iterable[tuple[str, tuple[str, ...], float]]:
+        labels = (handler_label(self),)
+        return [
+            (BUFFER_BYTES, labels, len(self._buffer)),
+            (QUEUE_DROPPED, labels, self.dropped),
+        ]
+
+    def flush(self) -> None:
+        self._write_buffer()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._write_buffer()
+        with self._write_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        _fork_aware_handlers.discard(self)
+        logging_metrics.remove_source(self)
+        super().close()
+
+    def _before_fork(self) -> None:
+        self.flush()
+
+    def _after_fork_in_child(self) -> None:
+        self.createLock()
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer.clear()
+        self._start()
+
+
+def _compressor(
+    compression: str, level: int | None
+) -> tuple[Callable[[bytes], bytes], str]:
+    if compression == "gzip":
+        import gzip
+
+        return functools.partial(
+            gzip.compress, compresslevel=6 if level is None else level
+        ), ".gz"
+    if compression == "zstd":
+        try:
+            zstd = importlib.import_module("compression.zstd")
+        except ImportError:
+            txt = "zstd compression requires Python 3.14 or newer"
+            raise ValueError(txt) from None
+        return functools.partial(zstd.compress, level=level), ".zst"
+    txt = f"Unknown compression: {compression}"
+    raise ValueError(txt)
+
+
+def _format_bytes(handler: logging.Handler, record: logging.LogRecord) -> bytes:
+    formatter = handler.formatter
+    if isinstance(formatter, JSONFormatter):
+        return formatter.format_bytes(record)
+    return handler.format(record).encode()
+
+
+_fork_aware_handlers: weakref.WeakSet[
+    AsyncQueueHandler
+    | FlightRecorderHandler
+    | BufferedStreamHandler
+    | CompressedFileHandler
+] = weakref.WeakSet()
+
+
+def _before_fork() -> None:
+    for handler in list(_fork_aware_handlers):
+        handler._before_fork()
+
+
+def _after_fork_in_child() -> None:
+    for handler in list(_fork_aware_handlers):
+        handler._after_fork_in_child()
+
+
+os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
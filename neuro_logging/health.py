@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import functools
+import logging
+import re
+from collections.abc import Iterable
+
+
+class HealthCheckMatcher:
+    """Recognize health check, readiness and metrics requests.
+
+    *paths* match exactly (a query string is ignored), *prefixes* match any
+    path starting with them.  Verdicts for paths are cached, access log
+    records are inspected through their raw arguments without formatting
+    the message.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str] = ("/api/v1/ping",),
+        prefixes: Iterable[str] = (),
+        *,
+        cache_size: int = 256,
+    ) -> None:
+        self.paths = tuple(dict.fromkeys(paths))
+        self.prefixes = tuple(dict.fromkeys(prefixes))
+        alternatives = []
+        message_alternatives = []
+        if self.paths:
+            exact = "|".join(map(re.escape, self.paths))
+            alternatives.append(f"(?:{exact})$")
+            message_alternatives.append(f'(?:{exact})(?=[\\s?#"]|$)')
+        if self.prefixes:
+            prefix = "|".join(map(re.escape, self.prefixes))
+            alternatives.append(f"(?:{prefix})")
+            message_alternatives.append(f"(?:{prefix})")
+        if alternatives:
+            self._path_re: re.Pattern[str] | None = re.compile("|".join(alternatives))
+            self._message_re: re.Pattern[str] | None = re.compile(
+                '(?:^|[\\s"])(?:{})'.format("|".join(message_alternatives))
+            )
+        else:
+            self._path_re = self._message_re = None
+        self._match_path = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, path: str) -> bool:
+        assert self._path_re is not None
+        return self._path_re.match(path) is not None
+
+    def match_path(self, path: str) -> bool:
+        if self._path_re is None:
+            return False
+        path, _, _ = path.partition("?")
+        return self._match_path(path)
+
+    def match_url(self, url: str) -> bool:
+        scheme_end = url.find("://")
+        if scheme_end != -1:
+            path_start = url.find("/", scheme_end + 3)
+            url = "/" if path_start == -1 else url[path_start:]
+        path, _, _ = url.partition("#")
+        return self.match_path(path)
+
+    def match_message(self, message: str) -> bool:
+        if self._message_re is None:
+            return False
+        return self._message_re.search(message) is not None
+
+    def match_record(self, record: logging.LogRecord) -> bool:
+        if self._path_re is None:
+            return False
+        args = record.args
+        if record.name == "uvicorn.access" and isinstance(args, tuple):
+            # '%s - "%s %s HTTP/%s" %d', client, method, path, version, status
+            if len(args) == 5 and isinstance(args[2], str):
+                return self.match_path(args[2])
+        request_line = record.__dict__.get("first_request_line")
+        if isinstance(request_line, str):
+            # aiohttp's AccessLogger extra for "%r": 'GET /path HTTP/1.1'
+            _, _, tail = request_line.partition(" ")
+            path, _, _ = tail.partition(" ")
+            return self.match_path(path)
+        msg = record.msg
+        if not args and isinstance(msg, str):
+            return self.match_message(msg)
+        return self.match_message(record.getMessage())
+
+
+# Health checks skipped by AccessLogger, set by init_logging().  None logs
+# them as well.
+access_log_matcher: HealthCheckMatcher | None = HealthCheckMatcher()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from .handlers import FlightRecorderHandler
+
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+
+def _to_level(level: int | str) -> int:
+    if isinstance(level, int):
+        return level
+    try:
+        return logging._nameToLevel[level.upper()]
+    except KeyError:
+        txt = f"Unknown level name: {level}"
+        raise ValueError(txt) from None
+
+
+def _flight_recorder(logger: logging.Logger) -> FlightRecorderHandler | None:
+    if logger is logging.root:
+        for handler in logger.handlers:
+            if isinstance(handler, FlightRecorderHandler):
+                return handler
+    return None
+
+
+def _get_logger_level(logger: logging.Logger) -> int:
+    # The root level is lowered for the flight recorder, which holds the
+    # configured one.
+    recorder = _flight_recorder(logger)
+    return logger.level if recorder is None else recorder.threshold
+
+
+def _set_logger_level(logger: logging.Logger, level: int) -> None:
+    # Logger.setLevel() clears the level caches of every logger; only the
+    # logger and its descendants can be affected.  loggerDict is walked
+    # under the logging lock, as Manager._clear_cache() does, since
+    # getLogger() may add loggers from other threads.
+    recorder = _flight_recorder(logger)
+    if recorder is not None:
+        recorder.threshold = level
+        level = min(level, recorder.record_level)
+    logger.level = level
+    manager = logger.manager
+    prefix = logger.name + "."
+    with logging._lock:  # type: ignore[attr-defined]
+        for name, item in list(manager.loggerDict.items()):
+            if not isinstance(item, logging.Logger):
+                continue
+            if logger is logging.root or name.startswith(prefix):
+                item._cache.clear()  # type: ignore[attr-defined]
+        logger._cache.clear()  # type: ignore[attr-defined]
+
+
+class LogLevels:
+    """Change logger levels at runtime without reconfiguring logging.
+
+    A level set with a *ttl* is reverted after *ttl* seconds; the level
+    a logger had before its first change is restored by :meth:`reset`.
+    With a flight recorder, the root level is the one records are written
+    from rather than held back.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        # logger name -> (level before the first change, expiry or None)
+        self._overrides: dict[str, tuple[int, float | None]] = {}
+        self._timers: dict[str, threading.Timer] = {}
+
+    def set(self, name: str, level: int | str, *, ttl: float | None = None) -> None:
+        """Set the level of logger *name*, "" or "root" for the root logger."""
+        level = _to_level(level)
+        logger = logging.getLogger(name or None)
+        with self._lock:
+            self._cancel_timer(logger.name)
+            original, _ = self._overrides.get(
+                logger.name, (_get_logger_level(logger), None)
+            )
+            expires = None
+            if ttl is not None:
+                expires = time.monotonic() + ttl
+                timer = threading.Timer(ttl, self._expire, (logger.name,))
+                timer.name = "neuro-logging-levels"
+                timer.daemon = True
+                self._timers[logger.name] = timer
+                timer.start()
+            self._overrides[logger.name] = (original, expires)
+            _set_logger_level(logger, level)
+
+    def reset(self, name: str | None = None) -> None:
+        """Restore the level of logger *name*, of every changed logger if None."""
+        with self._lock:
+            if name is None:
+                names = list(self._overrides)
+            else:
+                names = [logging.getLogger(name or None).name]
+            for logger_name in names:
+                self._cancel_timer(logger_name)
+                override = self._overrides.pop(logger_name, None)
+                if override is not None:
+                    _set_logger_level(logging.getLogger(logger_name), override[0])
+
+    def _cancel_timer(self, name: str) -> None:
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _expire(self, name: str) -> None:
+        with self._lock:
+            _, expires = self._overrides.get(name, (0, None))
+            # The level may have been set again meanwhile.
+            if expires is not None and expires <= time.monotonic():
+                self.reset(name)
+
+    def levels(self) -> dict[str, dict[str, Any]]:
+        """Return the levels of the root logger and of changed loggers."""
+        now = time.monotonic()
+        with self._lock:
+            overrides = dict(self._overrides)
+        result = {}
+        for name in ["root", *sorted(overrides.keys() - {"root"})]:
+            _, expires = overrides.get(name, (0, None))
+            result[name] = {
+                "level": logging.getLevelName(
+                    _get_logger_level(logging.getLogger(name))
+                ),
+                "ttl": None if expires is None else max(0.0, expires - now),
+            }
+        return result
+
+    def install_signal_handler(
+        self,
+        signum: int = signal.SIGUSR1,
+        *,
+        name: str = "",
+        level: int | str = logging.DEBUG,
+        ttl: float | None = 300.0,
+    ) -> None:
+        """Toggle *level* of logger *name* on signal *signum*.
+
+        The first signal sets the level for *ttl* seconds, the next one
+        restores the previous level.  Call it from the main thread.
+        """
+        key = logging.getLogger(name or None).name
+
+        def handler(signum: int, frame: object) -> None:
+            if key in self._overrides:
+                self.reset(key)
+            else:
+                self.set(key, level, ttl=ttl)
+
+        signal.signal(signum, handler)
+
+
+log_levels = LogLevels()
+
+
+async def log_levels_handler(request: web.Request) -> web.Response:
+    """aiohttp admin handler changing :data:`log_levels`, e.g.
+    ``app.router.add_route("*", "/admin/log-levels", log_levels_handler)``.
+
+    ``GET`` returns the levels, ``POST`` a JSON object such as
+    ``{"logger": "aiohttp.client", "level": "DEBUG", "ttl": 300}`` sets a
+    level (``"level": null`` restores it) and ``DELETE`` restores all of
+    them.
+    """
+    from aiohttp import web
+
+    if request.method == "POST":
+        try:
+            body = await request.json()
+            name = body.get("logger") or ""
+            level = body.get("level")
+            ttl = body.get("ttl")
+            if level is None:
+                log_levels.reset(name)
+            else:
+                log_levels.set(name, level, ttl=None if ttl is None else float(ttl))
+        except (ValueError, TypeError, AttributeError) as exc:
+            raise web.HTTPBadRequest(text=str(exc)) from exc
+    elif request.method == "DELETE":
+        log_levels.reset()
+    elif request.method != "GET":
+        raise web.HTTPMethodNotAllowed(request.method, ["GET", "POST", "DELETE"])
+    return web.json_response(log_levels.levels())
@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Protocol
+
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+
+RECORDS = "neuro_logging_records_total"
+BYTES = "neuro_logging_bytes_total"
+DROPPED = "neuro_logging_records_dropped_total"
+FORMAT_SECONDS = "neuro_logging_format_seconds_total"
+WRITE_SECONDS = "neuro_logging_write_seconds_total"
+QUEUE_SIZE = "neuro_logging_queue_size"
+QUEUE_DROPPED = "neuro_logging_queue_dropped_total"
+BUFFER_BYTES = "neuro_logging_buffer_bytes"
+SENTRY_SPOOL_ENVELOPES = "neuro_logging_sentry_spool_envelopes"
+SENTRY_SPOOL_BYTES = "neuro_logging_sentry_spool_bytes"
+SENTRY_DROPPED = "neuro_logging_sentry_dropped_total"
+SENTRY_SENT = "neuro_logging_sentry_sent_total"
+
+# name -> (type, help, label names)
+DEFINITIONS: dict[str, tuple[str, str, tuple[str, ...]]] = {
+    RECORDS: ("counter", "Records emitted.", ("handler", "level", "logger")),
+    BYTES: ("counter", "Bytes emitted.", ("handler",)),
+    DROPPED: ("counter", "Records dropped by filters.", ("filter",)),
+    FORMAT_SECONDS: ("counter", "Time spent formatting records.", ("handler",)),
+    WRITE_SECONDS: ("counter", "Time spent writing records.", ("handler",)),
+    QUEUE_SIZE: ("gauge", "Records waiting in the queue.", ("handler",)),
+    QUEUE_DROPPED: (
+        "counter",
+        "Records dropped on queue or buffer overflow.",
+        ("handler",),
+    ),
+    BUFFER_BYTES: ("gauge", "Bytes waiting in the buffer.", ("handler",)),
+    SENTRY_SPOOL_ENVELOPES: ("gauge", "Sentry envelopes waiting in the spool.", ()),
+    SENTRY_SPOOL_BYTES: ("gauge", "Size of the Sentry spool.", ()),
+    SENTRY_DROPPED: ("counter", "Sentry envelopes dropped.", ()),
+    SENTRY_SENT: ("counter", "Sentry envelopes sent.", ()),
+}
+
+_COUNTERS = [name for name, (kind, _, _) in DEFINITIONS.items() if kind == "counter"]
+
+Samples = dict[str, dict[tuple[str, ...], float]]
+
+
+class MetricsSource(Protocol):
+    def collect_metrics(self) -> Iterable[tuple[str, tuple[str, ...], float]]: ...
+
+
+def handler_label(handler: logging.Handler) -> str:
+    return handler.name or type(handler).__name__
+
+
+class _ThreadToken:
+    # Lives in a thread's threading.local and dies with the thread.
+    __slots__ = ("__weakref__",)
+
+
+class ThreadShards[S]:
+    """Per-thread shards of mutable state, updated without a lock.
+
+    When a thread exits, its shard is merged into a shard of retired
+    threads by *merge* and dropped, so short-lived threads do not pile
+    up shards.  Read the shards while holding :meth:`locked`, which keeps
+    them from being retired meanwhile.
+    """
+
+    def __init__(self, factory: Callable[[], S], merge: Callable[[S, S], None]) -> None:
+        self._factory = factory
+        self._merge = merge
+        self._local = threading.local()
+        self._retired = factory()
+        self._shards: list[S] = [self._retired]
+        self._lock = threading.Lock()
+
+    def get(self) -> S:
+        try:
+            return self._local.shard  # type: ignore[no-any-return]
+        except AttributeError:
+            pass
+        shard = self._factory()
+        token = _ThreadToken()
+        with self._lock:
+            self._shards.append(shard)
+        weakref.finalize(token, self._retire, shard)
+        self._local.token = token
+        self._local.shard = shard
+        return shard
+
+    def _retire(self, shard: S) -> None:
+        with self._lock:
+            self._merge(self._retired, shard)
+            # by identity, list.remove() compares shards by value
+            self._shards = [s for s in self._shards if s is not shard]
+
+    @contextmanager
+    def locked(self) -> Iterator[list[S]]:
+        """Hold the shards, the retired one included."""
+        with self._lock:
+            yield self._shards
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+
+def _new_counters() -> Samples:
+    return {name: {} for name in _COUNTERS}
+
+
+def _merge_counters(into: Samples, shard: Samples) -> None:
+    for name, counter in shard.items():
+        total = into[name]
+        for labels, value in counter.items():
+            total[labels] = total.get(labels, 0) + value
+
+
+class LoggingMetrics:
+    """Counters of the logging pipeline, cheap enough to leave on.
+
+    Every thread updates its own shard of counters, so the hot path takes
+    no lock; a snapshot adds the shards up.  Gauges such as queue and
+    buffer depth are read from the registered sources when a snapshot is
+    taken.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self._shards = ThreadShards(_new_counters, _merge_counters)
+        self._shard = self._shards.get
+        self._sources: weakref.WeakSet[MetricsSource] = weakref.WeakSet()
+
+    def inc(self, name: str, labels: tuple[str, ...], value: float = 1) -> None:
+        if not self.enabled:
+            return
+        counter = self._shard()[name]
+        counter[labels] = counter.get(labels, 0) + value
+
+    def observe_record(
+        self,
+        handler: str,
+        record: logging.LogRecord,
+        size: int,
+        format_seconds: float,
+    ) -> None:
+        shard = self._shard()
+        counter = shard[RECORDS]
+        labels: tuple[str, ...] = (handler, record.levelname, record.name)
+        counter[labels] = counter.get(labels, 0) + 1
+        labels = (handler,)
+        counter = shard[BYTES]
+        counter[labels] = counter.get(labels, 0) + size
+        counter = shard[FORMAT_SECONDS]
+        counter[labels] = counter.get(labels, 0) + format_seconds
+
+    def add_source(self, source: MetricsSource) -> None:
+        self._sources.add(source)
+
+    def remove_source(self, source: MetricsSource) -> None:
+        self._sources.discard(source)
+
+    def reset(self) -> None:
+        with self._shards.locked() as shards:
+            for shard in shards:
+                for counter in shard.values():
+                    counter.clear()
+
+    def snapshot(self) -> Samples:
+        """Return the current values by metric name and label values."""
+        samples: Samples = {name: {} for name in DEFINITIONS}
+        with self._shards.locked() as shards:
+            for shard in shards:
+                for name, counter in shard.items():
+                    total = samples[name]
+                    for labels, value in counter.copy().items():
+                        total[labels] = total.get(labels, 0) + value
+        for source in list(self._sources):
+            for name, labels, value in source.collect_metrics():
+                total = samples[name]
+                total[labels] = total.get(labels, 0) + value
+        return samples
+
+    def to_prometheus(self) -> str:
+        """Render a snapshot in the Prometheus text exposition format."""
+        lines = []
+        for name, values in self.snapshot().items():
+            kind, help_text, label_names = DEFINITIONS[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(values.items()):
+                pairs = ",".join(
+                    f'{label_name}="{_escape(label)}"'
+                    for label_name, label in zip(label_names, labels, strict=True)
+                )
+                series = f"{name}{{{pairs}}}" if pairs else name
+                lines.append(f"{series} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+# Log buckets: exact below 2**(_SUB_BITS + 1) ns, then 2**_SUB_BITS buckets
+# per power of two, so a bucket is at most 1/8 of its lower bound wide.
+_SUB_BITS = 3
+_EXACT = 1 << (_SUB_BITS + 1)
+
+
+def _bucket_index(value: int) -> int:
+    if value < _EXACT:
+        return max(value, 0)
+    shift = value.bit_length() - _SUB_BITS - 1
+    return (shift << _SUB_BITS) + (value >> shift)
+
+
+def _bucket_bounds(index: int) -> tuple[int, int]:
+    if index < _EXACT:
+        return index, index
+    shift = (index >> _SUB_BITS) - 1
+    mantissa = index - (shift << _SUB_BITS)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """Log-bucketed histogram of durations in nanoseconds.
+
+    Quantiles are accurate to about 6%.  Histograms of the same name
+    recorded in different threads or processes are combined by
+    :meth:`merge`.
+    """
+
+    __slots__ = ("buckets", "count", "errors", "sum")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.sum = 0
+        # bucket index -> count
+        self.buckets: dict[int, int] = {}
+
+    def record(self, value: int, error: bool = False) -> None:
+        self.count += 1
+        self.sum += value
+        if error:
+            self.errors += 1
+        index = _bucket_index(value)
+        buckets = self.buckets
+        buckets[index] = buckets.get(index, 0) + 1
+
+    def merge(self, other: Histogram) -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.sum += other.sum
+        buckets = self.buckets
+        for index, count in other.buckets.copy().items():
+            buckets[index] = buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        """Return the *q* quantile in seconds, NaN if nothing was recorded."""
+        if not self.count:
+            return math.nan
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        buckets = sorted(self.buckets.items())
+        for index, count in buckets:
+            seen += count
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                return (low + high) / 2 / 1e9
+        # Only reached if buckets were recorded while sorting them.
+        low, high = _bucket_bounds(buckets[-1][0])
+        return (low + high) / 2 / 1e9
+
+
+def _merge_histograms(into: dict[str, Histogram], shard: dict[str, Histogram]) -> None:
+    for name, histogram in shard.items():
+        total = into.get(name)
+        if total is None:
+            total = into[name] = Histogram()
+        total.merge(histogram)
+
+
+SPAN_SECONDS = "neuro_logging_span_seconds"
+SPAN_ERRORS = "neuro_logging_span_errors_total"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class SpanHistograms:
+    """Latency histograms of traced calls by span name.
+
+    ``trace``, ``trace_cm``, ``new_trace`` and ``new_trace_cm`` record
+    every call, sampled by Sentry or not.  Like :class:`LoggingMetrics`,
+    every thread records into its own shard without a lock; a snapshot
+    merges them.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self._shards = ThreadShards(dict[str, Histogram], _merge_histograms)
+        self._shard = self._shards.get
+
+    def record(self, name: str, duration: int, error: bool = False) -> None:
+        """Record a call of *name* that took *duration* nanoseconds."""
+        if not self.enabled:
+            return
+        shard = self._shard()
+        histogram = shard.get(name)
+        if histogram is None:
+            histogram = shard[name] = Histogram()
+        histogram.record(duration, error)
+
+    def reset(self) -> None:
+        with self._shards.locked() as shards:
+            for shard in shards:
+                shard.clear()
+
+    def snapshot(self) -> dict[str, Histogram]:
+        """Return the histograms of all threads merged by span name."""
+        histograms: dict[str, Histogram] = {}
+        with self._shards.locked() as shards:
+            for shard in shards:
+                _merge_histograms(histograms, shard.copy())
+        return histograms
+
+    def to_prometheus(self) -> str:
+        """Render a snapshot as Prometheus summaries."""
+        lines = [
+            f"# HELP {SPAN_SECONDS} Duration of traced calls.",
+            f"# TYPE {SPAN_SECONDS} summary",
+        ]
+        errors = [
+            f"# HELP {SPAN_ERRORS} Traced calls that raised an exception.",
+            f"# TYPE {SPAN_ERRORS} counter",
+        ]
+        for name, histogram in sorted(self.snapshot().items()):
+            label = f'span="{_escape(name)}"'
+            for q in QUANTILES:
+                value = histogram.quantile(q)
+                lines.append(f'{SPAN_SECONDS}{{{label},quantile="{q}"}} {value!r}')
+            lines.append(f"{SPAN_SECONDS}_sum{{{label}}} {histogram.sum / 1e9!r}")
+            lines.append(f"{SPAN_SECONDS}_count{{{label}}} {histogram.count}")
+            errors.append(f"{SPAN_ERRORS}{{{label}}} {float(histogram.errors)!r}")
+        return "\n".join(lines + errors) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+logging_metrics = LoggingMetrics()
+span_histograms = SpanHistograms()
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """aiohttp handler serving :data:`logging_metrics` and
+    :data:`span_histograms` to Prometheus, e.g.
+    ``app.router.add_get("/metrics/logging", metrics_handler)``.
+    """
+    from aiohttp import web
+
+    text = logging_metrics.to_prometheus() + span_histograms.to_prometheus()
+    return web.Response(
+        body=text.encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Mapping
+from typing import Any, Self
+
+
+_EMPTY: dict[str, Any] = {}
+
+
+class lazy:  # noqa: N801
+    """Mark a field of :class:`BoundLogger` to be computed by *func* only
+    for records that get logged.
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]) -> None:
+        self.func = func
+
+    def __call__(self) -> Any:
+        try:
+            return self.func()
+        except Exception as exc:
+            # A field is not worth losing the record over.
+            return f"<lazy field failed: {exc!r}>"
+
+    def __repr__(self) -> str:
+        return f"lazy({self.func!r})"
+
+
+class BoundLogger:
+    """Log events with key/value fields on top of a :class:`logging.Logger`.
+
+    The fields of a record are the context bound with :meth:`bind` updated
+    with the keyword arguments of the call; they end up in the ``extra``
+    record attribute, the ``jsonPayload`` of the JSON output.  Nothing is
+    done for disabled levels, and :class:`lazy` values are only computed
+    for enabled ones, before the record goes through filters and
+    handlers; other values, callables included, are logged as they are::
+
+        log = get_logger(__name__).bind(user=user.name)
+        log.debug("Job started", job=job.id, spec=lazy(job.spec.to_primitive))
+
+    The bound context is merged into a new dict only for calls that pass
+    fields or when it holds lazy values; otherwise records share it, so it
+    must not be modified by filters and handlers.
+    """
+
+    __slots__ = ("_context", "_lazy", "logger")
+
+    def __init__(
+        self, logger: logging.Logger, context: Mapping[str, Any] = _EMPTY
+    ) -> None:
+        self.logger = logger
+        self._context = dict(context)
+        self._lazy = any(isinstance(value, lazy) for value in self._context.values())
+
+    @property
+    def name(self) -> str:
+        return self.logger.name
+
+    @property
+    def context(self) -> Mapping[str, Any]:
+        return self._context
+
+    def bind(self, **fields: Any) -> Self:
+        """Return a logger adding *fields* to every record."""
+        return type(self)(self.logger, self._context | fields)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def _fields(self, fields: dict[str, Any]) -> dict[str, Any]:
+        if not fields:
+            if not self._lazy:
+                return self._context
+            return {
+                key: value() if isinstance(value, lazy) else value
+                for key, value in self._context.items()
+            }
+        fields = self._context | fields
+        for key, value in fields.items():
+            if isinstance(value, lazy):
+                fields[key] = value()
+        return fields
+
+    def _emit(
+        self,
+        level: int,
+        event: str,
+        args: tuple[Any, ...],
+        exc_info: Any,
+        stack_info: bool,
+        fields: dict[str, Any],
+    ) -> None:
+        # The caller of debug() and friends is two frames up.
+        self.logger._log(
+            level,
+            event,
+            args,
+            exc_info=exc_info,
+            extra={"extra": self._fields(fields)},
+            stack_info=stack_info,
+            stacklevel=3,
+        )
+
+    def log(
+        self,
+        level: int,
+        event: str,
+        *args: Any,
+        exc_info: Any = None,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(level):
+            self._emit(level, event, args, exc_info, stack_info, fields)
+
+    def debug(
+        self,
+        event: str,
+        *args: Any,
+        exc_info: Any = None,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, event, args, exc_info, stack_info, fields)
+
+    def info(
+        self,
+        event: str,
+        *args: Any,
+        exc_info: Any = None,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(logging.INFO):
+            self._emit(logging.INFO, event, args, exc_info, stack_info, fields)
+
+    def warning(
+        self,
+        event: str,
+        *args: Any,
+        exc_info: Any = None,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._emit(logging.WARNING, event, args, exc_info, stack_info, fields)
+
+    def error(
+        self,
+        event: str,
+        *args: Any,
+        exc_info: Any = None,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._emit(logging.ERROR, event, args, exc_info, stack_info, fields)
+
+    def exception(
+        self,
+        event: str,
+        *args: Any,
+        exc_info: Any = True,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._emit(logging.ERROR, event, args, exc_info, stack_info, fields)
+
+    def critical(
+        self,
+        event: str,
+        *args: Any,
+        exc_info: Any = None,
+        stack_info: bool = False,
+        **fields: Any,
+    ) -> None:
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            self._emit(logging.CRITICAL, event, args, exc_info, stack_info, fields)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name} {self._context!r}>"
+
+
+def get_logger(name: str | None = None, **fields: Any) -> BoundLogger:
+    """Return a :class:`BoundLogger` for the :func:`logging.getLogger` logger
+    *name*, with *fields* bound.
+    """
+    return BoundLogger(logging.getLogger(name), fields)
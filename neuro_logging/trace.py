@@ -1,54 +1,466 @@
 import asyncio
+import atexit
+import concurrent.futures
+import contextvars
 import functools
 import inspect
+import itertools
 import logging
-from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
-from contextlib import asynccontextmanager
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Generator,
+    Iterable,
+    Iterator,
+    Mapping,
+)
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import (
+    AbstractAsyncContextManager,
+    AbstractContextManager,
+    asynccontextmanager,
+    contextmanager,
+    nullcontext,
+)
+from datetime import datetime, timedelta
 from importlib.metadata import version
+from types import TracebackType
 from typing import Any, cast
 
 import aiohttp
 import sentry_sdk
 from sentry_sdk.integrations.aiohttp import AioHttpIntegration
-from sentry_sdk.types import Event, Hint
-from yarl import URL
+from sentry_sdk.tracing import Transaction
+from sentry_sdk.types import Event, Hint, SamplingContext
 
 from .config import EnvironConfigFactory
+from .context import bind_trace_ids, enter_span, exit_span
+from .health import HealthCheckMatcher
+from .metrics import span_histograms
+from .transport import SpoolTransport
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+class _SpanBuffer:
+    """Spans of an unsampled transaction, kept by :class:`TailSampler`.
+
+    Holds up to *capacity* spans in preallocated arrays; spans started
+    once it is full are only counted.  Buffers are reused, so spans are
+    only recorded for the *generation* they were started in: tasks
+    spawned by a transaction may outlive it.
+    """
+
+    __slots__ = (
+        "_next",
+        "ends",
+        "errors",
+        "failed",
+        "generation",
+        "names",
+        "origin",
+        "parents",
+        "starts",
+    )
+
+    def __init__(self, capacity: int) -> None:
+        self.names: list[str | None] = [None] * capacity
+        self.starts = array("q", bytes(8 * capacity))
+        self.ends = array("q", bytes(8 * capacity))
+        self.parents = array("i", bytes(4 * capacity))
+        self.errors = bytearray(capacity)
+        self.failed = False
+        self.origin = 0
+        self.generation = 0
+        # Atomic under the GIL, spans may start in executor threads.
+        self._next = itertools.count().__next__
+
+    def reset(self) -> None:
+        self._next = itertools.count().__next__
+        self.failed = False
+        self.origin = time.perf_counter_ns()
+
+    def start(self, generation: int, name: str, parent: int) -> int:
+        if generation != self.generation:
+            return -1
+        index = self._next()
+        if index >= len(self.names):
+            return -1
+        self.names[index] = name
+        self.starts[index] = time.perf_counter_ns()
+        self.ends[index] = 0
+        self.parents[index] = parent
+        self.errors[index] = 0
+        return index
+
+    def finish(self, generation: int, index: int, error: bool) -> None:
+        if generation != self.generation:
+            return
+        if error:
+            self.failed = True
+        if index >= 0:
+            self.ends[index] = time.perf_counter_ns()
+            self.errors[index] = error
+
+    def close(self) -> int:
+        """Stop recording and return the number of spans started."""
+        self.generation += 1
+        return self._next()
+
+
+# Buffer of the unsampled transaction, its generation and index of the
+# innermost span.
+_tail_spans: contextvars.ContextVar[tuple[_SpanBuffer, int, int] | None] = (
+    contextvars.ContextVar("neuro_logging_tail_spans", default=None)
+)
+
+
+class TailSampler:
+    """Keep unsampled transactions that turn out slow or failed.
+
+    While an unsampled transaction started by ``new_trace`` or
+    ``new_trace_cm`` runs, ``trace`` and ``trace_cm`` record their spans
+    into a buffer of at most *max_spans* spans, about 30 bytes each,
+    instead of skipping them.  If the transaction took at least
+    *threshold* seconds or raised an exception, it is sent to Sentry with
+    these spans, as it is if any of the spans raised an exception;
+    otherwise the buffer is reused by the next transaction.
+    """
+
+    def __init__(self, threshold: float, max_spans: int = 100) -> None:
+        self.threshold = threshold
+        self.max_spans = max_spans
+        self._free: list[_SpanBuffer] = []
+
+    def acquire(self) -> _SpanBuffer:
+        try:
+            buffer = self._free.pop()
+        except IndexError:
+            buffer = _SpanBuffer(self.max_spans)
+        buffer.reset()
+        return buffer
+
+    def release(
+        self,
+        buffer: _SpanBuffer,
+        transaction: Transaction,
+        failed: bool,
+        scope: sentry_sdk.Scope,
+    ) -> None:
+        count = buffer.close()
+        # Unsampled transactions are not given an end timestamp.
+        elapsed = time.perf_counter_ns() - buffer.origin
+        try:
+            if failed or buffer.failed or elapsed >= self.threshold * 1e9:
+                end = transaction.start_timestamp + timedelta(
+                    microseconds=elapsed / 1000
+                )
+                self._send(buffer, count, transaction, end, scope)
+        finally:
+            if len(self._free) < 64:
+                self._free.append(buffer)
+
+    def _send(
+        self,
+        buffer: _SpanBuffer,
+        count: int,
+        transaction: Transaction,
+        end: datetime,
+        scope: sentry_sdk.Scope,
+    ) -> None:
+        start = transaction.start_timestamp
+
+        def timestamp(ns: int) -> datetime:
+            if not ns:  # still running
+                return end
+            return start + timedelta(microseconds=(ns - buffer.origin) / 1000)
+
+        kept = Transaction(
+            name=transaction.name,
+            op=transaction.op,
+            source=transaction.source,
+            trace_id=transaction.trace_id,
+            span_id=transaction.span_id,
+            sampled=True,
+            start_timestamp=start,
+        )
+        scope.start_transaction(kept)
+        kept.set_tag("sampling", "tail")
+        if count > self.max_spans:
+            kept.set_data("dropped_spans", count - self.max_spans)
+        spans: list[sentry_sdk.tracing.Span] = []
+        for index in range(min(count, self.max_spans)):
+            parent_index = buffer.parents[index]
+            # A parent always starts first; anything else is not to be
+            # trusted.
+            parent = spans[parent_index] if 0 <= parent_index < index else kept
+            span = parent.start_child(
+                op="call",
+                name=buffer.names[index],
+                start_timestamp=timestamp(buffer.starts[index]),
+            )
+            if buffer.errors[index]:
+                span.set_status("internal_error")
+            span.finish(end_timestamp=timestamp(buffer.ends[index]))
+            spans.append(span)
+        if transaction.status is not None:
+            kept.set_status(transaction.status)
+        kept.finish(scope, end_timestamp=end)
+
+
+# Set up by setup_sentry() from SENTRY_TAIL_THRESHOLD.
+tail_sampler: TailSampler | None = None
+
+
+class _TailSpan:
+    """Record a span of an unsampled transaction for :class:`TailSampler`."""
+
+    __slots__ = ("_buffer", "_generation", "_index", "_name", "_token")
+
+    def __init__(self, state: tuple[_SpanBuffer, int, int], name: str) -> None:
+        self._buffer, self._generation, self._index = state
+        self._name = name
+
+    def __enter__(self) -> None:
+        buffer = self._buffer
+        generation = self._generation
+        self._index = buffer.start(generation, self._name, self._index)
+        self._token = _tail_spans.set((buffer, generation, self._index))
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        _tail_spans.reset(self._token)
+        self._buffer.finish(self._generation, self._index, isinstance(exc, Exception))
+
+
+_NO_TAIL_SPAN: AbstractContextManager[None] = nullcontext()
+
+
+def _tail_span(name: str) -> AbstractContextManager[None]:
+    state = _tail_spans.get()
+    if state is None:
+        return _NO_TAIL_SPAN
+    return _TailSpan(state, name)
+
+
+@contextmanager
+def _new_sentry_trace(name: str, sampled: bool) -> Iterator[sentry_sdk.tracing.Span]:
+    with sentry_sdk.isolation_scope() as scope:
+        scope.clear_breadcrumbs()
+        sampler = tail_sampler
+        buffer = token = None
+        failed = False
+        try:
+            with (
+                scope.start_transaction(name=name, sampled=sampled) as transaction,
+                bind_trace_ids(transaction.trace_id, transaction.span_id),
+            ):
+                if (
+                    sampler is not None
+                    and isinstance(transaction, Transaction)
+                    and not transaction.sampled
+                ):
+                    unsampled = transaction
+                    buffer = sampler.acquire()
+                    token = _tail_spans.set((buffer, buffer.generation, -1))
+                try:
+                    yield transaction
+                except asyncio.CancelledError:
+                    transaction.set_status("cancelled")
+                    raise
+                except Exception as exc:
+                    failed = True
+                    scope.capture_exception(error=exc)
+                    raise
+        finally:
+            if token is not None:
+                _tail_spans.reset(token)
+            if buffer is not None:
+                assert sampler is not None
+                sampler.release(buffer, unsampled, failed, scope)
+
+
 @asynccontextmanager
 async def new_sentry_trace_cm(
     name: str, sampled: bool
 ) -> AsyncIterator[sentry_sdk.tracing.Span]:
-    with sentry_sdk.isolation_scope() as scope:
-        scope.clear_breadcrumbs()
+    with _new_sentry_trace(name, sampled) as transaction:
+        yield transaction
 
-        with scope.start_transaction(name=name, sampled=sampled) as transaction:
-            try:
-                yield transaction
-            except asyncio.CancelledError:
-                transaction.set_status("cancelled")
-                raise
-            except Exception as exc:
-                scope.capture_exception(error=exc)
-                raise
+
+def _tracing_enabled() -> bool:
+    return sentry_sdk.get_client().is_active()
+
+
+def _span_sampled() -> bool:
+    # Same lookup as sentry_sdk.start_span(): transactions started by
+    # new_trace live on the isolation scope.
+    span = sentry_sdk.get_current_scope().span or sentry_sdk.get_isolation_scope().span
+    return span is not None and span.sampled is True
+
+
+def _capture_exception(exc: BaseException) -> None:
+    if _tracing_enabled():
+        sentry_sdk.get_current_scope().capture_exception(error=exc)
+
+
+class _UntracedCM:
+    """Stand-in for trace_cm outside of a sampled transaction.
+
+    No span is started; exceptions are still reported, like the span
+    context manager does.
+    """
+
+    __slots__ = ()
+
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if isinstance(exc, Exception):
+            _capture_exception(exc)
+
+
+_UNTRACED_CM = _UntracedCM()
+
+
+class _UntracedTailCM(_UntracedCM):
+    """:class:`_UntracedCM` recording a span for :class:`TailSampler`."""
+
+    __slots__ = ("_span",)
+
+    def __init__(self, span: _TailSpan) -> None:
+        self._span = span
+
+    async def __aenter__(self) -> None:
+        self._span.__enter__()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self._span.__exit__(exc_type, exc, tb)
+        await super().__aexit__(exc_type, exc, tb)
+
+
+class _Timed:
+    """Record the duration of a traced call in :data:`span_histograms`.
+
+    Used as a context manager around the call, or wrapping the context
+    manager *cm* of ``trace_cm`` and ``new_trace_cm``.
+    """
+
+    __slots__ = ("_cm", "_name", "_start")
+
+    def __init__(
+        self, name: str, cm: AbstractAsyncContextManager[None] | None = None
+    ) -> None:
+        self._name = name
+        self._cm = cm
+        self._start = 0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter_ns()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        span_histograms.record(
+            self._name,
+            time.perf_counter_ns() - self._start,
+            isinstance(exc, Exception),
+        )
+
+    async def __aenter__(self) -> None:
+        assert self._cm is not None
+        self._start = time.perf_counter_ns()
+        await self._cm.__aenter__()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        assert self._cm is not None
+        try:
+            return await self._cm.__aexit__(exc_type, exc, tb)
+        finally:
+            self.__exit__(exc_type, exc, tb)
+
+
+class _NamedSpan:
+    """Make the span of ``trace_cm``/``new_trace_cm`` the one of the
+    current task for :class:`~neuro_logging.watchdog.LoopWatchdog`.
+    """
+
+    __slots__ = ("_cm", "_name", "_state")
+
+    def __init__(self, name: str, cm: AbstractAsyncContextManager[None]) -> None:
+        self._name = name
+        self._cm = cm
+        self._state: Any = None
+
+    async def __aenter__(self) -> None:
+        await self._cm.__aenter__()
+        self._state = enter_span(self._name)
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        exit_span(self._state)
+        return await self._cm.__aexit__(exc_type, exc, tb)
 
 
 @asynccontextmanager
-async def new_trace_cm(name: str, sampled: bool = False) -> AsyncIterator[None]:
+async def _new_trace_cm(name: str, sampled: bool) -> AsyncIterator[None]:
     async with new_sentry_trace_cm(name, sampled):
         yield
 
 
-@asynccontextmanager
-async def sentry_trace_cm(
+def new_trace_cm(name: str, sampled: bool = False) -> AbstractAsyncContextManager[None]:
+    cm: AbstractAsyncContextManager[None]
+    if not _tracing_enabled():
+        cm = nullcontext()
+    else:
+        cm = _new_trace_cm(name, sampled)
+    cm = _NamedSpan(name, cm)
+    if span_histograms.enabled:
+        return _Timed(name, cm)
+    return cm
+
+
+@contextmanager
+def _sentry_span(
     name: str,
     tags: Mapping[str, str] | None = None,
     data: Mapping[str, Any] | None = None,
-) -> AsyncIterator[sentry_sdk.tracing.Span | None]:
+) -> Iterator[sentry_sdk.tracing.Span]:
     with sentry_sdk.start_span(op="call", name=name) as child:
         if tags:
             for key, value in tags.items():
@@ -57,7 +469,8 @@ async def sentry_trace_cm(
             for key, value in data.items():
                 child.set_data(key, value)
         try:
-            yield child
+            with bind_trace_ids(child.trace_id, child.span_id):
+                yield child
         except asyncio.CancelledError:
             child.set_status("cancelled")
             raise
@@ -67,58 +480,222 @@ async def sentry_trace_cm(
 
 
 @asynccontextmanager
-async def trace_cm(
+async def sentry_trace_cm(
     name: str,
     tags: Mapping[str, str] | None = None,
-    data: Mapping[str, str] | None = None,
+    data: Mapping[str, Any] | None = None,
+) -> AsyncIterator[sentry_sdk.tracing.Span | None]:
+    with _sentry_span(name, tags, data) as child:
+        yield child
+
+
+@asynccontextmanager
+async def _trace_cm(
+    name: str,
+    tags: Mapping[str, str] | None,
+    data: Mapping[str, str] | None,
 ) -> AsyncIterator[None]:
     async with sentry_trace_cm(name, tags=tags, data=data):
         yield
 
 
-def trace[T: Callable[..., Awaitable[Any]]](func: T) -> T:
-    async def _tracer(*args: Any, **kwargs: Any) -> Any:
-        name = func.__qualname__
-        async with trace_cm(name):
-            return await func(*args, **kwargs)
+def trace_cm(
+    name: str,
+    tags: Mapping[str, str] | None = None,
+    data: Mapping[str, str] | None = None,
+) -> AbstractAsyncContextManager[None]:
+    cm: AbstractAsyncContextManager[None]
+    if not _span_sampled():
+        state = _tail_spans.get()
+        cm = _UNTRACED_CM if state is None else _UntracedTailCM(_TailSpan(state, name))
+    else:
+        cm = _trace_cm(name, tags, data)
+    cm = _NamedSpan(name, cm)
+    if span_histograms.enabled:
+        return _Timed(name, cm)
+    return cm
 
-    @functools.wraps(func)
-    async def tracer(*args: Any, **kwargs: Any) -> Any:
-        # Create a task to wrap method call to avoid scope data leakage between calls.
-        return await asyncio.create_task(_tracer(*args, **kwargs))
 
-    return cast(T, tracer)
+class _ContextIsolated[R]:
+    """Run a coroutine in a copy of the current context.
+
+    Gives the same scope isolation as wrapping the coroutine in a task:
+    Sentry scopes live in context variables, so changes made by the
+    coroutine do not leak to the caller.  Unlike a task there is no
+    allocation of a Task object and no extra event loop iteration.
+    """
 
+    __slots__ = ("_context", "_coro")
+
+    def __init__(self, coro: Coroutine[Any, Any, R]) -> None:
+        self._coro = coro
+        self._context = contextvars.copy_context()
+
+    def __await__(self) -> Generator[Any, Any, R]:
+        coro = self._coro
+        run = self._context.run
+        value: Any = None
+        error: BaseException | None = None
+        while True:
+            try:
+                if error is None:
+                    future = run(coro.send, value)
+                else:
+                    future = run(coro.throw, error)
+            except StopIteration as exc:
+                return cast(R, exc.value)
+            value = error = None
+            try:
+                value = yield future
+            except GeneratorExit:
+                run(coro.close)
+                raise
+            except BaseException as exc:
+                error = exc
+
+
+def trace[T: Callable[..., Any]](func: T) -> T:
+    """Record calls of *func* as spans of the current transaction.
+
+    *func* may be a coroutine function or a plain function.
+    """
+    name = func.__qualname__
+
+    if not inspect.iscoroutinefunction(func):
+
+        def sync_call(*args: Any, **kwargs: Any) -> Any:
+            if not _tracing_enabled():
+                return func(*args, **kwargs)
+            if not _span_sampled():
+                try:
+                    with _tail_span(name):
+                        return func(*args, **kwargs)
+                except Exception as exc:
+                    _capture_exception(exc)
+                    raise
+            with sentry_sdk.new_scope(), _sentry_span(name):
+                return func(*args, **kwargs)
+
+        @functools.wraps(func)
+        def sync_tracer(*args: Any, **kwargs: Any) -> Any:
+            state = enter_span(name)
+            try:
+                if span_histograms.enabled:
+                    with _Timed(name):
+                        return sync_call(*args, **kwargs)
+                return sync_call(*args, **kwargs)
+            finally:
+                exit_span(state)
+
+        return cast(T, sync_tracer)
 
-def new_trace[T: Callable[..., Awaitable[Any]]](func: T) -> T:
     async def _tracer(*args: Any, **kwargs: Any) -> Any:
-        name = func.__qualname__
-        async with new_trace_cm(name):
-            return await func(*args, **kwargs)
+        with sentry_sdk.new_scope():
+            async with sentry_trace_cm(name):
+                return await func(*args, **kwargs)
+
+    async def _untraced(*args: Any, **kwargs: Any) -> Any:
+        # No span would be recorded, only report exceptions.
+        with sentry_sdk.new_scope(), _tail_span(name):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as exc:
+                _capture_exception(exc)
+                raise
+
+    def call(*args: Any, **kwargs: Any) -> Awaitable[Any]:
+        # Isolate the context to avoid scope data leakage between calls;
+        # without a Sentry client there are no scopes to fork.
+        if not _tracing_enabled():
+            return _ContextIsolated(func(*args, **kwargs))
+        if not _span_sampled():
+            return _ContextIsolated(_untraced(*args, **kwargs))
+        return _ContextIsolated(_tracer(*args, **kwargs))
 
     @functools.wraps(func)
     async def tracer(*args: Any, **kwargs: Any) -> Any:
-        # Create a task to wrap method call to avoid scope data leakage between calls.
-        return await asyncio.create_task(_tracer(*args, **kwargs))
+        state = enter_span(name)
+        try:
+            if span_histograms.enabled:
+                with _Timed(name):
+                    return await call(*args, **kwargs)
+            return await call(*args, **kwargs)
+        finally:
+            exit_span(state)
 
     return cast(T, tracer)
 
 
-def new_sampled_trace[T: Callable[..., Awaitable[Any]]](func: T) -> T:
+def _new_trace[T: Callable[..., Any]](func: T, sampled: bool) -> T:
+    name = func.__qualname__
+
+    if not inspect.iscoroutinefunction(func):
+
+        def sync_call(*args: Any, **kwargs: Any) -> Any:
+            if not _tracing_enabled():
+                return func(*args, **kwargs)
+            with _new_sentry_trace(name, sampled):
+                return func(*args, **kwargs)
+
+        @functools.wraps(func)
+        def sync_tracer(*args: Any, **kwargs: Any) -> Any:
+            state = enter_span(name)
+            try:
+                if span_histograms.enabled:
+                    with _Timed(name):
+                        return sync_call(*args, **kwargs)
+                return sync_call(*args, **kwargs)
+            finally:
+                exit_span(state)
+
+        return cast(T, sync_tracer)
+
     async def _tracer(*args: Any, **kwargs: Any) -> Any:
-        name = func.__qualname__
-        async with new_trace_cm(name, sampled=True):
+        async with new_sentry_trace_cm(name, sampled):
             return await func(*args, **kwargs)
 
+    def call(*args: Any, **kwargs: Any) -> Awaitable[Any]:
+        # Isolate the context to avoid scope data leakage between calls;
+        # without a Sentry client there are no scopes to fork.
+        if not _tracing_enabled():
+            return _ContextIsolated(func(*args, **kwargs))
+        return _ContextIsolated(_tracer(*args, **kwargs))
+
     @functools.wraps(func)
     async def tracer(*args: Any, **kwargs: Any) -> Any:
-        # Create a task to wrap method call to avoid scope data leakage between calls.
-        return await asyncio.create_task(_tracer(*args, **kwargs))
+        state = enter_span(name)
+        try:
+            if span_histograms.enabled:
+                with _Timed(name):
+                    return await call(*args, **kwargs)
+            return await call(*args, **kwargs)
+        finally:
+            exit_span(state)
 
     return cast(T, tracer)
 
 
-def notrace[T: Callable[..., Awaitable[Any]]](func: T) -> T:
+def new_trace[T: Callable[..., Any]](func: T) -> T:
+    return _new_trace(func, sampled=False)
+
+
+def new_sampled_trace[T: Callable[..., Any]](func: T) -> T:
+    return _new_trace(func, sampled=True)
+
+
+def notrace[T: Callable[..., Any]](func: T) -> T:
+    if not inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        def sync_tracer(*args: Any, **kwargs: Any) -> Any:
+            with sentry_sdk.new_scope() as scope:
+                transaction = scope.transaction
+                if transaction is not None:
+                    transaction.sampled = False
+                return func(*args, **kwargs)
+
+        return cast(T, sync_tracer)
+
     @functools.wraps(func)
     async def tracer(*args: Any, **kwargs: Any) -> Any:
         with sentry_sdk.new_scope() as scope:
@@ -130,17 +707,269 @@ def notrace[T: Callable[..., Awaitable[Any]]](func: T) -> T:
     return cast(T, tracer)
 
 
+# Executors running calls in another process or interpreter, the context
+# of the caller cannot be passed along.
+_ISOLATED_EXECUTORS: tuple[type[Executor], ...] = (ProcessPoolExecutor,)
+if sys.version_info >= (3, 14):
+    _ISOLATED_EXECUTORS += (concurrent.futures.InterpreterPoolExecutor,)
+
+
+def _continue_trace[R](
+    headers: dict[str, str | None], name: str, func: Callable[..., R], *args: Any
+) -> R:
+    if not _tracing_enabled() or not headers.get("sentry-trace"):
+        return func(*args)
+    with sentry_sdk.isolation_scope():
+        transaction = sentry_sdk.continue_trace(headers, op="executor", name=name)
+        with sentry_sdk.start_transaction(transaction):
+            return func(*args)
+
+
+async def run_in_executor[R](
+    executor: Executor | None, func: Callable[..., R], /, *args: Any
+) -> R:
+    """Traced counterpart of ``loop.run_in_executor()``.
+
+    The call is recorded as a span of the current transaction.  In a thread
+    pool *func* runs in a copy of the caller's context, so spans recorded
+    there, e.g. by sync functions decorated with :func:`trace`, attach to
+    the caller's transaction.  In a process pool, which must have Sentry
+    set up too, the trace is continued by a transaction of the worker.
+    """
+    loop = asyncio.get_running_loop()
+    name = getattr(func, "__qualname__", None) or repr(func)
+    async with trace_cm(name):
+        if isinstance(executor, _ISOLATED_EXECUTORS):
+            headers = {
+                "sentry-trace": sentry_sdk.get_traceparent(),
+                "baggage": sentry_sdk.get_baggage(),
+            }
+            call = functools.partial(_continue_trace, headers, name, func, *args)
+        else:
+            call = functools.partial(contextvars.copy_context().run, func, *args)
+        return await loop.run_in_executor(executor, call)
+
+
 def before_send_transaction(
-    event: Event, hint: Hint, *, health_check_url_path: str
+    event: Event, hint: Hint, *, matcher: HealthCheckMatcher
 ) -> Event | None:
-    url = URL(event["request"]["url"])  # type: ignore[arg-type]
+    request = event.get("request")
+    url = request.get("url") if request else None
 
-    if url.path == health_check_url_path:
+    if isinstance(url, str) and matcher.match_url(url):
         return None
 
     return event
 
 
+class EventCoalescer:
+    """Coalesce storms of identical error events before they are sent.
+
+    Events are fingerprinted by the exception type and the innermost
+    *frames* traceback frames.  Within *window* seconds only the first
+    *cap* events of a fingerprint are forwarded, the rest are counted.
+    The count is attached to the next forwarded event of the fingerprint
+    as the ``coalesced_occurrences`` extra, or, if the error does not
+    recur, reported by an aggregate message once the window is over: a
+    timer thread sweeps the counts of expired windows, and :meth:`flush`
+    reports the pending ones right away, e.g. at exit.
+    """
+
+    def __init__(self, window: float = 60.0, cap: int = 1, frames: int = 5) -> None:
+        self.window = window
+        self.cap = cap
+        self.frames = frames
+        # fingerprint -> [window start, forwarded, suppressed]
+        self._seen: dict[tuple[Any, ...], list[Any]] = {}
+        self._next_sweep = time.monotonic() + window
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def _fingerprint(self, hint: Hint) -> tuple[Any, ...] | None:
+        exc_info = hint.get("exc_info")
+        if not exc_info or exc_info[0] is None:
+            return None
+        exc_type, _, tb = exc_info
+        frames: deque[tuple[Any, int]] = deque(maxlen=self.frames)
+        while tb is not None:
+            frames.append((tb.tb_frame.f_code, tb.tb_lineno))
+            tb = tb.tb_next
+        return (exc_type, *frames)
+
+    def __call__(self, event: Event, hint: Hint) -> Event | None:
+        fingerprint = self._fingerprint(hint)
+        if fingerprint is None:
+            return event
+        now = time.monotonic()
+        expired: list[tuple[tuple[Any, ...], int]] = []
+        with self._lock:
+            state = self._seen.get(fingerprint)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    event.setdefault("extra", {})["coalesced_occurrences"] = state[2]
+                self._seen[fingerprint] = [now, 1, 0]
+                result: Event | None = event
+            elif state[1] < self.cap:
+                state[1] += 1
+                result = event
+            else:
+                state[2] += 1
+                result = None
+                self._schedule(state[0] + self.window - now)
+            if now >= self._next_sweep:
+                expired = self._sweep(now)
+        self._report(expired)
+        return result
+
+    def _schedule(self, delay: float) -> None:
+        # A timer thread does not survive fork(), hence the is_alive() check.
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.name = "neuro-logging-coalescer"
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._timer = None
+            expired = self._sweep(now)
+            pending = [state[0] for state in self._seen.values() if state[2]]
+            if pending:
+                self._schedule(min(pending) + self.window - now)
+        self._report(expired)
+
+    def _sweep(self, now: float) -> list[tuple[tuple[Any, ...], int]]:
+        self._next_sweep = now + self.window
+        expired = []
+        for fingerprint, state in list(self._seen.items()):
+            if now - state[0] < self.window:
+                continue
+            del self._seen[fingerprint]
+            if state[2]:
+                expired.append((fingerprint, state[2]))
+        return expired
+
+    def flush(self) -> None:
+        """Report the suppressed events of the windows that are not over."""
+        with self._lock:
+            pending = []
+            for fingerprint, state in self._seen.items():
+                if state[2]:
+                    pending.append((fingerprint, state[2]))
+                    state[2] = 0
+        self._report(pending)
+
+    def close(self) -> None:
+        """Stop the timer; suppressed events are no longer reported."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _report(self, counts: list[tuple[tuple[Any, ...], int]]) -> None:
+        for fingerprint, count in counts:
+            exc_type = fingerprint[0]
+            sentry_sdk.capture_message(
+                f"{exc_type.__qualname__}: {count} similar events "
+                f"suppressed in {self.window:g}s",
+                level="warning",
+                extras={"coalesced_occurrences": count},
+            )
+
+
+class AdaptiveSampler:
+    """Sample transactions with per-name rates under a global budget.
+
+    *rates* maps transaction names to sample rates.  aiohttp request
+    transactions are still unnamed when sampled, for them keys like
+    ``"GET /api/v1/jobs"`` match the request method and path prefix.
+    Other transactions are sampled at *default_rate*.
+
+    With a *budget* of sampled transactions per second, the rates are
+    adjusted every *interval* seconds from the transaction counts of the
+    previous interval: the budget is shared out so that rarely seen
+    transactions keep their rate and only the busiest ones are throttled.
+    Within an interval the expected number of sampled transactions never
+    exceeds the budget, which bounds the overhead under load spikes.
+    Parent sampling decisions and forced sampling (``new_sampled_trace``)
+    take precedence.
+    """
+
+    def __init__(
+        self,
+        default_rate: float = 0.1,
+        rates: Mapping[str, float] | None = None,
+        *,
+        budget: float = 0.0,
+        interval: float = 5.0,
+        max_names: int = 1000,
+    ) -> None:
+        self.default_rate = default_rate
+        self.rates = dict(rates or {})
+        self.budget = budget
+        self.interval = interval
+        self.max_names = max_names
+        self._prefixes = sorted(self.rates, key=len, reverse=True)
+        self._counts: dict[str, int] = {}
+        self._scales: dict[str, float] = {}
+        self._spent = 0.0
+        self._started = time.monotonic()
+
+    def _key(self, sampling_context: SamplingContext) -> str:
+        request = sampling_context.get("aiohttp_request")
+        if request is not None:
+            target = f"{request.method} {request.path}"
+            for prefix in self._prefixes:
+                if target.startswith(prefix):
+                    return prefix
+            # unmatched requests share the default bucket
+            return ""
+        transaction_context = sampling_context.get("transaction_context") or {}
+        return transaction_context.get("name") or ""
+
+    def __call__(self, sampling_context: SamplingContext) -> float:
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+        key = self._key(sampling_context)
+        if not self.budget:
+            return self.rates.get(key, self.default_rate)
+        now = time.monotonic()
+        if now - self._started >= self.interval:
+            self._adjust(now)
+        counts = self._counts
+        if key not in counts and len(counts) >= self.max_names:
+            key = ""
+        counts[key] = counts.get(key, 0) + 1
+        rate = self.rates.get(key, self.default_rate) * self._scales.get(key, 1.0)
+        if self._spent + rate > self.budget * self.interval:
+            return 0.0
+        self._spent += rate
+        return rate
+
+    def _adjust(self, now: float) -> None:
+        elapsed = now - self._started
+        # expected sampled transactions per second at the configured rates
+        demands = sorted(
+            (count * self.rates.get(key, self.default_rate) / elapsed, key)
+            for key, count in self._counts.items()
+        )
+        scales = {}
+        remaining = self.budget
+        for i, (demand, key) in enumerate(demands):
+            share = remaining / (len(demands) - i)
+            if demand > share:
+                scales[key] = share / demand
+                demand = share
+            remaining -= demand
+        self._scales = scales
+        self._counts = {}
+        self._spent = 0.0
+        self._started = now
+
+
 def _find_caller_version(stacklevel: int) -> str:
     caller = inspect.currentframe()
     assert caller is not None
@@ -156,6 +985,8 @@ def _find_caller_version(stacklevel: int) -> str:
 def setup_sentry(
     *,
     health_check_url_path: str = "/api/v1/ping",
+    health_check_url_paths: Iterable[str] = (),
+    health_check_url_prefixes: Iterable[str] = (),
     ignore_errors: Iterable[type[BaseException] | str] = (),
 ) -> None:  # pragma: no cover
     config = EnvironConfigFactory().create_sentry()
@@ -169,16 +1000,54 @@ def setup_sentry(
         aiohttp.ServerConnectionError,
         ConnectionResetError,
     )
+    coalescer = (
+        EventCoalescer(config.error_window, config.error_cap)
+        if config.error_window > 0
+        else None
+    )
     sentry_sdk.init(
         dsn=str(config.dsn) or None,
         traces_sample_rate=config.sample_rate,
+        traces_sampler=(
+            AdaptiveSampler(
+                config.sample_rate,
+                config.sample_rates,
+                budget=config.traces_budget,
+            )
+            if config.sample_rates or config.traces_budget > 0
+            else None
+        ),
         integrations=[AioHttpIntegration(transaction_style="method_and_path_pattern")],
         ignore_errors=ignore_errors,
         before_send_transaction=functools.partial(
-            before_send_transaction, health_check_url_path=health_check_url_path
+            before_send_transaction,
+            matcher=HealthCheckMatcher(
+                (health_check_url_path, *health_check_url_paths),
+                health_check_url_prefixes,
+            ),
         ),
+        before_send=coalescer,
         release=_find_caller_version(2),
         environment=config.cluster_name,
+        transport=(
+            SpoolTransport(
+                {"dsn": config.dsn},
+                path=config.spool_dir,
+                max_bytes=config.spool_max_bytes,
+            )
+            if config.spool_dir
+            else None
+        ),
+    )
+    if coalescer is not None:
+        # Registered after sentry_sdk.init(), so that it runs before the
+        # exit handler of Sentry flushes the client.
+        atexit.register(coalescer.flush)
+    global tail_sampler
+    tail_sampler = (
+        TailSampler(config.tail_threshold, config.tail_max_spans)
+        if config.tail_threshold is not None
+        else None
     )
     if config.app_name:
         sentry_sdk.set_tag("app", config.app_name)
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import fcntl
+import gzip
+import itertools
+import logging
+import os
+import struct
+import threading
+import weakref
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import urllib3
+from sentry_sdk.consts import VERSION, EndpointType
+from sentry_sdk.envelope import Envelope
+from sentry_sdk.transport import Transport
+
+from .metrics import (
+    SENTRY_DROPPED,
+    SENTRY_SENT,
+    SENTRY_SPOOL_BYTES,
+    SENTRY_SPOOL_ENVELOPES,
+    logging_metrics,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+_SUFFIX = ".spool"
+_CURSOR = "cursor"
+_LOCK = "lock"
+
+
+class SpoolTransport(Transport):
+    """Sentry transport spooling envelopes to append-only files on disk.
+
+    Envelopes are appended to segment files in *path* and survive network
+    outages and restarts.  A sender thread drains the spool every
+    *flush_interval* seconds, or as soon as *batch_size* envelopes are
+    pending: it reads up to *batch_size* envelopes at a time and sends
+    them gzip compressed, one request per envelope as the Sentry envelope
+    endpoint expects, back to back over one pooled connection.  Sent
+    segments are removed.  Failed sends are retried with exponential backoff up to
+    *max_backoff* seconds, honouring ``Retry-After``.  The spool holds at
+    most *max_bytes*; envelopes that do not fit, and envelopes rejected
+    by Sentry, are dropped and counted.
+
+    Processes sharing *path*, such as prefork workers, each spool to a
+    numbered subdirectory they hold an exclusive ``flock`` on.  A new
+    process claims the first subdirectory that is not locked, so the
+    envelopes left behind by an exited process are sent by its successor.
+    """
+
+    def __init__(
+        self,
+        options: dict[str, Any],
+        *,
+        path: str | os.PathLike[str],
+        max_bytes: int = 64 * 1024 * 1024,
+        segment_bytes: int = 1024 * 1024,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: float = 10.0,
+    ) -> None:
+        super().__init__(options)
+        assert self.parsed_dsn is not None
+        auth = self.parsed_dsn.to_auth(f"sentry.python/{VERSION}")
+        self._url = auth.get_api_url(EndpointType.ENVELOPE)
+        self._headers = {
+            "User-Agent": str(auth.client),
+            "X-Sentry-Auth": auth.to_header(),
+            "Content-Type": "application/x-sentry-envelope",
+            "Content-Encoding": "gzip",
+        }
+        self.root = Path(path)
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.dropped = 0
+        self.sent = 0
+        self._pool = urllib3.PoolManager(
+            num_pools=1,
+            maxsize=1,
+            retries=False,
+            timeout=urllib3.Timeout(total=timeout),
+        )
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._start()
+        _fork_aware_transports.add(self)
+        logging_metrics.add_source(self)
+
+    def _start(self) -> None:
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._claim()
+        self._recover()
+        self._thread = threading.Thread(
+            target=self._run, name="neuro-logging-sentry", daemon=True
+        )
+        self._thread.start()
+
+    def _claim(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        for slot in itertools.count():
+            path = self.root / str(slot)
+            path.mkdir(exist_ok=True)
+            fd = os.open(path / _LOCK, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self.path = path
+            self._lock_fd = fd
+            return
+
+    def _segment(self, seq: int) -> Path:
+        return self.path / f"{seq:012d}{_SUFFIX}"
+
+    def _recover(self) -> None:
+        seqs = sorted(int(p.stem) for p in self.path.glob(f"*{_SUFFIX}"))
+        self._read_seq, self._read_offset = seqs[0] if seqs else 0, 0
+        try:
+            seq, offset = map(int, (self.path / _CURSOR).read_text().split())
+        except (OSError, ValueError):
+            pass
+        else:
+            if seq in seqs:
+                self._read_seq, self._read_offset = seq, offset
+        self._size = 0
+        self._pending = 0
+        for seq in seqs:
+            if seq < self._read_seq:
+                self._segment(seq).unlink()
+                continue
+            data = self._segment(seq).read_bytes()
+            self._size += len(data)
+            offset = self._read_offset if seq == self._read_seq else 0
+            while offset + _HEADER.size <= len(data):
+                (length,) = _HEADER.unpack_from(data, offset)
+                offset += _HEADER.size + length
+                if offset > len(data):
+                    break
+                self._pending += 1
+        # Never append after a record that may have been cut short.
+        self._write_seq = seqs[-1] + 1 if seqs else 0
+        self._open_segment()
+
+    def _open_segment(self) -> None:
+        self._write_fd = os.open(
+            self._segment(self._write_seq),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o600,
+        )
+        self._write_offset = 0
+
+    @property
+    def qsize(self) -> int:
+        return self._pending
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def capture_envelope(self, envelope: Envelope) -> None:
+        payload = envelope.serialize()
+        record = _HEADER.pack(len(payload)) + payload
+        with self._lock:
+            if self._stopped.is_set() or self._size + len(record) > self.max_bytes:
+                self.dropped += 1
+                return
+            if self._write_offset >= self.segment_bytes:
+                os.close(self._write_fd)
+                self._write_seq += 1
+                self._open_segment()
+            os.write(self._write_fd, record)
+            self._write_offset += len(record)
+            self._size += len(record)
+            self._pending += 1
+            pending = self._pending
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        backoff = 0.0
+        while not self._stopped.is_set():
+            self._wakeup.wait(backoff or self.flush_interval)
+            self._wakeup.clear()
+            try:
+                retry_after = self._drain()
+            except Exception:
+                LOGGER.exception("Sending spooled Sentry envelopes failed")
+                retry_after = None
+            if retry_after == 0:
+                backoff = 0.0
+            else:
+                backoff = min(
+                    self.max_backoff,
+                    retry_after or max(backoff * 2, self.flush_interval),
+                )
+
+    def _drain(self) -> float | None:
+        """Send pending envelopes in batches.
+
+        Return 0 once the spool is empty, otherwise the delay requested by
+        the server or None to back off.
+        """
+        while not self._stopped.is_set():
+            batch = self._read_batch()
+            if not batch:
+                self._retire_write_segment()
+                with self._lock:
+                    self._drained.notify_all()
+                return 0
+            try:
+                for payload, seq, offset in batch:
+                    result = self._send(payload)
+                    if result is not True:
+                        return result
+                    with self._lock:
+                        self._pending -= 1
+                    # Segments the cursor moves past are done with.
+                    while self._read_seq < seq:
+                        self._remove_segment(self._read_seq)
+                        self._read_seq += 1
+                    self._read_offset = offset
+            finally:
+                self._save_cursor()
+        return None
+
+    def _retire_write_segment(self) -> None:
+        # Once everything written is sent, switch to a new segment so that
+        # the sent one can be removed.
+        with self._lock:
+            if (
+                self._stopped.is_set()
+                or not self._write_offset
+                or self._read_seq != self._write_seq
+                or self._read_offset != self._write_offset
+            ):
+                return
+            os.close(self._write_fd)
+            self._write_seq += 1
+            self._open_segment()
+        self._remove_segment(self._read_seq)
+        self._read_seq, self._read_offset = self._read_seq + 1, 0
+        self._save_cursor()
+
+    def _read_batch(self) -> list[tuple[bytes, int, int]]:
+        batch: list[tuple[bytes, int, int]] = []
+        seq, offset = self._read_seq, self._read_offset
+        while len(batch) < self.batch_size:
+            try:
+                with self._segment(seq).open("rb") as f:
+                    f.seek(offset)
+                    while len(batch) < self.batch_size:
+                        header = f.read(_HEADER.size)
+                        if len(header) < _HEADER.size:
+                            break
+                        (length,) = _HEADER.unpack(header)
+                        payload = f.read(length)
+                        if len(payload) < length:
+                            break
+                        offset += _HEADER.size + length
+                        batch.append((payload, seq, offset))
+            except FileNotFoundError:
+                pass
+            if len(batch) == self.batch_size:
+                break
+            with self._lock:
+                if seq >= self._write_seq:
+                    break
+            # A finished segment; it is removed once its envelopes are sent.
+            if not batch:
+                self._remove_segment(seq)
+                self._read_seq, self._read_offset = seq + 1, 0
+            seq, offset = seq + 1, 0
+        return batch
+
+    def _remove_segment(self, seq: int) -> None:
+        segment = self._segment(seq)
+        try:
+            size = segment.stat().st_size
+            segment.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _save_cursor(self) -> None:
+        tmp = self.path / f"{_CURSOR}.tmp"
+        tmp.write_text(f"{self._read_seq} {self._read_offset}")
+        tmp.replace(self.path / _CURSOR)
+
+    def _send(self, payload: bytes) -> bool | float | None:
+        """Send an envelope.
+
+        Return True if it is done with, otherwise the delay requested by
+        the server or None to back off.
+        """
+        try:
+            response = self._pool.request(
+                "POST",
+                self._url,
+                body=gzip.compress(payload),
+                headers=self._headers,
+            )
+        except urllib3.exceptions.HTTPError as exc:
+            LOGGER.debug("Sentry is unavailable: %s", exc)
+            return None
+        status = response.status
+        if status == 429 or status >= 500:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                return float(retry_after) if retry_after else None
+            except ValueError:
+                return None
+        if status >= 400:
+            LOGGER.warning("Sentry rejected an envelope with status %s", status)
+            self.dropped += 1
+        else:
+            self.sent += 1
+        return True
+
+    def flush(self, timeout: float, callback: Any | None = None) -> None:
+        self._wakeup.set()
+        with self._lock:
+            self._drained.wait_for(lambda: not self._pending, timeout)
+
+    def kill(self) -> None:
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            self._stopped.set()
+            os.close(self._write_fd)
+        self._wakeup.set()
+        # Let an ongoing send finish, it may still update the cursor.
+        self._thread.join(self.timeout)
+        # Closing the file releases the lock, the next process may claim it.
+        os.close(self._lock_fd)
+        _fork_aware_transports.discard(self)
+        logging_metrics.remove_source(self)
+
+    def _after_fork_in_child(self) -> None:
+        # The parent keeps its spool; the child only inherited copies of its
+        # descriptors and claims a subdirectory of its own.
+        if self._stopped.is_set():
+            return
+        os.close(self._write_fd)
+        os.close(self._lock_fd)
+        self.dropped = 0
+        self.sent = 0
+        self._wakeup.clear()
+        self._start()
+
+    def collect_metrics(self) -> Iterable[tuple[str, tuple[str, ...], float]]:
+        return [
+            (SENTRY_SPOOL_ENVELOPES, (), self._pending),
+            (SENTRY_SPOOL_BYTES, (), self._size),
+            (SENTRY_DROPPED, (), self.dropped),
+            (SENTRY_SENT, (), self.sent),
+        ]
+
+
+_fork_aware_transports: weakref.WeakSet[SpoolTransport] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for transport in list(_fork_aware_transports):
+        transport._after_fork_in_child()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import sys
+import threading
+import time
+import traceback
+from types import TracebackType
+from typing import Self
+
+import sentry_sdk
+
+from .config import EnvironConfigFactory
+from .context import task_spans, watch_spans
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Heartbeat(threading.Event):
+    def __init__(self) -> None:
+        super().__init__()
+        self.at = 0.0
+        self.thread_id = 0
+
+    def __call__(self) -> None:
+        self.at = time.monotonic()
+        self.thread_id = threading.get_ident()
+        self.set()
+
+
+class LoopWatchdog:
+    """Detect stalls of an asyncio event loop.
+
+    A thread schedules a heartbeat on the loop every *interval* seconds
+    and measures how late it runs.  Once a heartbeat is *threshold*
+    seconds late, the stack of the loop thread and the name of the
+    innermost ``trace``/``trace_cm`` span of the running task, sampled or
+    not, are captured; when the loop is back, a warning is logged with the
+    lag, and stalls of at least *sentry_threshold* seconds are also
+    reported to Sentry.  Span names are only kept while a watchdog is
+    running.  Only a *sample_rate* fraction of the stalls is captured and
+    reported, ``stalls`` and ``max_lag`` account for all of them.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.1,
+        interval: float = 0.1,
+        sample_rate: float = 1.0,
+        sentry_threshold: float | None = None,
+        logger: logging.Logger = LOGGER,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.sentry_threshold = sentry_threshold
+        self.logger = logger
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._loop_thread_id = 0
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        """Watch *loop*, the running loop by default."""
+        if loop is None:
+            loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(loop,), name="neuro-logging-watchdog", daemon=True
+        )
+        self._thread.start()
+        watch_spans(True)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            watch_spans(False)
+
+    async def __aenter__(self) -> Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    def _run(self, loop: asyncio.AbstractEventLoop) -> None:
+        stopped = self._stopped
+        beat = _Heartbeat()
+        while not stopped.wait(self.interval):
+            beat.clear()
+            sent = time.monotonic()
+            try:
+                loop.call_soon_threadsafe(beat)
+            except RuntimeError:  # the loop is closed
+                return
+            if beat.wait(self.threshold):
+                self._loop_thread_id = beat.thread_id
+                continue
+            if not loop.is_running():
+                continue
+            sampled = random.random() < self.sample_rate
+            stall = self._capture(loop) if sampled else None
+            while not beat.wait(self.interval):
+                if stopped.is_set() or not loop.is_running():
+                    return
+            lag = beat.at - sent
+            self.stalls += 1
+            self.max_lag = max(self.max_lag, lag)
+            if stall is not None:
+                self._report(lag, *stall)
+
+    def _capture(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> tuple[str | None, str | None, str | None]:
+        # Runs while the loop thread is still blocked.
+        task = asyncio.current_task(loop)
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else None
+        if task is None:
+            return None, None, stack
+        return task.get_name(), task_spans.get(task), stack
+
+    def _report(
+        self, lag: float, task: str | None, span: str | None, stack: str | None
+    ) -> None:
+        logger = self.logger
+        if logger.isEnabledFor(logging.WARNING):
+            record = logger.makeRecord(
+                logger.name,
+                logging.WARNING,
+                "(unknown file)",
+                0,
+                "Event loop blocked for %.3f s in span %s",
+                (lag, span),
+                None,
+                extra={"loop_lag": lag, "task": task, "span": span},
+                sinfo=stack,
+            )
+            logger.handle(record)
+        if (
+            self.sentry_threshold is not None
+            and lag >= self.sentry_threshold
+            and sentry_sdk.get_client().is_active()
+        ):
+            with sentry_sdk.new_scope() as scope:
+                if span is not None:
+                    scope.set_tag("span", span)
+                scope.set_context(
+                    "event_loop", {"lag": lag, "task": task, "stack": stack}
+                )
+                scope.capture_message(
+                    f"Event loop blocked for {lag:.3f} s", level="warning"
+                )
+
+
+def watch_loop(loop: asyncio.AbstractEventLoop | None = None) -> LoopWatchdog | None:
+    """Start a :class:`LoopWatchdog` configured by the ``LOG_LOOP_*``
+    environment variables if ``LOG_LOOP_WATCHDOG`` is set.
+    """
+    config = EnvironConfigFactory().create_logging()
+    if not config.log_loop_watchdog:
+        return None
+    watchdog = LoopWatchdog(
+        threshold=config.log_loop_stall_threshold,
+        interval=config.log_loop_stall_interval,
+        sample_rate=config.log_loop_stall_sample_rate,
+        sentry_threshold=config.log_loop_stall_sentry_threshold,
+    )
+    watchdog.start(loop)
+    return watchdog
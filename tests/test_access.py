@@ -0,0 +1,141 @@
+import json
+import logging
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from dirty_equals import IsPartialDict
+
+from neuro_logging import AccessLogger, health, init_logging
+from neuro_logging.formatter import JSONFormatter
+from neuro_logging.health import HealthCheckMatcher
+
+
+class _CollectingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+def handler() -> Iterator[_CollectingHandler]:
+    handler = _CollectingHandler()
+    logger = logging.getLogger("test.access")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        yield handler
+    finally:
+        logger.removeHandler(handler)
+        health.access_log_matcher = HealthCheckMatcher()
+
+
+def _log(path: str, status: int = 200) -> None:
+    access_logger = AccessLogger(logging.getLogger("test.access"), "")
+    request = make_mocked_request("GET", path)
+    access_logger.log(request, web.Response(status=status, body=b"body"), 0.25)
+
+
+def test_access_logger_fields(handler: _CollectingHandler) -> None:
+    _log("/api/v1/jobs?limit=10", 201)
+
+    [record] = handler.records
+    assert record.name == "test.access"
+    assert record.levelno == logging.INFO
+    assert record.args == ()
+    assert record.getMessage() == "GET /api/v1/jobs 201"
+    assert record.__dict__ == IsPartialDict(
+        {
+            "method": "GET",
+            "path": "/api/v1/jobs",
+            "status": 201,
+            "latency": 0.25,
+            # the mocked response has not been written
+            "size": 0,
+            "remote": None,
+        }
+    )
+
+
+def test_access_logger_json(handler: _CollectingHandler) -> None:
+    _log("/api/v1/jobs")
+
+    [record] = handler.records
+    data = json.loads(JSONFormatter(reserved_attrs=["args", "msg"]).format(record))
+    assert data["message"] == "GET /api/v1/jobs 200"
+    assert data["method"] == "GET"
+    assert data["status"] == 200
+    assert data["latency"] == 0.25
+
+
+def test_access_logger_skips_health_checks(handler: _CollectingHandler) -> None:
+    _log("/api/v1/ping")
+    assert handler.records == []
+
+    health.access_log_matcher = None
+    _log("/api/v1/ping")
+    assert len(handler.records) == 1
+
+
+def test_access_logger_enabled() -> None:
+    logger = logging.getLogger("test.access.disabled")
+    logger.setLevel(logging.WARNING)
+    assert not AccessLogger(logger, "").enabled
+    logger.setLevel(logging.INFO)
+    assert AccessLogger(logger, "").enabled
+
+
+def test_init_logging_configures_health_checks(
+    handler: _CollectingHandler, capsys: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    init_logging(health_check_url_prefixes=["/metrics"])
+    _log("/metrics/logging")
+    _log("/api/v1/ping")
+    assert handler.records == []
+
+    monkeypatch.setenv("LOG_HEALTH_CHECK", "1")
+    init_logging()
+    _log("/api/v1/ping")
+    assert len(handler.records) == 1
+
+
+async def test_access_logger_server(aiohttp_server: Any, aiohttp_client: Any) -> None:
+    records: list[logging.LogRecord] = []
+
+    class Handler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            records.append(record)
+
+    async def jobs(request: web.Request) -> web.Response:
+        return web.json_response([])
+
+    async def ping(request: web.Request) -> web.Response:
+        return web.Response(text="Pong")
+
+    app = web.Application()
+    app.router.add_get("/api/v1/jobs", jobs)
+    app.router.add_get("/api/v1/ping", ping)
+    logger = logging.getLogger("aiohttp.access")
+    handler = Handler()
+    logger.addHandler(handler)
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        server = await aiohttp_server(app, access_log_class=AccessLogger)
+        client = await aiohttp_client(server)
+        assert (await client.get("/api/v1/ping")).status == 200
+        assert (await client.get("/api/v1/jobs")).status == 200
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+    [record] = records
+    assert record.getMessage() == "GET /api/v1/jobs 200"
+    assert record.__dict__["remote"] == "127.0.0.1"
+    # like aiohttp's %b, the size includes the headers
+    assert record.__dict__["size"] > len("[]")
@@ -0,0 +1,122 @@
+import io
+import json
+import logging
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from neuro_logging import init_logging
+from neuro_logging.aggregator import AggregatingHandler, LogAggregator
+from neuro_logging.formatter import JSONFormatter
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> str:
+    return str(tmp_path / "logs.sock")
+
+
+@pytest.fixture
+def aggregator(socket_path: str) -> Iterator[LogAggregator]:
+    aggregator = LogAggregator(socket_path, io.BytesIO(), flush_interval=0.01)
+    with aggregator:
+        yield aggregator
+
+
+def _output(aggregator: LogAggregator) -> list[str]:
+    stream = aggregator.stream
+    assert isinstance(stream, io.BytesIO)
+    return stream.getvalue().decode().splitlines()
+
+
+def _logger(handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger("test.aggregator")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    for old in logger.handlers:
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_aggregates_records(aggregator: LogAggregator, socket_path: str) -> None:
+    handler = AggregatingHandler(socket_path, flush_size=1024)
+    logger = _logger(handler)
+    try:
+        for i in range(100):
+            logger.info("message %d", i)
+    finally:
+        handler.close()
+    aggregator.close()
+
+    assert _output(aggregator) == [f"message {i}" for i in range(100)]
+
+
+def test_forked_workers(aggregator: LogAggregator, socket_path: str) -> None:
+    handler = AggregatingHandler(socket_path, flush_size=16 * 1024)
+    handler.setFormatter(JSONFormatter())
+    logger = _logger(handler)
+    # longer than PIPE_BUF
+    payload = "x" * 8192
+    logger.info("parent")
+    pids = []
+    for worker in range(4):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for i in range(50):
+                    logger.info(
+                        "record", extra={"worker": worker, "i": i, "x": payload}
+                    )
+                handler.close()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+    logger.info("parent again")
+    handler.close()
+    aggregator.close()
+
+    records = [json.loads(line) for line in _output(aggregator)]
+    messages = [record["message"] for record in records]
+    assert messages.count("record") == 200
+    assert messages[0] == "parent"
+    assert "parent again" in messages
+    for worker in range(4):
+        assert [r["i"] for r in records if r.get("worker") == worker] == list(range(50))
+
+
+def test_falls_back_to_stream(socket_path: str) -> None:
+    stream = io.StringIO()
+    handler = AggregatingHandler(socket_path, stream, flush_size=0)
+    logger = _logger(handler)
+    try:
+        logger.info("no aggregator")
+        aggregator = LogAggregator(socket_path, io.BytesIO())
+        with aggregator:
+            handler._retry_at = 0
+            logger.info("aggregated")
+        assert stream.getvalue() == "no aggregator\n"
+        assert _output(aggregator) == ["aggregated"]
+    finally:
+        handler.close()
+
+
+def test_init_logging(
+    aggregator: LogAggregator, socket_path: str, monkeypatch: Any
+) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    monkeypatch.setenv("LOG_AGGREGATOR_SOCKET", socket_path)
+    init_logging()
+    [handler] = logging.getLogger().handlers
+    assert isinstance(handler, AggregatingHandler)
+    logging.info("InfoMessage")
+    handler.close()
+    aggregator.close()
+
+    [line] = _output(aggregator)
+    assert json.loads(line)["message"] == "InfoMessage"
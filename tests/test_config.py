@@ -9,16 +9,112 @@ class TestEnvironConfigFactory:
 
         assert config.log_level == logging.INFO
         assert not config.log_health_check
+        assert not config.log_async
+        assert config.log_queue_size == 10000
+        assert config.log_queue_overflow == "block"
+        assert config.log_queue_drop_level == logging.WARNING
+        assert config.log_rate_limits == {}
+        assert config.log_rate_limit_summary_interval == 60.0
+        assert config.log_metrics
+        assert not config.log_trace_ids
+        assert config.log_aggregator_socket is None
+        assert config.log_levels == {}
+        assert config.log_file is None
+        assert config.log_file_compression == "gzip"
+        assert config.log_file_max_bytes == 128 * 1024 * 1024
+        assert config.log_file_interval == 0.0
+        assert config.log_file_backup_count == 10
+        assert config.log_file_max_buffer == 64 * 1024 * 1024
+        assert config.log_traceback_cache_size == 256
+        assert config.log_traceback_max_frames is None
+        assert config.log_traceback_max_chars is None
+        assert config.log_span_histograms
+        assert not config.log_loop_watchdog
+        assert config.log_loop_stall_threshold == 0.1
+        assert config.log_loop_stall_interval == 0.1
+        assert config.log_loop_stall_sample_rate == 1.0
+        assert config.log_loop_stall_sentry_threshold is None
+        assert config.log_flight_recorder_size == 0
+        assert config.log_flight_recorder_level == logging.DEBUG
+        assert config.log_flight_recorder_trigger == logging.ERROR
+        assert config.log_flight_recorder_per_task is False
+        assert config.log_flight_recorder_max_arg_size == 1024
 
     def test_create_logging__custom(self) -> None:
         environ = {
             "LOG_LEVEL": "error",
             "LOG_HEALTH_CHECK": "1",
+            "LOG_ASYNC": "true",
+            "LOG_QUEUE_SIZE": "100",
+            "LOG_QUEUE_OVERFLOW": "DROP_OLDEST",
+            "LOG_QUEUE_DROP_LEVEL": "error",
+            "LOG_RATE_LIMITS": "WARNING=10, aiohttp.client=0.5:5,",
+            "LOG_RATE_LIMIT_SUMMARY_INTERVAL": "30",
+            "LOG_METRICS": "0",
+            "LOG_TRACE_IDS": "1",
+            "LOG_AGGREGATOR_SOCKET": "/run/logs.sock",
+            "LOG_LEVELS": "aiohttp.client=debug, botocore=ERROR",
+            "LOG_FILE": "/var/log/app.log",
+            "LOG_FILE_COMPRESSION": "ZSTD",
+            "LOG_FILE_MAX_BYTES": "1024",
+            "LOG_FILE_INTERVAL": "3600",
+            "LOG_FILE_BACKUP_COUNT": "3",
+            "LOG_FILE_MAX_BUFFER": "4096",
+            "LOG_TRACEBACK_CACHE_SIZE": "16",
+            "LOG_TRACEBACK_MAX_FRAMES": "20",
+            "LOG_TRACEBACK_MAX_CHARS": "4096",
+            "LOG_SPAN_HISTOGRAMS": "0",
+            "LOG_LOOP_WATCHDOG": "1",
+            "LOG_LOOP_STALL_THRESHOLD": "0.25",
+            "LOG_LOOP_STALL_INTERVAL": "0.5",
+            "LOG_LOOP_STALL_SAMPLE_RATE": "0.1",
+            "LOG_LOOP_STALL_SENTRY_THRESHOLD": "1",
+            "LOG_FLIGHT_RECORDER_SIZE": "50",
+            "LOG_FLIGHT_RECORDER_LEVEL": "info",
+            "LOG_FLIGHT_RECORDER_TRIGGER": "critical",
+            "LOG_FLIGHT_RECORDER_PER_TASK": "1",
+            "LOG_FLIGHT_RECORDER_MAX_ARG_SIZE": "64",
         }
         config = EnvironConfigFactory(environ).create_logging()
 
         assert config.log_level == logging.ERROR
         assert config.log_health_check
+        assert config.log_async
+        assert config.log_queue_size == 100
+        assert config.log_queue_overflow == "drop_oldest"
+        assert config.log_queue_drop_level == logging.ERROR
+        assert config.log_rate_limits == {
+            "WARNING": (10.0, 10.0),
+            "aiohttp.client": (0.5, 5.0),
+        }
+        assert config.log_rate_limit_summary_interval == 30.0
+        assert not config.log_metrics
+        assert config.log_trace_ids
+        assert config.log_aggregator_socket == "/run/logs.sock"
+        assert config.log_levels == {
+            "aiohttp.client": logging.DEBUG,
+            "botocore": logging.ERROR,
+        }
+        assert config.log_file == "/var/log/app.log"
+        assert config.log_file_compression == "zstd"
+        assert config.log_file_max_bytes == 1024
+        assert config.log_file_interval == 3600.0
+        assert config.log_file_backup_count == 3
+        assert config.log_file_max_buffer == 4096
+        assert config.log_traceback_cache_size == 16
+        assert config.log_traceback_max_frames == 20
+        assert config.log_traceback_max_chars == 4096
+        assert not config.log_span_histograms
+        assert config.log_loop_watchdog
+        assert config.log_loop_stall_threshold == 0.25
+        assert config.log_loop_stall_interval == 0.5
+        assert config.log_loop_stall_sample_rate == 0.1
+        assert config.log_loop_stall_sentry_threshold == 1.0
+        assert config.log_flight_recorder_size == 50
+        assert config.log_flight_recorder_level == logging.INFO
+        assert config.log_flight_recorder_trigger == logging.CRITICAL
+        assert config.log_flight_recorder_per_task is True
+        assert config.log_flight_recorder_max_arg_size == 64
 
     def test_create_sentry__defaults(self) -> None:
         config = EnvironConfigFactory({}).create_sentry()
@@ -28,6 +124,14 @@ class TestEnvironConfigFactory:
         assert config.cluster_name is None
         assert config.app_name is None
         assert config.sample_rate == 0.1
+        assert config.error_window == 60.0
+        assert config.error_cap == 1
+        assert config.sample_rates == {}
+        assert config.traces_budget == 0.0
+        assert config.spool_dir is None
+        assert config.spool_max_bytes == 64 * 1024 * 1024
+        assert config.tail_threshold is None
+        assert config.tail_max_spans == 100
 
     def test_create_sentry__custom(self) -> None:
         environ = {
@@ -35,6 +139,14 @@ class TestEnvironConfigFactory:
             "SENTRY_CLUSTER_NAME": "cluster",
             "SENTRY_APP_NAME": "app",
             "SENTRY_SAMPLE_RATE": "0.5",
+            "SENTRY_ERROR_WINDOW": "10",
+            "SENTRY_ERROR_CAP": "3",
+            "SENTRY_SAMPLE_RATES": "GET /api/v1/jobs=0.01, job=1,",
+            "SENTRY_TRACES_BUDGET": "20",
+            "SENTRY_SPOOL_DIR": "/var/spool/sentry",
+            "SENTRY_SPOOL_MAX_BYTES": "1048576",
+            "SENTRY_TAIL_THRESHOLD": "0.5",
+            "SENTRY_TAIL_MAX_SPANS": "20",
         }
         config = EnvironConfigFactory(environ).create_sentry()
 
@@ -43,3 +155,11 @@ class TestEnvironConfigFactory:
         assert config.cluster_name == "cluster"
         assert config.app_name == "app"
         assert config.sample_rate == 0.5
+        assert config.error_window == 10.0
+        assert config.error_cap == 3
+        assert config.sample_rates == {"GET /api/v1/jobs": 0.01, "job": 1.0}
+        assert config.traces_budget == 20.0
+        assert config.spool_dir == "/var/spool/sentry"
+        assert config.spool_max_bytes == 1048576
+        assert config.tail_threshold == 0.5
+        assert config.tail_max_spans == 20
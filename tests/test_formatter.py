@@ -0,0 +1,180 @@
+import enum
+import logging
+import sys
+from types import TracebackType
+
+import pytest
+from pythonjsonlogger.orjson import OrjsonFormatter
+
+from neuro_logging import BASE_CONFIG
+from neuro_logging.formatter import JSONFormatter, TextFormatter, TracebackCache
+
+
+class _Color(enum.Enum):
+    RED = "red"
+
+
+def _json_formatter_kwargs() -> dict[str, object]:
+    config = BASE_CONFIG["formatters"]["json"]  # type: ignore[index]
+    return {
+        k: v for k, v in config.items() if k != "()" and not k.startswith("traceback_")
+    }
+
+
+def _make_record(
+    msg: object,
+    args: tuple[object, ...] = (),
+    *,
+    exc_info: bool = False,
+    extra: dict[str, object] | None = None,
+    sinfo: str | None = None,
+) -> logging.LogRecord:
+    ei = None
+    if exc_info:
+        try:
+            1 / 0  # noqa: B018
+        except ZeroDivisionError:
+            ei = sys.exc_info()
+    return logging.getLogger("test").makeRecord(
+        "test", logging.INFO, __file__, 10, msg, args, ei, "func", extra, sinfo
+    )
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        pytest.param(_make_record("msg"), id="plain"),
+        pytest.param(_make_record("%s msg", ("arg",)), id="args"),
+        pytest.param(_make_record("msg", exc_info=True), id="exc_info"),
+        pytest.param(_make_record("msg", sinfo="Stack:\n  ..."), id="stack_info"),
+        pytest.param(
+            _make_record(
+                "msg",
+                extra={
+                    "extra": {"key": "value"},
+                    "data": b"bytes",
+                    "color": _Color.RED,
+                    "kind": int,
+                    "obj": object(),
+                    "_private": 1,
+                },
+            ),
+            id="extra",
+        ),
+        pytest.param(_make_record({"key": "value"}), id="dict-msg"),
+        pytest.param(
+            _make_record({"exc_info": "custom"}, exc_info=True), id="dict-exc"
+        ),
+    ],
+)
+def test_json_formatter_compatible_with_orjson_formatter(
+    record: logging.LogRecord,
+) -> None:
+    kwargs = _json_formatter_kwargs()
+    expected = OrjsonFormatter(**kwargs).format(record)  # type: ignore[arg-type]
+    formatter = JSONFormatter(**kwargs)  # type: ignore[arg-type]
+    assert formatter.format(record) == expected
+    assert formatter.format_bytes(record) == expected.encode()
+    cached = JSONFormatter(**kwargs, traceback_cache_size=8)  # type: ignore[arg-type]
+    assert cached.format(record) == expected
+    assert cached.format(record) == expected
+
+
+def test_json_formatter_reserved_exc_info() -> None:
+    record = _make_record("msg", exc_info=True)
+    kwargs = {"reserved_attrs": ["exc_info", "stack_info", "msg"], "timestamp": "ts"}
+    expected = OrjsonFormatter(**kwargs).format(record)  # type: ignore[arg-type]
+    assert JSONFormatter(**kwargs).format(record) == expected  # type: ignore[arg-type]
+
+
+def _raise(exc: Exception, depth: int = 0) -> None:
+    if depth:
+        _raise(exc, depth - 1)
+    raise exc
+
+
+def _exc_info(
+    exc: Exception, depth: int = 0
+) -> tuple[type[BaseException], BaseException, TracebackType | None]:
+    try:
+        _raise(exc, depth)
+    except Exception:
+        ei = sys.exc_info()
+    assert ei[0] is not None
+    assert ei[1] is not None
+    return ei[0], ei[1], ei[2]
+
+
+def test_traceback_cache_text() -> None:
+    cache = TracebackCache()
+    expected = logging.Formatter().formatException(_exc_info(ValueError("boom")))
+    for _ in range(3):
+        assert cache.format_exception(_exc_info(ValueError("boom"))) == expected
+    assert (cache.misses, cache.hits) == (1, 2)
+    assert "other" in cache.format_exception(_exc_info(ValueError("other")))
+    assert "TypeError" in cache.format_exception(_exc_info(TypeError("boom")))
+    cache.format_exception(_exc_info(ValueError("boom"), depth=1))
+    assert cache.misses == 4
+
+
+def _chained_exc_info(
+    cause: Exception,
+) -> tuple[type[BaseException], BaseException, TracebackType | None]:
+    try:
+        try:
+            raise cause
+        except Exception as exc:
+            msg = "boom"
+            raise ValueError(msg) from exc
+    except ValueError:
+        ei = sys.exc_info()
+    assert ei[0] is not None
+    assert ei[1] is not None
+    return ei[0], ei[1], ei[2]
+
+
+def test_traceback_cache_chained() -> None:
+    cache = TracebackCache()
+    first = cache.format_exception(_chained_exc_info(KeyError("a")))
+    second = cache.format_exception(_chained_exc_info(KeyError("b")))
+    assert "KeyError: 'a'" in first
+    assert "KeyError: 'b'" in second
+    assert cache.misses == 2
+    cache.format_exception(_chained_exc_info(KeyError("a")))
+    assert cache.hits == 1
+
+
+def test_traceback_cache_lru() -> None:
+    cache = TracebackCache(2)
+    for msg in ("a", "b", "a", "c", "a"):
+        cache.format_exception(_exc_info(ValueError(msg)))
+    assert (cache.misses, cache.hits) == (3, 2)
+    cache.format_exception(_exc_info(ValueError("b")))
+    assert cache.misses == 4
+
+
+def test_traceback_cache_limits() -> None:
+    ei = _exc_info(ValueError("boom"), depth=10)
+    full = TracebackCache().format_exception(ei)
+    text = TracebackCache(max_frames=2).format_exception(ei)
+    assert full.count("File ") == 5
+    assert text.count("File ") == 2
+    assert text.endswith("ValueError: boom")
+    text = TracebackCache(max_chars=50).format_exception(ei)
+    assert text == "...\n" + full[-50:]
+    _, message, tb = TracebackCache(max_frames=1).format_json(ei)
+    assert message == "ValueError: boom"
+    assert tb.count("File ") == 1
+
+
+def test_text_formatter() -> None:
+    fmt = "%(levelname)s %(message)s"
+    record = _make_record("msg", exc_info=True)
+    expected = logging.Formatter(fmt).format(record)
+    record.exc_text = None
+    formatter = TextFormatter(fmt, traceback_cache_size=8)
+    assert formatter.format(record) == expected
+    assert formatter.tracebacks is not None
+    assert formatter.tracebacks.misses == 1
+    record = _make_record("msg", exc_info=True)
+    assert TextFormatter(fmt, traceback_cache_size=0).format(record) == expected
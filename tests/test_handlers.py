@@ -0,0 +1,407 @@
+import asyncio
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from neuro_logging import init_logging
+from neuro_logging.handlers import (
+    AsyncQueueHandler,
+    BufferedStreamHandler,
+    CompressedFileHandler,
+    FlightRecorderHandler,
+    OverflowPolicy,
+)
+
+
+class _CollectingHandler(logging.Handler):
+    def __init__(self, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.records: list[logging.LogRecord] = []
+        self.threads: set[str] = set()
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.unblocked.wait()
+        self.threads.add(threading.current_thread().name)
+        self.records.append(record)
+
+
+def _record(msg: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, msg, (), None)
+
+
+def _messages(handler: _CollectingHandler) -> list[str]:
+    return [r.getMessage() for r in handler.records]
+
+
+def test_async_queue_handler_writes_on_thread() -> None:
+    target = _CollectingHandler()
+    handler = AsyncQueueHandler([target])
+    try:
+        handler.handle(_record("first"))
+        handler.handle(_record("second"))
+        handler.flush()
+        assert _messages(target) == ["first", "second"]
+        assert target.threads == {"neuro-logging-writer"}
+    finally:
+        handler.close()
+
+
+def test_async_queue_handler_respects_target_level() -> None:
+    target = _CollectingHandler(logging.WARNING)
+    handler = AsyncQueueHandler([target])
+    try:
+        handler.handle(_record("info"))
+        handler.handle(_record("warning", logging.WARNING))
+        handler.flush()
+        assert _messages(target) == ["warning"]
+    finally:
+        handler.close()
+
+
+def test_async_queue_handler_close_drains_queue() -> None:
+    target = _CollectingHandler()
+    handler = AsyncQueueHandler([target])
+    for i in range(100):
+        handler.handle(_record(f"msg{i}"))
+    handler.close()
+    assert _messages(target) == [f"msg{i}" for i in range(100)]
+
+
+def test_async_queue_handler_drop_oldest() -> None:
+    target = _CollectingHandler()
+    target.unblocked.clear()
+    handler = AsyncQueueHandler([target], maxsize=2, overflow="drop_oldest")
+    try:
+        handler.handle(_record("blocked"))
+        # wait until the writer picked up the first record and got stuck
+        while handler.qsize:
+            pass
+        for i in range(5):
+            handler.handle(_record(f"msg{i}"))
+        assert handler.dropped == 3
+        target.unblocked.set()
+        handler.flush()
+        assert _messages(target) == ["blocked", "msg3", "msg4"]
+    finally:
+        target.unblocked.set()
+        handler.close()
+
+
+def test_async_queue_handler_drop_level() -> None:
+    target = _CollectingHandler()
+    target.unblocked.clear()
+    handler = AsyncQueueHandler(
+        [target],
+        maxsize=1,
+        overflow=OverflowPolicy.DROP_LEVEL,
+        drop_level="WARNING",
+    )
+    try:
+        handler.handle(_record("blocked"))
+        while handler.qsize:
+            pass
+        handler.handle(_record("queued"))
+        handler.handle(_record("dropped"))
+        assert handler.dropped == 1
+
+        timer = threading.Timer(0.05, target.unblocked.set)
+        timer.start()
+        # records at or above drop_level wait for room instead of being lost
+        handler.handle(_record("error", logging.ERROR))
+        handler.flush()
+        assert _messages(target) == ["blocked", "queued", "error"]
+    finally:
+        target.unblocked.set()
+        handler.close()
+
+
+def test_async_queue_handler_unknown_policy() -> None:
+    with pytest.raises(ValueError, match="unknown"):
+        AsyncQueueHandler([], overflow="unknown")
+
+
+def test_flight_recorder_handler_flushes_on_trigger() -> None:
+    target = _CollectingHandler()
+    handler = FlightRecorderHandler([target], capacity=2)
+    handler.handle(_record("dropped", logging.DEBUG))
+    handler.handle(_record("first", logging.DEBUG))
+    handler.handle(_record("second", logging.DEBUG))
+    handler.handle(_record("info"))
+    assert _messages(target) == ["info"]
+    handler.handle(_record("error", logging.ERROR))
+    assert _messages(target) == ["info", "first", "second", "error"]
+    handler.handle(_record("another error", logging.ERROR))
+    assert _messages(target)[-1:] == ["another error"]
+
+
+def test_flight_recorder_handler_does_not_format() -> None:
+    formatted = []
+
+    class Arg:
+        def __str__(self) -> str:
+            formatted.append(self)
+            return "arg"
+
+    target = _CollectingHandler()
+    handler = FlightRecorderHandler([target], capacity=1)
+    for _ in range(3):
+        record = _record("value %s", logging.DEBUG)
+        record.args = (Arg(),)
+        handler.handle(record)
+    assert not formatted
+    handler.handle(_record("error", logging.ERROR))
+    assert _messages(target) == ["value arg", "error"]
+    assert len(formatted) == 1
+
+
+def test_flight_recorder_handler_drops_large_args() -> None:
+    target = _CollectingHandler()
+    handler = FlightRecorderHandler([target], max_arg_size=8)
+    record = _record("%s %s %d", logging.DEBUG)
+    record.args = ("small", "x" * 100, 42)
+    handler.handle(record)
+    record = _record("%(body)s", logging.DEBUG)
+    record.args = {"body": b"x" * 100}
+    handler.handle(record)
+    handler.handle(_record("error", logging.ERROR))
+    assert _messages(target) == [
+        "small <str of length 100 dropped> 42",
+        "<bytes of length 100 dropped>",
+        "error",
+    ]
+
+
+async def test_flight_recorder_handler_per_task() -> None:
+    target = _CollectingHandler()
+    handler = FlightRecorderHandler([target], per_task=True)
+
+    async def request(name: str, fail: bool) -> None:
+        handler.handle(_record(f"{name} debug", logging.DEBUG))
+        await asyncio.sleep(0)
+        if fail:
+            handler.handle(_record(f"{name} error", logging.ERROR))
+
+    await asyncio.gather(request("ok", fail=False), request("failed", fail=True))
+    assert _messages(target) == ["failed debug", "failed error"]
+    handler.handle(_record("error", logging.ERROR))
+    assert _messages(target)[2:] == ["error"]
+
+    thread = threading.Thread(
+        target=handler.handle, args=(_record("thread debug", logging.DEBUG),)
+    )
+    thread.start()
+    thread.join()
+    await asyncio.to_thread(handler.handle, _record("thread error", logging.ERROR))
+    assert _messages(target)[3:] == ["thread debug", "thread error"]
+
+
+def test_buffered_stream_handler_coalesces_writes() -> None:
+    raw = io.BytesIO()
+    handler = BufferedStreamHandler(
+        io.TextIOWrapper(raw), flush_size=1024, flush_interval=60
+    )
+    try:
+        handler.handle(_record("first"))
+        handler.handle(_record("second"))
+        assert raw.getvalue() == b""
+        handler.flush()
+        assert raw.getvalue() == b"first\nsecond\n"
+    finally:
+        handler.close()
+
+
+def test_buffered_stream_handler_flush_size() -> None:
+    stream = io.BytesIO()
+    handler = BufferedStreamHandler(stream, flush_size=10, flush_interval=60)
+    try:
+        handler.handle(_record("short"))
+        assert stream.getvalue() == b""
+        handler.handle(_record("long enough"))
+        assert stream.getvalue() == b"short\nlong enough\n"
+    finally:
+        handler.close()
+
+
+def test_buffered_stream_handler_flush_level() -> None:
+    stream = io.BytesIO()
+    handler = BufferedStreamHandler(stream, flush_interval=60)
+    try:
+        handler.handle(_record("info"))
+        assert stream.getvalue() == b""
+        handler.handle(_record("error", logging.ERROR))
+        assert stream.getvalue() == b"info\nerror\n"
+    finally:
+        handler.close()
+
+
+def test_buffered_stream_handler_flush_interval() -> None:
+    stream = io.BytesIO()
+    handler = BufferedStreamHandler(stream, flush_interval=0.01)
+    try:
+        handler.handle(_record("info"))
+        deadline = time.monotonic() + 5
+        while not stream.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stream.getvalue() == b"info\n"
+    finally:
+        handler.close()
+
+
+def test_buffered_stream_handler_close() -> None:
+    stream = io.BytesIO()
+    handler = BufferedStreamHandler(stream, flush_interval=60)
+    handler.handle(_record("info"))
+    handler.close()
+    assert stream.getvalue() == b"info\n"
+
+
+def test_buffered_stream_handler_text_stream() -> None:
+    stream = io.StringIO()
+    handler = BufferedStreamHandler(stream, flush_interval=60)
+    handler.handle(_record("info"))
+    handler.close()
+    assert stream.getvalue() == "info\n"
+
+
+def _read_gzip(path: Path) -> list[str]:
+    return gzip.decompress(path.read_bytes()).decode().splitlines()
+
+
+def test_compressed_file_handler(tmp_path: Path) -> None:
+    handler = CompressedFileHandler(tmp_path / "app.log", flush_interval=60)
+    try:
+        handler.handle(_record("first"))
+        handler.handle(_record("second"))
+        # compression is left to the background thread
+        assert (tmp_path / "app.log.gz").read_bytes() == b""
+        handler.handle(_record("error", logging.ERROR))
+        deadline = time.monotonic() + 5
+        while not (tmp_path / "app.log.gz").stat().st_size:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        handler.handle(_record("third"))
+    finally:
+        handler.close()
+
+    assert _read_gzip(tmp_path / "app.log.gz") == ["first", "second", "error", "third"]
+
+
+def test_compressed_file_handler_max_buffer(tmp_path: Path) -> None:
+    handler = CompressedFileHandler(
+        tmp_path / "app.log", flush_interval=60, max_buffer=16
+    )
+    try:
+        for message in ["first", "second", "third"]:
+            handler.handle(_record(message))
+        handler.handle(_record("error", logging.ERROR))
+        assert handler.dropped == 1
+    finally:
+        handler.close()
+
+    assert _read_gzip(tmp_path / "app.log.gz") == ["first", "second", "error"]
+
+
+def test_compressed_file_handler_recovers_segment(tmp_path: Path) -> None:
+    handler = CompressedFileHandler(tmp_path / "app.log", flush_interval=60)
+    handler.handle(_record("first"))
+    handler.close()
+    # a crash while writing the second batch
+    with (tmp_path / "app.log.gz").open("ab") as f:
+        f.write(gzip.compress(b"second\n")[:10])
+
+    handler = CompressedFileHandler(tmp_path / "app.log", flush_interval=60)
+    handler.handle(_record("third"))
+    handler.close()
+
+    # complete batches of the previous run are readable
+    with gzip.open(tmp_path / "app.log.1.gz", "rt") as f:
+        assert f.readline() == "first\n"
+        with pytest.raises(EOFError):
+            f.read()
+    assert _read_gzip(tmp_path / "app.log.gz") == ["third"]
+
+
+def test_compressed_file_handler_shutdown(tmp_path: Path) -> None:
+    handler = CompressedFileHandler(tmp_path / "app.log", flush_interval=60)
+    handler.handle(_record("first"))
+    # takes the handler lock around close()
+    logging.shutdown([weakref.ref(handler)])
+
+    assert _read_gzip(tmp_path / "app.log.gz") == ["first"]
+
+
+def test_compressed_file_handler_rotates_by_size(tmp_path: Path) -> None:
+    handler = CompressedFileHandler(
+        tmp_path / "app.log", max_bytes=1, backup_count=2, flush_interval=60
+    )
+    try:
+        for i in range(4):
+            handler.handle(_record(f"message {i}"))
+            handler.flush()
+    finally:
+        handler.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "app.log.1.gz",
+        "app.log.2.gz",
+        "app.log.gz",
+    ]
+    assert _read_gzip(tmp_path / "app.log.2.gz") == ["message 2"]
+    assert _read_gzip(tmp_path / "app.log.1.gz") == ["message 3"]
+    assert _read_gzip(tmp_path / "app.log.gz") == []
+
+
+def test_compressed_file_handler_rotates_by_time(tmp_path: Path) -> None:
+    handler = CompressedFileHandler(
+        tmp_path / "app.log", interval=0.01, flush_interval=60
+    )
+    try:
+        handler.handle(_record("first"))
+        time.sleep(0.02)
+        handler.flush()
+        handler.handle(_record("second"))
+    finally:
+        handler.close()
+
+    assert _read_gzip(tmp_path / "app.log.1.gz") == ["first"]
+    assert _read_gzip(tmp_path / "app.log.gz") == ["second"]
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("compression") is None, reason="Python 3.14+"
+)
+def test_compressed_file_handler_zstd(tmp_path: Path) -> None:
+    zstd: Any = importlib.import_module("compression.zstd")
+    handler = CompressedFileHandler(tmp_path / "app.log", compression="zstd")
+    handler.handle(_record("first"))
+    handler.close()
+
+    assert zstd.decompress((tmp_path / "app.log.zst").read_bytes()) == b"first\n"
+
+
+def test_compressed_file_handler_unknown_compression(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="Unknown compression: lzma"):
+        CompressedFileHandler(tmp_path / "app.log", compression="lzma")
+
+
+def test_init_logging_log_file(tmp_path: Path, monkeypatch: Any) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    init_logging(log_file=str(tmp_path / "app.log"))
+    [handler] = logging.getLogger().handlers
+    assert isinstance(handler, CompressedFileHandler)
+    logging.info("InfoMessage")
+    handler.close()
+
+    [line] = _read_gzip(tmp_path / "app.log.gz")
+    assert json.loads(line)["message"] == "InfoMessage"
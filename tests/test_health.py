@@ -0,0 +1,99 @@
+import logging
+
+import pytest
+
+from neuro_logging.health import HealthCheckMatcher
+
+
+def _record(
+    name: str, msg: str, args: tuple[object, ...] = (), **extra: object
+) -> logging.LogRecord:
+    record = logging.LogRecord(name, logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def matcher() -> HealthCheckMatcher:
+    return HealthCheckMatcher(["/api/v1/ping", "/ready"], ["/metrics"])
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/api/v1/ping", True),
+        ("/api/v1/ping?verbose=1", True),
+        ("/ready", True),
+        ("/metrics", True),
+        ("/metrics/requests", True),
+        ("/api/v1/pings", False),
+        ("/api/v1/jobs", False),
+        ("/", False),
+    ],
+)
+def test_match_path(matcher: HealthCheckMatcher, path: str, expected: bool) -> None:
+    assert matcher.match_path(path) is expected
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        ("http://127.0.0.1/api/v1/ping", True),
+        ("https://host:8080/ready#top", True),
+        ("http://host/metrics/x?y=1", True),
+        ("http://host", False),
+        ("http://host/api/v1/jobs", False),
+        ("/ready", True),
+    ],
+)
+def test_match_url(matcher: HealthCheckMatcher, url: str, expected: bool) -> None:
+    assert matcher.match_url(url) is expected
+
+
+def test_match_record_uvicorn(matcher: HealthCheckMatcher) -> None:
+    fmt = '%s - "%s %s HTTP/%s" %d'
+    record = _record(
+        "uvicorn.access", fmt, ("127.0.0.1:5000", "GET", "/ready?x=1", "1.1", 200)
+    )
+    assert matcher.match_record(record)
+    record = _record(
+        "uvicorn.access", fmt, ("127.0.0.1:5000", "GET", "/api/v1/jobs", "1.1", 200)
+    )
+    assert not matcher.match_record(record)
+
+
+def test_match_record_aiohttp(matcher: HealthCheckMatcher) -> None:
+    record = _record(
+        "aiohttp.access",
+        '127.0.0.1 "GET /api/v1/ping HTTP/1.1" 200',
+        first_request_line="GET /api/v1/ping HTTP/1.1",
+    )
+    assert matcher.match_record(record)
+    record = _record(
+        "aiohttp.access",
+        '127.0.0.1 "GET /api/v1/jobs HTTP/1.1" 200',
+        first_request_line="GET /api/v1/jobs HTTP/1.1",
+    )
+    assert not matcher.match_record(record)
+
+
+@pytest.mark.parametrize(
+    ("msg", "args", "expected"),
+    [
+        ("GET /api/v1/ping", (), True),
+        ('1.2.3.4 "GET /metrics/x HTTP/1.1" 200', (), True),
+        ("GET %s", ("/ready",), True),
+        ("GET /api/v1/jobs", (), False),
+        ("GET /api/v1/pings", (), False),
+    ],
+)
+def test_match_record_message(
+    matcher: HealthCheckMatcher, msg: str, args: tuple[object, ...], expected: bool
+) -> None:
+    assert matcher.match_record(_record("aiohttp.access", msg, args)) is expected
+
+
+def test_no_paths() -> None:
+    matcher = HealthCheckMatcher([])
+    assert not matcher.match_path("/api/v1/ping")
+    assert not matcher.match_record(_record("aiohttp.access", "GET /api/v1/ping"))
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+
+
+# Cumulative import time of neuro_logging, best of a few runs.  Importing
+# sentry_sdk and aiohttp eagerly takes several times as long.
+IMPORT_TIME_BUDGET_US = 200_000
+
+HEAVY_MODULES = ["aiohttp", "importlib.metadata", "sentry_sdk", "urllib3"]
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _import_time() -> int:
+    stderr = _run("import neuro_logging", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == "neuro_logging":
+            return int(cumulative)
+    raise AssertionError(stderr)
+
+
+def test_import_time_budget() -> None:
+    assert min(_import_time() for _ in range(3)) < IMPORT_TIME_BUDGET_US
+
+
+def test_heavy_modules_are_imported_lazily() -> None:
+    code = (
+        "import sys, neuro_logging; neuro_logging.init_logging(); "
+        f"print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    assert _run(code).stdout.split() == []
+
+    code = (
+        "import sys, neuro_logging; neuro_logging.trace; "
+        "print('sentry_sdk' in sys.modules)"
+    )
+    assert _run(code).stdout.split() == ["True"]
+
+
+def test_trace_submodule_imported_first() -> None:
+    code = "\n".join(
+        [
+            "import sys",
+            "import neuro_logging.trace",
+            "from neuro_logging import trace",
+            "module = sys.modules['neuro_logging.trace']",
+            "func = neuro_logging.trace(lambda: 'called')",
+            "print(neuro_logging.trace is trace is module.trace, func())",
+        ]
+    )
+    assert _run(code).stdout.split() == ["True", "called"]
+
+
+def test_lazy_attributes() -> None:
+    import neuro_logging.trace
+    from neuro_logging import AccessLogger, new_trace, trace
+    from neuro_logging.access import AccessLogger as AccessLoggerClass
+    from neuro_logging.trace import new_trace as new_trace_func
+
+    assert AccessLogger is AccessLoggerClass
+    assert new_trace is new_trace_func
+    # not shadowed by the neuro_logging.trace submodule
+    assert callable(trace)
+    assert neuro_logging.trace is trace
+    assert neuro_logging.__version__
+    assert set(neuro_logging.__all__) <= set(dir(neuro_logging))
@@ -0,0 +1,143 @@
+import logging
+import os
+import signal
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient
+
+from neuro_logging import init_logging
+from neuro_logging.levels import LogLevels, log_levels, log_levels_handler
+
+
+@pytest.fixture
+def levels() -> Iterator[LogLevels]:
+    levels = LogLevels()
+    try:
+        yield levels
+    finally:
+        levels.reset()
+
+
+def test_set_and_reset(levels: LogLevels) -> None:
+    parent = logging.getLogger("test.levels")
+    child = logging.getLogger("test.levels.child")
+    other = logging.getLogger("test.other")
+    parent.setLevel(logging.WARNING)
+    assert not child.isEnabledFor(logging.DEBUG)
+    assert other.isEnabledFor(logging.WARNING)
+
+    levels.set("test.levels", "debug")
+    assert parent.level == logging.DEBUG
+    assert child.isEnabledFor(logging.DEBUG)
+    # the level caches of other loggers are kept
+    assert other._cache == {logging.WARNING: True}  # type: ignore[attr-defined]
+
+    levels.set("test.levels", logging.INFO)
+    levels.reset("test.levels")
+    assert parent.level == logging.WARNING
+    assert not child.isEnabledFor(logging.DEBUG)
+
+
+def test_root(levels: LogLevels) -> None:
+    root = logging.getLogger()
+    level = root.level
+    child = logging.getLogger("test_levels_root")
+    levels.set("", logging.CRITICAL)
+    assert not child.isEnabledFor(logging.ERROR)
+    assert levels.levels()["root"] == {"level": "CRITICAL", "ttl": None}
+    levels.reset("root")
+    assert root.level == level
+
+
+def test_root_while_loggers_are_created(levels: LogLevels) -> None:
+    def create_loggers() -> None:
+        for i in range(2000):
+            logging.getLogger(f"test_levels_root.created.{i}")
+
+    thread = threading.Thread(target=create_loggers)
+    thread.start()
+    try:
+        while thread.is_alive():
+            levels.set("root", logging.DEBUG)
+            levels.reset("root")
+    finally:
+        thread.join()
+
+
+def test_unknown_level(levels: LogLevels) -> None:
+    with pytest.raises(ValueError, match="Unknown level name: LOUD"):
+        levels.set("test.levels", "LOUD")
+
+
+def test_ttl(levels: LogLevels) -> None:
+    logger = logging.getLogger("test.levels.ttl")
+    levels.set("test.levels.ttl", logging.DEBUG, ttl=60)
+    assert 0 < levels.levels()["test.levels.ttl"]["ttl"] <= 60
+    # setting the level again replaces the timer
+    levels.set("test.levels.ttl", logging.ERROR, ttl=0.01)
+    assert logger.level == logging.ERROR
+    deadline = time.monotonic() + 5
+    while logger.level != logging.NOTSET and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert logger.level == logging.NOTSET
+    assert "test.levels.ttl" not in levels.levels()
+
+
+def test_signal(levels: LogLevels) -> None:
+    logger = logging.getLogger("test.levels.signal")
+    previous = signal.getsignal(signal.SIGUSR1)
+    levels.install_signal_handler(name="test.levels.signal", ttl=None)
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert logger.level == logging.DEBUG
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert logger.level == logging.NOTSET
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+async def test_handler(aiohttp_client: Any) -> None:
+    app = web.Application()
+    app.router.add_route("*", "/admin/log-levels", log_levels_handler)
+    client: TestClient[web.Request, web.Application] = await aiohttp_client(app)
+    logger = logging.getLogger("test.levels.http")
+    try:
+        response = await client.post(
+            "/admin/log-levels",
+            json={"logger": "test.levels.http", "level": "DEBUG", "ttl": 300},
+        )
+        assert response.status == 200
+        data = await response.json()
+        assert data["test.levels.http"]["level"] == "DEBUG"
+        assert logger.level == logging.DEBUG
+
+        response = await client.get("/admin/log-levels")
+        assert "test.levels.http" in await response.json()
+
+        response = await client.post(
+            "/admin/log-levels", json={"logger": "test.levels.http", "level": "LOUD"}
+        )
+        assert response.status == 400
+
+        response = await client.delete("/admin/log-levels")
+        assert response.status == 200
+        assert logger.level == logging.NOTSET
+
+        response = await client.put("/admin/log-levels")
+        assert response.status == 405
+    finally:
+        log_levels.reset()
+
+
+def test_init_logging_levels(monkeypatch: Any) -> None:
+    monkeypatch.setenv("LOG_LEVELS", "test.levels.init=ERROR,aiohttp.access=WARNING")
+    init_logging()
+    assert logging.getLogger("test.levels.init").level == logging.ERROR
+    access = logging.getLogger("aiohttp.access")
+    assert access.level == logging.WARNING
+    assert access.filters
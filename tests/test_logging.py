@@ -2,13 +2,22 @@ import json
 import logging
 import os
 import re
+import time
 from typing import Any
 from unittest import mock
 
 import pytest
 from dirty_equals import IsList, IsNow, IsPartialDict, IsPositiveInt, IsStr
 
-from neuro_logging import AllowLessThanFilter, init_logging
+import neuro_logging
+from neuro_logging import (
+    AllowLessThanFilter,
+    AsyncQueueHandler,
+    RateLimitFilter,
+    init_logging,
+    log_levels,
+)
+from neuro_logging.context import bind_trace_ids
 
 
 @pytest.fixture(autouse=True)
@@ -86,6 +95,139 @@ def test_allow_less_filter_text_level_names() -> None:
         AllowLessThanFilter("unknown-level")
 
 
+def _site_record(
+    lineno: int = 12, level: int = logging.WARNING, name: str = "some"
+) -> logging.LogRecord:
+    return logging.LogRecord(name, level, "some.py", lineno, "text %s", ("x",), None)
+
+
+def test_rate_limit_filter_unlimited() -> None:
+    filter = RateLimitFilter({"ERROR": (1, 1)})
+    for _ in range(10):
+        assert filter.filter(_site_record())
+
+
+def test_rate_limit_filter_per_call_site(monkeypatch: Any) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    filter = RateLimitFilter({logging.WARNING: (1, 2)})
+    assert filter.filter(_site_record())
+    assert filter.filter(_site_record())
+    assert not filter.filter(_site_record())
+    # another call site has its own bucket
+    assert filter.filter(_site_record(lineno=13))
+    now += 1
+    assert filter.filter(_site_record())
+    assert not filter.filter(_site_record())
+
+
+def test_rate_limit_filter_logger_limits() -> None:
+    filter = RateLimitFilter({"WARNING": (100, 100), "noisy": (0, 1)})
+    assert filter.filter(_site_record(name="noisy.child", level=logging.INFO))
+    assert not filter.filter(_site_record(name="noisy.child", level=logging.INFO))
+    assert filter.filter(_site_record(name="noisyness", level=logging.INFO))
+    assert filter.filter(_site_record(name="noisyness", level=logging.INFO))
+
+
+def test_rate_limit_filter_does_not_format_dropped() -> None:
+    class Arg:
+        formatted = 0
+
+        def __str__(self) -> str:
+            Arg.formatted += 1
+            return "arg"
+
+    filter = RateLimitFilter({"WARNING": (0, 1)})
+    records = [
+        logging.LogRecord("some", logging.WARNING, "some.py", 1, "%s", (Arg(),), None)
+        for _ in range(2)
+    ]
+    assert [filter.filter(r) for r in records] == [True, False]
+    assert Arg.formatted == 0
+
+
+def test_rate_limit_filter_summary_timer(caplog: pytest.LogCaptureFixture) -> None:
+    filter = RateLimitFilter({"WARNING": (0, 1)}, summary_interval=0.05)
+    try:
+        assert [filter.filter(_site_record()) for _ in range(3)] == [
+            True,
+            False,
+            False,
+        ]
+        for _ in range(100):
+            if caplog.records:
+                break
+            time.sleep(0.01)
+        [record] = caplog.records
+        assert record.getMessage() == "Suppressed 2 similar messages: 'text %s'"
+        assert record.suppressed == 2  # type: ignore[attr-defined]
+    finally:
+        filter.close()
+
+
+def test_rate_limit_filter_flush(caplog: pytest.LogCaptureFixture) -> None:
+    filter = RateLimitFilter({"WARNING": (0, 1)})
+    try:
+        for _ in range(2):
+            filter.filter(_site_record())
+        filter.flush()
+        filter.flush()
+        [record] = caplog.records
+        assert record.getMessage() == "Suppressed 1 similar messages: 'text %s'"
+    finally:
+        filter.close()
+
+
+def test_rate_limits(capsys: Any, monkeypatch: Any) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    init_logging(rate_limits={"WARNING": (1, 1)})
+
+    def retry() -> None:
+        logging.warning("Retrying %s", "request")
+
+    for _ in range(5):
+        retry()
+    now += 1
+    retry()
+    logging.info("InfoMessage")
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert len(lines) == 4
+    assert lines[0].endswith("Retrying request")
+    assert lines[1].endswith("Suppressed 4 similar messages: 'Retrying %s'")
+    assert lines[2].endswith("Retrying request")
+    assert lines[3].endswith("InfoMessage")
+
+
+def test_rate_limits_periodic_summary(capsys: Any, monkeypatch: Any) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    monkeypatch.setenv("LOG_RATE_LIMITS", "WARNING=0:1")
+    monkeypatch.setenv("LOG_RATE_LIMIT_SUMMARY_INTERVAL", "10")
+    init_logging()
+    for _ in range(3):
+        logging.warning("WarningMessage")
+    now += 10
+    logging.warning("OtherMessage")
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert len(lines) == 3
+    assert lines[0].endswith("WarningMessage")
+    assert lines[1].endswith("Suppressed 2 similar messages: 'WarningMessage'")
+    assert lines[2].endswith("OtherMessage")
+
+
+def test_rate_limits_flushed_at_exit(capsys: Any) -> None:
+    init_logging(rate_limits={"WARNING": (0, 1)})
+    for _ in range(3):
+        logging.warning("WarningMessage")
+    neuro_logging._flush_rate_limit_filter()
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[1].endswith("Suppressed 2 similar messages: 'WarningMessage'")
+
+
 def test_existing_loggers_continue_work(capsys: Any) -> None:
     existing = logging.getLogger("existing")
     init_logging()
@@ -220,3 +362,161 @@ def test_json_logging_with_stack_info(capsys: Any, monkeypatch: Any) -> None:
         }
     )
     assert msg["stack_info"].startswith("Stack (most recent call last):\n")
+
+
+def _flush_root_handlers() -> None:
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+
+def test_async_mode(capsys: Any) -> None:
+    init_logging(async_mode=True)
+    _log_all_messages()
+    _flush_root_handlers()
+    captured = capsys.readouterr()
+    assert "DebugMessage" in captured.out
+    assert "WarningMessage" in captured.out
+    assert "ErrorMessage" in captured.err
+    assert "CriticalMessage" in captured.err
+    assert "ErrorMessage" not in captured.out
+
+
+def test_async_mode_from_environ(capsys: Any, monkeypatch: Any) -> None:
+    monkeypatch.setenv("LOG_ASYNC", "1")
+    init_logging()
+    [handler] = logging.getLogger().handlers
+    assert isinstance(handler, AsyncQueueHandler)
+    logging.info("InfoMessage")
+    handler.flush()
+    captured = capsys.readouterr()
+    assert "InfoMessage" in captured.out
+
+    init_logging(async_mode=False)
+    assert not any(
+        isinstance(h, AsyncQueueHandler) for h in logging.getLogger().handlers
+    )
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_flight_recorder(capsys: Any, monkeypatch: Any, async_mode: bool) -> None:
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    monkeypatch.setenv("LOG_FLIGHT_RECORDER_SIZE", "10")
+    init_logging(async_mode=async_mode)
+    logging.debug("DebugMessage")
+    logging.info("InfoMessage")
+    _flush_root_handlers()
+    captured = capsys.readouterr()
+    assert "DebugMessage" not in captured.out
+    assert "InfoMessage" in captured.out
+    logging.error("ErrorMessage")
+    _flush_root_handlers()
+    captured = capsys.readouterr()
+    assert "DebugMessage" in captured.out
+    assert "ErrorMessage" in captured.err
+
+
+def test_json_logging_flight_recorder(capsys: Any, monkeypatch: Any) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    monkeypatch.setenv("LOG_FLIGHT_RECORDER_LEVEL", "INFO")
+    init_logging(flight_recorder=10)
+    logging.debug("debug")
+    logging.info("info")
+    logging.warning("warning")
+    assert [
+        json.loads(line)["message"] for line in capsys.readouterr().out.splitlines()
+    ] == ["warning"]
+    logging.error("error")
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line["severity"], line["message"]) for line in lines] == [
+        ("INFO", "info"),
+        ("ERROR", "error"),
+    ]
+
+
+def test_flight_recorder_log_levels(capsys: Any, monkeypatch: Any) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    init_logging(flight_recorder=10)
+
+    def messages() -> list[str]:
+        return [
+            json.loads(line)["message"] for line in capsys.readouterr().out.splitlines()
+        ]
+
+    try:
+        log_levels.set("noisy", "DEBUG")
+        logging.getLogger("noisy.child").debug("noisy debug")
+        logging.getLogger("quiet").debug("quiet debug")
+        assert messages() == ["noisy debug"]
+
+        log_levels.set("root", "WARNING")
+        assert log_levels.levels()["root"]["level"] == "WARNING"
+        logging.getLogger("quiet").info("quiet info")
+        assert messages() == []
+        log_levels.set("root", "DEBUG")
+        logging.getLogger("quiet").debug("quiet debug again")
+        assert messages() == ["quiet debug again"]
+
+        log_levels.reset()
+        assert log_levels.levels() == {"root": {"level": "INFO", "ttl": None}}
+        logging.getLogger("noisy").debug("held back")
+        assert messages() == []
+        logging.error("error")
+        assert messages() == ["quiet debug", "quiet info", "held back", "error"]
+    finally:
+        log_levels.reset()
+
+
+def test_json_logging_buffered(capsys: Any, monkeypatch: Any) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    init_logging(buffered=True)
+    logging.debug("first")
+    logging.debug("second")
+    assert not capsys.readouterr().out
+    logging.error("error")
+    captured = capsys.readouterr()
+    lines = [json.loads(line) for line in captured.out.splitlines()]
+    assert [line["message"] for line in lines] == ["first", "second", "error"]
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_json_logging_trace_ids(
+    capsys: Any, monkeypatch: Any, async_mode: bool
+) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    init_logging(async_mode=async_mode, trace_ids=True)
+    logging.info("untraced")
+    with bind_trace_ids("trace-id", "span-id"):
+        logging.info("traced")
+    _flush_root_handlers()
+    captured = capsys.readouterr()
+    untraced, traced = (json.loads(line) for line in captured.out.splitlines())
+    assert "trace_id" not in untraced
+    assert traced == IsPartialDict(
+        {"message": "traced", "trace_id": "trace-id", "span_id": "span-id"}
+    )
+
+
+def test_json_logging_trace_ids_disabled(capsys: Any, monkeypatch: Any) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    init_logging()
+    with bind_trace_ids("trace-id", "span-id"):
+        logging.info("traced")
+    assert "trace_id" not in json.loads(capsys.readouterr().out)
+
+
+def test_health_checks_filtered__url_paths_and_prefixes(capsys: Any) -> None:
+    init_logging(
+        health_check_url_paths=["/ready"], health_check_url_prefixes=["/metrics"]
+    )
+    logger = logging.getLogger("aiohttp.access")
+    logger.info("GET /api/v1/ping")
+    logger.info("GET /ready")
+    logger.info("GET /metrics/requests")
+    logger.info("GET /api/v1/jobs")
+    captured = capsys.readouterr()
+    assert "/api/v1/ping" not in captured.out
+    assert "/ready" not in captured.out
+    assert "/metrics" not in captured.out
+    assert "/api/v1/jobs" in captured.out
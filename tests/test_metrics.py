@@ -0,0 +1,304 @@
+import io
+import logging
+import math
+import random
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient
+
+from neuro_logging import init_logging
+from neuro_logging.handlers import (
+    AsyncQueueHandler,
+    BufferedStreamHandler,
+    MeteredStreamHandler,
+)
+from neuro_logging.metrics import (
+    BUFFER_BYTES,
+    BYTES,
+    DROPPED,
+    FORMAT_SECONDS,
+    QUEUE_DROPPED,
+    QUEUE_SIZE,
+    RECORDS,
+    WRITE_SECONDS,
+    Histogram,
+    LoggingMetrics,
+    SpanHistograms,
+    logging_metrics,
+    metrics_handler,
+    span_histograms,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> Iterator[None]:
+    logging_metrics.reset()
+    yield
+    logging_metrics.enabled = True
+
+
+def _record(msg: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, msg, (), None)
+
+
+def test_counters_are_sharded_per_thread() -> None:
+    metrics = LoggingMetrics()
+
+    def count() -> None:
+        for _ in range(1000):
+            metrics.inc(DROPPED, ("hide_errors",))
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    count()
+
+    # the shards of the exited threads are merged into the retired one
+    assert len(metrics._shards) == 2
+    assert metrics.snapshot()[DROPPED] == {("hide_errors",): 5000}
+
+    metrics.reset()
+    assert metrics.snapshot()[DROPPED] == {}
+
+
+def test_shards_of_exited_threads_are_retired() -> None:
+    metrics = LoggingMetrics()
+    for _ in range(50):
+        thread = threading.Thread(target=metrics.inc, args=(DROPPED, ("filter",)))
+        thread.start()
+        thread.join()
+
+    assert len(metrics._shards) == 1
+    assert metrics.snapshot()[DROPPED] == {("filter",): 50}
+    metrics.reset()
+    assert metrics.snapshot()[DROPPED] == {}
+
+
+def test_disabled() -> None:
+    metrics = LoggingMetrics()
+    metrics.enabled = False
+    metrics.inc(DROPPED, ("hide_errors",))
+    assert metrics.snapshot()[DROPPED] == {}
+
+
+def test_buffered_stream_handler_metrics() -> None:
+    stream = io.BytesIO()
+    handler = BufferedStreamHandler(stream, flush_size=1024, flush_interval=60)
+    handler.name = "buffered"
+    try:
+        handler.handle(_record("first"))
+        handler.handle(_record("second", logging.WARNING))
+        snapshot = logging_metrics.snapshot()
+        assert snapshot[RECORDS] == {
+            ("buffered", "INFO", "test"): 1,
+            ("buffered", "WARNING", "test"): 1,
+        }
+        assert snapshot[BYTES] == {("buffered",): len("first\nsecond\n")}
+        assert snapshot[FORMAT_SECONDS][("buffered",)] > 0
+        assert snapshot[BUFFER_BYTES][("buffered",)] == len("first\nsecond\n")
+        assert snapshot[WRITE_SECONDS] == {}
+
+        handler.flush()
+        snapshot = logging_metrics.snapshot()
+        assert snapshot[BUFFER_BYTES][("buffered",)] == 0
+        assert snapshot[WRITE_SECONDS][("buffered",)] > 0
+    finally:
+        handler.close()
+
+
+def test_init_logging_text_handlers_metrics(capsys: Any) -> None:
+    init_logging()
+    for handler in logging.getLogger().handlers:
+        assert isinstance(handler, MeteredStreamHandler)
+    logging.info("InfoMessage")
+    logging.error("ErrorMessage")
+    captured = capsys.readouterr()
+    snapshot = logging_metrics.snapshot()
+    assert snapshot[RECORDS] == {
+        ("stdout", "INFO", "root"): 1,
+        ("stderr", "ERROR", "root"): 1,
+    }
+    assert snapshot[BYTES] == {
+        ("stdout",): len(captured.out),
+        ("stderr",): len(captured.err),
+    }
+
+
+class _BlockingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.unblocked.wait()
+
+
+def test_async_queue_handler_metrics() -> None:
+    target = _BlockingHandler()
+    handler = AsyncQueueHandler([target], maxsize=1, overflow="drop_level")
+    handler.name = "queue"
+    try:
+        handler.handle(_record("first"))
+        while handler.qsize:
+            time.sleep(0.001)
+        # the writer thread is blocked on the first record
+        handler.handle(_record("second"))
+        handler.handle(_record("third"))
+        snapshot = logging_metrics.snapshot()
+        assert snapshot[QUEUE_SIZE][("queue",)] == 1
+        assert snapshot[QUEUE_DROPPED][("queue",)] == 1
+    finally:
+        target.unblocked.set()
+        handler.close()
+
+
+def test_filter_drops(capsys: Any) -> None:
+    init_logging(rate_limits={"WARNING": (0, 1)})
+    logging.getLogger("aiohttp.access").info("GET /api/v1/ping")
+    logging.error("ErrorMessage")
+    for _ in range(3):
+        logging.warning("WarningMessage")
+    capsys.readouterr()
+
+    assert logging_metrics.snapshot()[DROPPED] == {
+        ("hide_health_checks",): 1,
+        ("hide_errors",): 1,
+        ("rate_limit",): 2,
+    }
+
+
+def test_init_logging_disables_metrics(capsys: Any) -> None:
+    init_logging(metrics=False)
+    logging.getLogger("aiohttp.access").info("GET /api/v1/ping")
+    assert not logging_metrics.enabled
+    assert logging_metrics.snapshot()[DROPPED] == {}
+
+
+def test_prometheus_format() -> None:
+    metrics = LoggingMetrics()
+    metrics.inc(RECORDS, ("buffered", "INFO", 'my "logger"'), 3)
+    metrics.inc(DROPPED, ("hide_errors",))
+    text = metrics.to_prometheus()
+
+    assert "# TYPE neuro_logging_records_total counter\n" in text
+    assert (
+        'neuro_logging_records_total{handler="buffered",level="INFO",'
+        'logger="my \\"logger\\""} 3.0\n'
+    ) in text
+    assert 'neuro_logging_records_dropped_total{filter="hide_errors"} 1.0\n' in text
+    assert "# TYPE neuro_logging_queue_size gauge\n" in text
+
+
+async def test_metrics_handler(aiohttp_client: Any) -> None:
+    logging_metrics.inc(DROPPED, ("hide_errors",))
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    client: TestClient[web.Request, web.Application] = await aiohttp_client(app)
+
+    response = await client.get("/metrics")
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = await response.text()
+    assert 'neuro_logging_records_dropped_total{filter="hide_errors"} 1.0\n' in text
+    assert "# TYPE neuro_logging_span_seconds summary\n" in text
+
+
+def test_histogram_quantiles() -> None:
+    histogram = Histogram()
+    assert math.isnan(histogram.quantile(0.5))
+    values = [random.randrange(1, 10**10) for _ in range(10000)]
+    for value in values:
+        histogram.record(value)
+    values.sort()
+
+    assert histogram.count == 10000
+    assert histogram.sum == sum(values)
+    for q in (0.01, 0.5, 0.95, 0.99, 1.0):
+        expected = values[math.ceil(q * len(values)) - 1] / 1e9
+        assert histogram.quantile(q) == pytest.approx(expected, rel=0.07)
+
+
+def test_histogram_small_values_are_exact() -> None:
+    histogram = Histogram()
+    for value in range(16):
+        histogram.record(value)
+    assert histogram.quantile(0.5) == 7 / 1e9
+    assert histogram.quantile(1) == 15 / 1e9
+
+
+def test_histogram_merge() -> None:
+    first, second, merged = Histogram(), Histogram(), Histogram()
+    for value in range(1000, 2000):
+        first.record(value)
+        merged.record(value)
+    for value in range(10**6, 10**6 + 500):
+        second.record(value, error=True)
+        merged.record(value, error=True)
+    first.merge(second)
+
+    assert (first.count, first.errors, first.sum) == (1500, 500, merged.sum)
+    assert first.buckets == merged.buckets
+
+
+def test_span_histograms_threads() -> None:
+    histograms = SpanHistograms()
+
+    def record() -> None:
+        for i in range(1000):
+            histograms.record("job", 1000 * i, error=i % 10 == 0)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    record()
+    histograms.record("other", 5)
+
+    snapshot = histograms.snapshot()
+    assert snapshot.keys() == {"job", "other"}
+    assert (snapshot["job"].count, snapshot["job"].errors) == (5000, 500)
+    assert snapshot["job"].quantile(0.5) == pytest.approx(0.0005, rel=0.07)
+
+    histograms.reset()
+    assert histograms.snapshot() == {}
+
+
+def test_span_histograms_disabled() -> None:
+    histograms = SpanHistograms()
+    histograms.enabled = False
+    histograms.record("job", 1000)
+    assert histograms.snapshot() == {}
+
+
+def test_span_histograms_prometheus_format() -> None:
+    histograms = SpanHistograms()
+    for _ in range(3):
+        histograms.record('GET "/"', 10**6)
+    histograms.record('GET "/"', 10**6, error=True)
+    text = histograms.to_prometheus()
+
+    assert "# TYPE neuro_logging_span_seconds summary\n" in text
+    label = 'span="GET \\"/\\""'
+    assert f'neuro_logging_span_seconds{{{label},quantile="0.99"}} 0.00101' in text
+    assert f"neuro_logging_span_seconds_sum{{{label}}} 0.004\n" in text
+    assert f"neuro_logging_span_seconds_count{{{label}}} 4\n" in text
+    assert f"neuro_logging_span_errors_total{{{label}}} 1.0\n" in text
+
+
+def test_init_logging_disables_span_histograms(
+    monkeypatch: pytest.MonkeyPatch, capsys: Any
+) -> None:
+    monkeypatch.setenv("LOG_SPAN_HISTOGRAMS", "0")
+    init_logging()
+    assert not span_histograms.enabled
+    monkeypatch.delenv("LOG_SPAN_HISTOGRAMS")
+    init_logging()
+    assert span_histograms.enabled
@@ -0,0 +1,114 @@
+import json
+import logging
+from typing import Any
+
+import pytest
+
+from neuro_logging import get_logger, init_logging, lazy
+
+
+def test_bound_logger_fields(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO)
+    log = get_logger("test.structured", app="jobs").bind(user="alice")
+    log.info("Job %s started", "job-1", job="job-1")
+    log.info("Job %s finished", "job-1")
+
+    started, finished = caplog.records
+    assert started.getMessage() == "Job job-1 started"
+    assert started.name == "test.structured"
+    assert started.funcName == "test_bound_logger_fields"
+    assert started.extra == {  # type: ignore[attr-defined]
+        "app": "jobs",
+        "user": "alice",
+        "job": "job-1",
+    }
+    assert finished.extra == {"app": "jobs", "user": "alice"}  # type: ignore[attr-defined]
+    # Records without call fields share the bound context.
+    assert finished.extra is log.context  # type: ignore[attr-defined]
+
+
+def test_bound_logger_bind_does_not_modify_parent() -> None:
+    parent = get_logger("test.structured", user="alice")
+    child = parent.bind(user="bob", job="job-1")
+    assert parent.context == {"user": "alice"}
+    assert child.context == {"user": "bob", "job": "job-1"}
+    assert child.logger is parent.logger
+
+
+def test_bound_logger_lazy_fields(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO)
+    calls = []
+
+    def spec() -> dict[str, int]:
+        calls.append(1)
+        return {"cpu": 1}
+
+    log = get_logger("test.structured").bind(spec=lazy(spec), kind=ValueError)
+    log.debug("disabled", status=lazy(lambda: calls.append(2)))
+    assert not calls
+    log.info("enabled", status=lazy(lambda: "running"))
+    log.info("enabled again")
+    assert calls == [1, 1]
+    first, second = caplog.records
+    assert first.extra == {  # type: ignore[attr-defined]
+        "spec": {"cpu": 1},
+        "kind": ValueError,
+        "status": "running",
+    }
+    assert second.extra == {"spec": {"cpu": 1}, "kind": ValueError}  # type: ignore[attr-defined]
+
+
+def test_bound_logger_callable_field(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO)
+
+    def callback() -> None:
+        pytest.fail("called")
+
+    log = get_logger("test.structured").bind(callback=callback)
+    log.info("enabled", handler=print)
+    [record] = caplog.records
+    assert record.extra == {"callback": callback, "handler": print}  # type: ignore[attr-defined]
+
+
+def test_bound_logger_failed_lazy_field(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO)
+
+    def spec() -> None:
+        msg = "no spec"
+        raise ValueError(msg)
+
+    log = get_logger("test.structured").bind(spec=lazy(spec))
+    log.info("enabled", job="job-1")
+    [record] = caplog.records
+    assert record.getMessage() == "enabled"
+    assert record.extra == {  # type: ignore[attr-defined]
+        "spec": "<lazy field failed: ValueError('no spec')>",
+        "job": "job-1",
+    }
+
+
+def test_bound_logger_exception(caplog: pytest.LogCaptureFixture) -> None:
+    log = get_logger("test.structured")
+    try:
+        msg = "failed"
+        raise ValueError(msg)
+    except ValueError:
+        log.exception("Job failed", job="job-1")
+    [record] = caplog.records
+    assert record.levelno == logging.ERROR
+    assert record.exc_info is not None
+    assert record.exc_info[0] is ValueError
+
+
+def test_bound_logger_json_payload(capsys: Any, monkeypatch: Any) -> None:
+    monkeypatch.delenv("PYTEST_VERSION")
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    init_logging()
+    log = get_logger("test.structured").bind(user="alice")
+    log.debug("disabled")
+    log.info("Job started", job="job-1", retries=lazy(lambda: 3))
+    [line] = capsys.readouterr().out.splitlines()
+    data = json.loads(line)
+    assert data["message"] == "Job started"
+    assert data["logName"] == "test.structured"
+    assert data["jsonPayload"] == {"user": "alice", "job": "job-1", "retries": 3}
@@ -1,17 +1,34 @@
 import asyncio
+import contextlib
+import contextvars
 import re
+import sys
+import time
 import typing as t
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
 
 import pytest
 import sentry_sdk
 from sentry_sdk.tracing import Span, Transaction
+from sentry_sdk.types import Event
 
+from neuro_logging.context import trace_ids
+from neuro_logging.health import HealthCheckMatcher
+from neuro_logging.metrics import span_histograms
 from neuro_logging.testing_utils import _get_test_version
 from neuro_logging.trace import (
+    AdaptiveSampler,
+    EventCoalescer,
+    TailSampler,
     before_send_transaction,
     new_sampled_trace,
     new_trace,
+    new_trace_cm,
     notrace,
+    run_in_executor,
     trace,
     trace_cm,
 )
@@ -75,6 +92,88 @@ async def test_sentry_trace_multiple_tasks() -> None:
     assert span1.span_id != span2.span_id
 
 
+@pytest.mark.usefixtures("sentry_transaction")
+async def test_sentry_trace_no_scope_leakage() -> None:
+    var: contextvars.ContextVar[str] = contextvars.ContextVar("var", default="")
+    outer_task = asyncio.current_task()
+    parent_span = sentry_sdk.get_current_scope().span
+
+    @trace
+    async def func() -> str:
+        assert asyncio.current_task() is outer_task
+        var.set("inner")
+        sentry_sdk.get_current_scope().set_tag("inner", "value")
+        await asyncio.sleep(0)
+        return var.get()
+
+    assert await func() == "inner"
+    assert var.get() == ""
+    assert "inner" not in sentry_sdk.get_current_scope()._tags
+    assert sentry_sdk.get_current_scope().span is parent_span
+
+
+@pytest.mark.parametrize("sentry_enabled", [True, False])
+async def test_sentry_trace_no_scope_leakage_unsampled(sentry_enabled: bool) -> None:
+    var: contextvars.ContextVar[str] = contextvars.ContextVar("var", default="")
+    sentry_sdk.init(traces_sample_rate=0.0)
+
+    @trace
+    async def func() -> str:
+        var.set("inner")
+        sentry_sdk.get_current_scope().set_tag("inner", "value")
+        await asyncio.sleep(0)
+        return var.get()
+
+    @new_trace
+    async def new_func() -> str:
+        var.set("new")
+        sentry_sdk.get_isolation_scope().set_tag("new", "value")
+        return var.get()
+
+    client = (
+        sentry_sdk.get_client()
+        if sentry_enabled
+        else sentry_sdk.client.NonRecordingClient()
+    )
+    with mock.patch.object(sentry_sdk, "get_client", return_value=client):
+        assert await func() == "inner"
+        assert await new_func() == "new"
+    assert var.get() == ""
+    if sentry_enabled:
+        # Without a client the scopes are not forked, nothing is sent anyway.
+        assert "inner" not in sentry_sdk.get_current_scope()._tags
+        assert "new" not in sentry_sdk.get_isolation_scope()._tags
+
+
+@pytest.mark.usefixtures("sentry_transaction")
+async def test_sentry_trace_exception() -> None:
+    @trace
+    async def func() -> None:
+        await asyncio.sleep(0)
+        msg = "error"
+        raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="error"):
+        await func()
+
+
+@pytest.mark.usefixtures("sentry_transaction")
+async def test_sentry_trace_cancellation() -> None:
+    started = asyncio.Event()
+
+    @trace
+    async def func() -> None:
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(func())
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert task.cancelled()
+
+
 async def test_sentry_new_trace() -> None:
     @new_trace
     async def func() -> None:
@@ -108,6 +207,23 @@ async def test_sentry_new_trace_multiple_tasks() -> None:
     assert span1.trace_id != span2.trace_id
 
 
+async def test_sentry_new_sampled_trace_nested_trace() -> None:
+    @trace
+    async def child() -> None:
+        span = sentry_sdk.get_current_scope().span
+
+        assert span
+        assert span.op == "call"
+
+    @new_sampled_trace
+    async def func() -> None:
+        await child()
+
+    sentry_sdk.init(traces_sample_rate=1.0)
+
+    await func()
+
+
 async def test_sentry_new_sampled_trace() -> None:
     @new_sampled_trace
     async def func() -> None:
@@ -135,22 +251,551 @@ async def test_sentry_notrace() -> None:
     await func()
 
 
+async def test_sentry_trace_unsampled() -> None:
+    sentry_sdk.init(traces_sample_rate=1.0)
+    capture_exception = mock.Mock()
+
+    @trace
+    async def func() -> None:
+        assert sentry_sdk.get_current_scope().span is transaction
+
+    @trace
+    async def fail() -> None:
+        msg = "failed"
+        raise ValueError(msg)
+
+    with (
+        sentry_sdk.start_transaction(name="test", sampled=False) as transaction,
+        mock.patch.object(sentry_sdk.Scope, "capture_exception", capture_exception),
+    ):
+        await func()
+        async with trace_cm("test", tags={"tag": "value"}):
+            assert sentry_sdk.get_current_scope().span is transaction
+        # errors are reported regardless of sampling
+        with pytest.raises(ValueError, match="failed"):
+            await fail()
+        assert capture_exception.call_count == 1
+
+
+async def test_sentry_trace_disabled() -> None:
+    called = []
+
+    @trace
+    async def func() -> None:
+        assert sentry_sdk.get_current_scope().span is None
+        called.append("trace")
+
+    @new_trace
+    async def new_func() -> None:
+        assert sentry_sdk.get_current_scope().span is None
+        called.append("new_trace")
+
+    client = sentry_sdk.client.NonRecordingClient()
+    with mock.patch.object(sentry_sdk, "get_client", return_value=client):
+        await func()
+        await new_func()
+        async with new_trace_cm("test"):
+            assert sentry_sdk.get_current_scope().span is None
+    assert called == ["trace", "new_trace"]
+
+
+@pytest.mark.usefixtures("sentry_transaction")
+async def test_sentry_trace_sync() -> None:
+    parent_span = sentry_sdk.get_current_scope().span
+
+    @trace
+    def func() -> int:
+        span = sentry_sdk.get_current_scope().span
+
+        assert span
+        assert parent_span != span
+        assert span.op == "call"
+        assert span.description == "test_sentry_trace_sync.<locals>.func"
+        return 1
+
+    @notrace
+    def untraced() -> None:
+        assert not sentry_sdk.get_current_scope().transaction.sampled
+
+    assert func() == 1
+    assert sentry_sdk.get_current_scope().span is parent_span
+    untraced()
+
+
+def test_sentry_new_trace_sync() -> None:
+    @new_sampled_trace
+    def func() -> None:
+        span = sentry_sdk.get_isolation_scope().span
+
+        assert isinstance(span, Transaction)
+        assert span.name == "test_sentry_new_trace_sync.<locals>.func"
+        assert span.sampled is True
+        child()
+
+    @trace
+    def child() -> None:
+        span = sentry_sdk.get_current_scope().span
+
+        assert span
+        assert span.op == "call"
+
+    sentry_sdk.init(traces_sample_rate=1.0)
+
+    func()
+
+
+@pytest.mark.usefixtures("sentry_transaction")
+async def test_run_in_executor_thread_pool() -> None:
+    transaction = t.cast(Transaction, sentry_sdk.get_current_scope().transaction)
+    spans: list[Span | None] = []
+
+    @trace
+    def func(value: int) -> int:
+        spans.append(sentry_sdk.get_current_scope().span)
+        return value * 2
+
+    with ThreadPoolExecutor() as executor:
+        assert await run_in_executor(executor, func, 1) == 2
+    assert await run_in_executor(None, func, 2) == 4
+
+    assert len(spans) == 2
+    for span in spans:
+        assert span
+        assert span.containing_transaction is transaction
+        assert span.description == "test_run_in_executor_thread_pool.<locals>.func"
+        # the span of the executor call
+        assert span.parent_span_id != transaction.span_id
+
+
+@pytest.mark.usefixtures("sentry_transaction")
+async def test_run_in_executor_process_pool() -> None:
+    transaction = sentry_sdk.get_current_scope().transaction
+    assert transaction
+
+    with ProcessPoolExecutor(1, initializer=sentry_sdk.init) as executor:
+        traceparent = await run_in_executor(executor, sentry_sdk.get_traceparent)
+
+    assert traceparent
+    assert traceparent.split("-")[0] == transaction.trace_id
+
+
+async def test_sentry_trace_ids() -> None:
+    sentry_sdk.init(traces_sample_rate=1.0)
+    ids = []
+
+    @trace
+    async def child() -> None:
+        span = sentry_sdk.get_current_scope().span
+        assert span
+        assert trace_ids.get() == (span.trace_id, span.span_id)
+        ids.append(trace_ids.get())
+
+    @new_sampled_trace
+    async def func() -> None:
+        transaction = sentry_sdk.get_isolation_scope().span
+        assert transaction
+        assert trace_ids.get() == (transaction.trace_id, transaction.span_id)
+        await child()
+        async with trace_cm("test"):
+            ids.append(trace_ids.get())
+        assert trace_ids.get() == (transaction.trace_id, transaction.span_id)
+
+    assert trace_ids.get() is None
+    await func()
+    assert trace_ids.get() is None
+    [child_ids, cm_ids] = ids
+    assert child_ids
+    assert cm_ids
+    assert child_ids != cm_ids
+    assert child_ids[0] == cm_ids[0]
+
+
 def test_find_caller_version() -> None:
     version = _get_test_version()
     assert re.match(r"^neuro_logging@\d+[.]\d+", version)
 
 
 def test_sentry_before_send_transaction() -> None:
+    matcher = HealthCheckMatcher(["/api/v1/ping"], ["/metrics"])
     event = before_send_transaction(
         {"request": {"url": "http://127.0.0.1/api/v1/ping"}},
         {},
-        health_check_url_path="/api/v1/ping",
+        matcher=matcher,
+    )
+    assert event is None
+
+    event = before_send_transaction(
+        {"request": {"url": "http://127.0.0.1/metrics/requests?x=1"}},
+        {},
+        matcher=matcher,
     )
     assert event is None
 
     event = before_send_transaction(
         {"request": {"url": "http://127.0.0.1/api/v1/jobs"}},
         {},
-        health_check_url_path="/api/v1/ping",
+        matcher=matcher,
     )
     assert event is not None
+
+    event = before_send_transaction({"transaction": "job"}, {}, matcher=matcher)
+    assert event is not None
+
+
+def _exc_info(exc: BaseException) -> t.Any:
+    try:
+        raise exc
+    except BaseException:
+        return sys.exc_info()
+
+
+def test_event_coalescer(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    capture_message = mock.Mock()
+    monkeypatch.setattr(sentry_sdk, "capture_message", capture_message)
+    coalescer = EventCoalescer(window=10, cap=2)
+
+    def send(exc: BaseException) -> Event | None:
+        return coalescer({"level": "error"}, {"exc_info": _exc_info(exc)})
+
+    assert send(ValueError("first")) is not None
+    assert send(ValueError("second")) is not None
+    assert send(ValueError("third")) is None
+    assert send(ValueError("fourth")) is None
+    # another exception type has its own fingerprint
+    assert send(KeyError("key")) is not None
+    # events without an exception are never coalesced
+    assert coalescer({"message": "msg"}, {}) is not None
+
+    now += 10
+    event = send(ValueError("fifth"))
+    assert event is not None
+    assert event["extra"]["coalesced_occurrences"] == 2
+    assert send(KeyError("key")) is not None
+    capture_message.assert_not_called()
+
+    assert send(KeyError("key")) is not None
+    assert send(KeyError("key")) is None
+    now += 10
+    assert send(ValueError("sixth")) is not None
+    capture_message.assert_called_once_with(
+        "KeyError: 1 similar events suppressed in 10s",
+        level="warning",
+        extras={"coalesced_occurrences": 1},
+    )
+    coalescer.close()
+
+
+def test_event_coalescer_timer(monkeypatch: pytest.MonkeyPatch) -> None:
+    capture_message = mock.Mock()
+    monkeypatch.setattr(sentry_sdk, "capture_message", capture_message)
+    coalescer = EventCoalescer(window=0.05)
+    try:
+        for _ in range(3):
+            coalescer({"level": "error"}, {"exc_info": _exc_info(ValueError())})
+        for _ in range(100):
+            if capture_message.called:
+                break
+            time.sleep(0.01)
+        capture_message.assert_called_once_with(
+            "ValueError: 2 similar events suppressed in 0.05s",
+            level="warning",
+            extras={"coalesced_occurrences": 2},
+        )
+    finally:
+        coalescer.close()
+
+
+def test_event_coalescer_flush(monkeypatch: pytest.MonkeyPatch) -> None:
+    capture_message = mock.Mock()
+    monkeypatch.setattr(sentry_sdk, "capture_message", capture_message)
+    coalescer = EventCoalescer(window=60)
+    try:
+        for _ in range(2):
+            coalescer({"level": "error"}, {"exc_info": _exc_info(ValueError())})
+        coalescer.flush()
+        capture_message.assert_called_once_with(
+            "ValueError: 1 similar events suppressed in 60s",
+            level="warning",
+            extras={"coalesced_occurrences": 1},
+        )
+        coalescer.flush()
+        capture_message.assert_called_once()
+    finally:
+        coalescer.close()
+
+
+def test_event_coalescer_sentry_client() -> None:
+    events: list[Event] = []
+
+    class Transport(sentry_sdk.transport.Transport):
+        def capture_envelope(self, envelope: sentry_sdk.envelope.Envelope) -> None:
+            event = envelope.get_event()
+            if event is not None:
+                events.append(event)
+
+    sentry_sdk.init(
+        dsn="http://public@localhost/1",
+        transport=Transport,
+        before_send=EventCoalescer(window=60),
+    )
+    for _ in range(10):
+        try:
+            1 / 0  # noqa: B018
+        except ZeroDivisionError as exc:
+            sentry_sdk.capture_exception(exc)
+    sentry_sdk.flush()
+    assert len(events) == 1
+
+
+def test_adaptive_sampler_rates() -> None:
+    sampler = AdaptiveSampler(
+        0.1, {"job": 1.0, "GET /api/v1/jobs": 0.5, "GET /api/v1/jobs/stats": 0.0}
+    )
+
+    def request(method: str, path: str) -> dict[str, t.Any]:
+        return {
+            "transaction_context": {"name": "generic AIOHTTP request"},
+            "parent_sampled": None,
+            "aiohttp_request": SimpleNamespace(method=method, path=path),
+        }
+
+    assert sampler({"transaction_context": {"name": "job"}}) == 1.0
+    assert sampler({"transaction_context": {"name": "other"}}) == 0.1
+    assert sampler(request("GET", "/api/v1/jobs/job-id")) == 0.5
+    assert sampler(request("GET", "/api/v1/jobs/stats")) == 0.0
+    assert sampler(request("POST", "/api/v1/jobs")) == 0.1
+    assert (
+        sampler({"transaction_context": {"name": "job"}, "parent_sampled": False})
+        == 0.0
+    )
+
+
+def test_adaptive_sampler_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    sampler = AdaptiveSampler(1.0, budget=10, interval=1)
+
+    def sample(name: str) -> float:
+        return sampler({"transaction_context": {"name": name}})
+
+    # a spike is cut off once the budget of the interval is spent
+    rates = [sample("busy") for _ in range(1000)]
+    assert sum(rates) == 10
+    assert [sample("rare") for _ in range(5)] == [0.0] * 5
+
+    now += 1
+    # the rare transaction keeps its rate, the busy one gets the rest
+    assert [sample("rare") for _ in range(5)] == [1.0] * 5
+    assert sample("busy") == pytest.approx(0.005)
+
+
+async def test_adaptive_sampler_forced_sampling() -> None:
+    sentry_sdk.init(traces_sampler=AdaptiveSampler(0.0))
+
+    @new_sampled_trace
+    async def func() -> None:
+        span = sentry_sdk.get_isolation_scope().span
+        assert span
+        assert span.sampled
+
+    await func()
+    with sentry_sdk.start_transaction(name="test") as transaction:
+        assert not transaction.sampled
+
+
+@pytest.mark.parametrize("sampled", [True, False])
+async def test_span_histograms(sampled: bool) -> None:
+    sentry_sdk.init(traces_sample_rate=1.0 if sampled else 0.0)
+    span_histograms.reset()
+
+    @trace
+    async def func(fail: bool = False) -> None:
+        await asyncio.sleep(0)
+        if fail:
+            msg = "failed"
+            raise ValueError(msg)
+
+    @trace
+    def sync_func() -> None:
+        pass
+
+    @new_trace
+    async def job() -> None:
+        await func()
+        with pytest.raises(ValueError, match="failed"):
+            await func(fail=True)
+        sync_func()
+        async with trace_cm("block"):
+            await asyncio.sleep(0.01)
+
+    await job()
+    async with new_trace_cm("cm"):
+        pass
+
+    snapshot = span_histograms.snapshot()
+    name = "test_span_histograms.<locals>."
+    assert {key: (value.count, value.errors) for key, value in snapshot.items()} == {
+        name + "func": (2, 1),
+        name + "sync_func": (1, 0),
+        name + "job": (1, 0),
+        "block": (1, 0),
+        "cm": (1, 0),
+    }
+    assert snapshot["block"].quantile(0.5) > 0.009
+    assert snapshot[name + "job"].quantile(0.5) > 0.009
+
+
+@pytest.fixture
+def sent_transactions(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, t.Any]]:
+    events: list[dict[str, t.Any]] = []
+
+    class Transport(sentry_sdk.transport.Transport):
+        def capture_envelope(self, envelope: sentry_sdk.envelope.Envelope) -> None:
+            event = envelope.get_transaction_event()
+            if event is not None:
+                events.append(dict(event))
+
+    sentry_sdk.init(
+        dsn="http://public@localhost/1", transport=Transport, traces_sample_rate=0.0
+    )
+    monkeypatch.setattr(
+        sys.modules["neuro_logging.trace"],
+        "tail_sampler",
+        TailSampler(0.05, max_spans=3),
+    )
+    return events
+
+
+async def test_tail_sampling(sent_transactions: list[dict[str, t.Any]]) -> None:
+    @trace
+    async def step(delay: float = 0.0) -> None:
+        await asyncio.sleep(delay)
+
+    @trace
+    def sync_step() -> None:
+        pass
+
+    @new_trace
+    async def job(delay: float) -> None:
+        async with trace_cm("outer"):
+            await step(delay)
+            sync_step()
+        await step()
+
+    await job(0.0)
+    sentry_sdk.flush()
+    assert sent_transactions == []
+
+    await job(0.06)
+    sentry_sdk.flush()
+    [event] = sent_transactions
+    assert event["transaction"] == "test_tail_sampling.<locals>.job"
+    assert event["tags"]["sampling"] == "tail"
+    # the buffer holds 3 spans
+    assert event["contexts"]["trace"]["data"]["dropped_spans"] == 1
+    spans = event["spans"]
+    assert [span["description"] for span in spans] == [
+        "outer",
+        "test_tail_sampling.<locals>.step",
+        "test_tail_sampling.<locals>.sync_step",
+    ]
+    root = event["contexts"]["trace"]["span_id"]
+    assert spans[0]["parent_span_id"] == root
+    assert spans[1]["parent_span_id"] == spans[0]["span_id"]
+    assert spans[2]["parent_span_id"] == spans[0]["span_id"]
+    assert all(
+        span["trace_id"] == event["contexts"]["trace"]["trace_id"] for span in spans
+    )
+    duration = datetime.fromisoformat(spans[1]["timestamp"]) - datetime.fromisoformat(
+        spans[1]["start_timestamp"]
+    )
+    assert duration.total_seconds() >= 0.05
+
+
+async def test_tail_sampling_error(sent_transactions: list[dict[str, t.Any]]) -> None:
+    @trace
+    async def fail() -> None:
+        msg = "failed"
+        raise ValueError(msg)
+
+    @new_trace
+    async def job() -> None:
+        for _ in range(5):
+            with contextlib.suppress(ValueError):
+                await fail()
+
+    await job()
+    sentry_sdk.flush()
+    [event] = sent_transactions
+    assert event["contexts"]["trace"]["data"]["dropped_spans"] == 2
+    assert [span["status"] for span in event["spans"]] == ["internal_error"] * 3
+
+
+@pytest.mark.parametrize("delay", [0.0, 0.06])
+async def test_tail_sampling_task_outlives_transaction(
+    sent_transactions: list[dict[str, t.Any]], delay: float
+) -> None:
+    proceed = asyncio.Event()
+
+    @trace
+    async def step() -> None:
+        pass
+
+    @trace
+    async def fail() -> None:
+        msg = "failed"
+        raise ValueError(msg)
+
+    async def stray() -> None:
+        async with trace_cm("stray"):
+            await proceed.wait()
+            await step()
+            with contextlib.suppress(ValueError):
+                await fail()
+
+    @new_trace
+    async def spawner() -> asyncio.Task[None]:
+        task = asyncio.create_task(stray())
+        await asyncio.sleep(0)
+        return task
+
+    @new_trace
+    async def job() -> None:
+        await step()
+        proceed.set()
+        await asyncio.sleep(delay)
+
+    task = await spawner()
+    # The buffer of spawner() is reused while its task still runs.
+    await job()
+    await task
+    sentry_sdk.flush()
+    if not delay:
+        assert sent_transactions == []
+        return
+    [event] = sent_transactions
+    assert event["transaction"].endswith("job")
+    assert [span["description"] for span in event["spans"]] == [
+        "test_tail_sampling_task_outlives_transaction.<locals>.step"
+    ]
+
+
+async def test_tail_sampling_new_trace_cm(
+    sent_transactions: list[dict[str, t.Any]],
+) -> None:
+    async with new_trace_cm("fast"), trace_cm("step"):
+        pass
+
+    async def fail() -> None:
+        async with new_trace_cm("failed"), trace_cm("step"):
+            msg = "failed"
+            raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="failed"):
+        await fail()
+    sentry_sdk.flush()
+    [event] = sent_transactions
+    assert event["transaction"] == "failed"
+    assert [span["description"] for span in event["spans"]] == ["step"]
@@ -0,0 +1,245 @@
+import gzip
+import os
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import pytest
+import sentry_sdk
+from sentry_sdk.envelope import Envelope
+
+from neuro_logging.metrics import SENTRY_DROPPED, SENTRY_SPOOL_ENVELOPES
+from neuro_logging.transport import SpoolTransport
+
+
+class _Ingest(ThreadingHTTPServer):
+    """Local stand-in for the Sentry ingest endpoint."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _IngestHandler)
+        self.status = 200
+        self.requests: list[tuple[str, dict[str, str], Envelope]] = []
+        self.received = threading.Condition()
+
+    @property
+    def dsn(self) -> str:
+        return f"http://public@127.0.0.1:{self.server_address[1]}/1"
+
+    def wait_for(self, count: int) -> None:
+        with self.received:
+            assert self.received.wait_for(lambda: len(self.requests) >= count, 5)
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    server: _Ingest
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        status = self.server.status
+        if status == 200:
+            envelope = Envelope.deserialize(gzip.decompress(body))
+            with self.server.received:
+                self.server.requests.append((self.path, dict(self.headers), envelope))
+                self.server.received.notify_all()
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def ingest() -> Iterator[_Ingest]:
+    server = _Ingest()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _transport(dsn: str, path: Path, **kwargs: Any) -> SpoolTransport:
+    kwargs = {"flush_interval": 0.01, "max_backoff": 0.05} | kwargs
+    return SpoolTransport({"dsn": dsn}, path=path, **kwargs)
+
+
+def _message(text: str) -> Envelope:
+    envelope = Envelope()
+    envelope.add_event({"message": text, "level": "error"})
+    return envelope
+
+
+def _messages(ingest: _Ingest) -> list[str]:
+    messages = []
+    for _, _, envelope in ingest.requests:
+        event = envelope.get_event()
+        assert event is not None
+        messages.append(event["message"])
+    return messages
+
+
+def test_sends_envelopes(ingest: _Ingest, tmp_path: Path) -> None:
+    transport = _transport(ingest.dsn, tmp_path)
+    sentry_sdk.init(dsn=ingest.dsn, transport=transport)
+    try:
+        for i in range(3):
+            sentry_sdk.capture_message(f"message {i}")
+        sentry_sdk.flush(timeout=5)
+    finally:
+        sentry_sdk.get_client().close()
+
+    assert _messages(ingest) == ["message 0", "message 1", "message 2"]
+    path, headers, _ = ingest.requests[0]
+    assert path == "/api/1/envelope/"
+    assert headers["Content-Encoding"] == "gzip"
+    assert "sentry_key=public" in headers["X-Sentry-Auth"]
+    assert transport.sent == 3
+    assert transport.qsize == 0
+
+
+def test_keeps_envelopes_during_outage(ingest: _Ingest, tmp_path: Path) -> None:
+    ingest.status = 503
+    transport = _transport(ingest.dsn, tmp_path)
+    try:
+        transport.capture_envelope(_message("first"))
+        transport.capture_envelope(_message("second"))
+        transport.flush(0.2)
+        assert transport.qsize == 2
+        assert ingest.requests == []
+
+        ingest.status = 200
+        ingest.wait_for(2)
+        transport.flush(5)
+        assert transport.qsize == 0
+        assert _messages(ingest) == ["first", "second"]
+    finally:
+        transport.kill()
+
+
+def test_survives_restart(ingest: _Ingest, tmp_path: Path) -> None:
+    ingest.status = 503
+    transport = _transport(ingest.dsn, tmp_path, segment_bytes=1)
+    transport.capture_envelope(_message("first"))
+    transport.capture_envelope(_message("second"))
+    transport.kill()
+
+    ingest.status = 200
+    transport = _transport(ingest.dsn, tmp_path)
+    try:
+        assert transport.qsize == 2
+        transport.flush(5)
+        assert _messages(ingest) == ["first", "second"]
+        transport.capture_envelope(_message("third"))
+        transport.flush(5)
+        assert _messages(ingest) == ["first", "second", "third"]
+    finally:
+        transport.kill()
+
+    # sent envelopes are not sent again
+    transport = _transport(ingest.dsn, tmp_path)
+    try:
+        assert transport.qsize == 0
+    finally:
+        transport.kill()
+    assert len(list(tmp_path.glob("*/*.spool"))) <= 2
+
+
+def test_processes_spool_separately(ingest: _Ingest, tmp_path: Path) -> None:
+    ingest.status = 503
+    first = _transport(ingest.dsn, tmp_path)
+    second = _transport(ingest.dsn, tmp_path)
+    try:
+        assert first.path != second.path
+        first.capture_envelope(_message("first"))
+        second.capture_envelope(_message("second"))
+        assert first.qsize == second.qsize == 1
+    finally:
+        first.kill()
+        second.kill()
+
+    # the next process takes over an orphaned spool
+    ingest.status = 200
+    transport = _transport(ingest.dsn, tmp_path)
+    try:
+        assert transport.path == first.path
+        transport.flush(5)
+        assert _messages(ingest) == ["first"]
+    finally:
+        transport.kill()
+
+
+def test_forked_process_spools_separately(ingest: _Ingest, tmp_path: Path) -> None:
+    transport = _transport(ingest.dsn, tmp_path)
+    try:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            os.write(write_fd, str(transport.path).encode())
+            transport.kill()
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            child_path = f.read()
+        os.waitpid(pid, 0)
+        assert child_path
+        assert Path(child_path) != transport.path
+        transport.capture_envelope(_message("parent"))
+        transport.flush(5)
+        assert _messages(ingest) == ["parent"]
+    finally:
+        transport.kill()
+
+
+def test_removes_sent_segments(ingest: _Ingest, tmp_path: Path) -> None:
+    size = len(_message("message").serialize()) + 4
+    transport = _transport(
+        ingest.dsn, tmp_path, segment_bytes=2 * size, batch_size=3, max_bytes=5 * size
+    )
+    try:
+        for _ in range(4):
+            for _ in range(5):
+                transport.capture_envelope(_message("message"))
+            transport.flush(5)
+        ingest.wait_for(20)
+        transport.flush(5)
+        assert transport.dropped == 0
+        assert transport.sent == 20
+        assert transport.size == 0
+        assert [p.stat().st_size for p in transport.path.glob("*.spool")] == [0]
+    finally:
+        transport.kill()
+
+
+def test_bounded_spool(ingest: _Ingest, tmp_path: Path) -> None:
+    ingest.status = 503
+    size = len(_message("message").serialize()) + 4
+    transport = _transport(ingest.dsn, tmp_path, max_bytes=2 * size)
+    try:
+        for _ in range(5):
+            transport.capture_envelope(_message("message"))
+        assert transport.qsize == 2
+        assert transport.size == 2 * size
+        assert transport.dropped == 3
+        metrics = {name: value for name, _, value in transport.collect_metrics()}
+        assert metrics[SENTRY_SPOOL_ENVELOPES] == 2
+        assert metrics[SENTRY_DROPPED] == 3
+    finally:
+        transport.kill()
+
+
+def test_drops_rejected_envelopes(ingest: _Ingest, tmp_path: Path) -> None:
+    ingest.status = 400
+    transport = _transport(ingest.dsn, tmp_path)
+    try:
+        transport.capture_envelope(_message("invalid"))
+        transport.flush(5)
+        assert transport.qsize == 0
+        assert transport.dropped == 1
+        assert transport.sent == 0
+    finally:
+        transport.kill()
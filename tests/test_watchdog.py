@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from unittest import mock
+
+import pytest
+import sentry_sdk
+from sentry_sdk.types import Event
+
+from neuro_logging import new_trace, new_trace_cm, trace, trace_cm, watch_loop
+from neuro_logging.context import task_spans
+from neuro_logging.watchdog import LoopWatchdog
+
+
+def _block(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def _wait_for_stalls(watchdog: LoopWatchdog, stalls: int = 1) -> None:
+    for _ in range(100):
+        if watchdog.stalls >= stalls:
+            return
+        await asyncio.sleep(0.01)
+
+
+async def test_loop_watchdog_logs_stall(caplog: pytest.LogCaptureFixture) -> None:
+    sentry_sdk.init(traces_sample_rate=1.0)
+    caplog.set_level(logging.WARNING, "neuro_logging.watchdog")
+    async with LoopWatchdog(threshold=0.05, interval=0.01) as watchdog:
+        await asyncio.sleep(0.05)
+        async with new_trace_cm("job", sampled=True), trace_cm("blocking"):
+            _block(0.3)
+        await _wait_for_stalls(watchdog)
+
+    assert watchdog.stalls == 1
+    assert 0.2 < watchdog.max_lag < 1.0
+    [record] = caplog.records
+    assert record.levelno == logging.WARNING
+    assert record.getMessage().startswith("Event loop blocked for 0.")
+    assert record.span == "blocking"  # type: ignore[attr-defined]
+    assert record.task == asyncio.current_task().get_name()  # type: ignore[attr-defined,union-attr]
+    assert record.loop_lag == watchdog.max_lag  # type: ignore[attr-defined]
+    assert record.stack_info
+    assert "in _block" in record.stack_info
+
+
+@trace
+async def _traced_block(seconds: float) -> None:
+    await asyncio.sleep(0)
+    _block(seconds)
+
+
+@new_trace
+async def _traced_job(seconds: float) -> None:
+    await _traced_block(seconds)
+
+
+@trace
+def _traced_sync_block(seconds: float) -> None:
+    _block(seconds)
+
+
+async def _run_nested_spans() -> LoopWatchdog:
+    async with LoopWatchdog(threshold=0.05, interval=0.01) as watchdog:
+        await asyncio.sleep(0.05)
+        await _traced_job(0.2)
+        await _wait_for_stalls(watchdog)
+        async with new_trace_cm("job"):
+            await _traced_block(0.2)
+            await _wait_for_stalls(watchdog, 2)
+            _traced_sync_block(0.2)
+            await _wait_for_stalls(watchdog, 3)
+            _block(0.2)
+            await _wait_for_stalls(watchdog, 4)
+    return watchdog
+
+
+@pytest.mark.parametrize("sentry", ["sampled", "unsampled", "disabled"])
+async def test_loop_watchdog_nested_spans(
+    caplog: pytest.LogCaptureFixture, sentry: str
+) -> None:
+    class Transport(sentry_sdk.transport.Transport):
+        def capture_envelope(self, envelope: sentry_sdk.envelope.Envelope) -> None:
+            pass
+
+    sentry_sdk.init(
+        dsn="http://public@localhost/1",
+        traces_sample_rate=1.0 if sentry == "sampled" else 0.0,
+        transport=Transport,
+    )
+    client = (
+        sentry_sdk.client.NonRecordingClient()
+        if sentry == "disabled"
+        else sentry_sdk.get_client()
+    )
+    caplog.set_level(logging.WARNING, "neuro_logging.watchdog")
+    with mock.patch.object(sentry_sdk, "get_client", return_value=client):
+        watchdog = await _run_nested_spans()
+
+    assert watchdog.stalls == 4
+    spans = [record.span for record in caplog.records]  # type: ignore[attr-defined]
+    assert spans == [
+        _traced_block.__qualname__,
+        _traced_block.__qualname__,
+        _traced_sync_block.__qualname__,
+        "job",
+    ]
+    assert not task_spans
+
+
+async def test_loop_watchdog_ignores_short_blocks(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    caplog.set_level(logging.WARNING, "neuro_logging.watchdog")
+    async with LoopWatchdog(threshold=0.2, interval=0.01) as watchdog:
+        for _ in range(5):
+            _block(0.02)
+            await asyncio.sleep(0.02)
+
+    assert watchdog.stalls == 0
+    assert not caplog.records
+
+
+async def test_loop_watchdog_sampling(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.WARNING, "neuro_logging.watchdog")
+    async with LoopWatchdog(threshold=0.05, interval=0.01, sample_rate=0) as watchdog:
+        await asyncio.sleep(0.05)
+        _block(0.15)
+        await _wait_for_stalls(watchdog)
+
+    assert watchdog.stalls == 1
+    assert not caplog.records
+
+
+async def test_loop_watchdog_sentry() -> None:
+    events: list[Event] = []
+
+    class Transport(sentry_sdk.transport.Transport):
+        def capture_envelope(self, envelope: sentry_sdk.envelope.Envelope) -> None:
+            event = envelope.get_event()
+            if event is not None:
+                events.append(event)
+
+    sentry_sdk.init(dsn="http://public@localhost/1", transport=Transport)
+    async with LoopWatchdog(
+        threshold=0.05, interval=0.01, sentry_threshold=0.2
+    ) as watchdog:
+        await asyncio.sleep(0.05)
+        _block(0.1)
+        await _wait_for_stalls(watchdog)
+        _block(0.3)
+        await _wait_for_stalls(watchdog, 2)
+    sentry_sdk.flush()
+
+    assert watchdog.stalls == 2
+    [event] = events
+    assert event["level"] == "warning"
+    assert event["message"].startswith("Event loop blocked for 0.")
+    assert "in _block" in str(event["contexts"]["event_loop"]["stack"])
+
+
+async def test_watch_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("LOG_LOOP_WATCHDOG", raising=False)
+    assert watch_loop() is None
+
+    monkeypatch.setenv("LOG_LOOP_WATCHDOG", "1")
+    monkeypatch.setenv("LOG_LOOP_STALL_THRESHOLD", "0.5")
+    watchdog = watch_loop()
+    assert watchdog is not None
+    try:
+        assert watchdog.threshold == 0.5
+    finally:
+        watchdog.stop()